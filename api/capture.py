@@ -0,0 +1,123 @@
+"""
+Production traffic capture
+Records a sample of detect_trash requests (arrival time, image, parameters,
+status, latency and response) to a local corpus that api/replay.py can
+re-issue against another server
+"""
+
+import os
+import json
+import queue
+import random
+import hashlib
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/bmp": ".bmp"}
+
+
+class TrafficCapture:
+    """
+    Appends sampled requests to <directory>/requests.jsonl
+
+    Image bytes are stored once per content hash under <directory>/images/
+    (store_images=False keeps only the hash). Writes happen on a background
+    thread; when the queue is full or max_mb of images is reached, further
+    records are dropped and counted rather than slowing requests down.
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 0.01, store_images: bool = True, max_mb: float = 1024):
+        self.directory = Path(directory)
+        self.image_dir = self.directory / "images"
+        self.image_dir.mkdir(parents=True, exist_ok=True)
+        self.log_path = self.directory / "requests.jsonl"
+        self.sample_rate = sample_rate
+        self.store_images = store_images
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+        self.stored_bytes = sum(f.stat().st_size for f in self.image_dir.iterdir() if f.is_file())
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=1000)
+        self._writer = threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True)
+        self._writer.start()
+
+    def sampled(self) -> bool:
+        """Decide whether to capture the current request"""
+        return random.random() < self.sample_rate
+
+    def record(self, entry: Dict, contents: Optional[bytes], content_type: Optional[str]):
+        """Queue one request for writing; never blocks the request"""
+        try:
+            self._queue.put_nowait((entry, contents, content_type))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _write_loop(self):
+        while True:
+            entry, contents, content_type = self._queue.get()
+            try:
+                self._write(entry, contents, content_type)
+            except OSError as e:
+                logger.error(f"Traffic capture write failed: {e}")
+                with self._lock:
+                    self.dropped += 1
+
+    def _write(self, entry: Dict, contents: Optional[bytes], content_type: Optional[str]):
+        entry["image_file"] = None
+        if contents is not None:
+            digest = hashlib.sha256(contents).hexdigest()
+            entry["image_sha256"] = digest
+            entry["image_bytes"] = len(contents)
+
+            if self.store_images:
+                name = digest + EXTENSIONS.get(content_type, ".bin")
+                path = self.image_dir / name
+                if path.exists():
+                    entry["image_file"] = f"images/{name}"
+                elif self.stored_bytes + len(contents) <= self.max_bytes:
+                    path.write_bytes(contents)
+                    self.stored_bytes += len(contents)
+                    entry["image_file"] = f"images/{name}"
+
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        with self._lock:
+            self.recorded += 1
+
+    def stats(self) -> Dict:
+        """Return capture counters"""
+        with self._lock:
+            return {
+                "directory": str(self.directory),
+                "sample_rate": self.sample_rate,
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "stored_mb": round(self.stored_bytes / 1024**2, 2),
+                "max_mb": round(self.max_bytes / 1024**2, 2)
+            }
+
+
+def create_capture_from_env() -> Optional[TrafficCapture]:
+    """Create the traffic capture if CAPTURE_DIR is set, otherwise return None"""
+    directory = os.getenv("CAPTURE_DIR", "").strip()
+    if not directory:
+        return None
+
+    capture = TrafficCapture(
+        directory,
+        sample_rate=float(os.getenv("CAPTURE_SAMPLE_RATE", "0.01")),
+        store_images=os.getenv("CAPTURE_STORE_IMAGES", "true").lower() in ("1", "true", "yes"),
+        max_mb=float(os.getenv("CAPTURE_MAX_MB", "1024"))
+    )
+    logger.info(f"Capturing {capture.sample_rate:.1%} of detection requests to {capture.directory}")
+    return capture
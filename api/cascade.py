@@ -0,0 +1,82 @@
+"""
+Two-stage cascade inference
+Runs the small model first and escalates uncertain images to the larger model
+"""
+
+import os
+import threading
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+import torch
+from torchvision.ops import box_iou
+
+
+logger = logging.getLogger(__name__)
+
+
+class CascadeDetector:
+    """
+    Decides when a small-model result is too uncertain to return
+
+    An image is escalated to the large model when the small model finds
+    nothing, when its best detection is below min_confidence, or when two
+    boxes of different classes overlap by more than conflict_iou.
+    """
+
+    def __init__(self, large_model, min_confidence: float = 0.5, conflict_iou: float = 0.5):
+        self.large_model = large_model
+        self.min_confidence = min_confidence
+        self.conflict_iou = conflict_iou
+
+        self._lock = threading.Lock()
+        self.total = 0
+        self.escalated = 0
+        self.reasons = {"no_detections": 0, "low_confidence": 0, "conflicting_classes": 0}
+
+    def escalation_reason(self, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray) -> Optional[str]:
+        """Return why a small-model result should be escalated, or None to accept it"""
+        if len(scores) == 0:
+            return "no_detections"
+
+        if float(scores.max()) < self.min_confidence:
+            return "low_confidence"
+
+        if len(np.unique(class_ids)) > 1:
+            xyxy = torch.from_numpy(np.asarray(boxes, dtype=np.float32))
+            ious = box_iou(xyxy, xyxy).numpy()
+            different_class = class_ids[:, None] != class_ids[None, :]
+            if bool(((ious > self.conflict_iou) & different_class).any()):
+                return "conflicting_classes"
+
+        return None
+
+    def record(self, reason: Optional[str]):
+        """Update escalation counters"""
+        with self._lock:
+            self.total += 1
+            if reason is not None:
+                self.escalated += 1
+                self.reasons[reason] += 1
+
+    def stats(self) -> Dict:
+        """Return the fraction of images escalated and a breakdown by reason"""
+        with self._lock:
+            return {
+                "images": self.total,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.total, 4) if self.total else 0.0,
+                "reasons": dict(self.reasons),
+                "min_confidence": self.min_confidence,
+                "conflict_iou": self.conflict_iou
+            }
+
+
+def cascade_settings_from_env() -> Dict:
+    """Read cascade configuration; an empty CASCADE_MODEL_PATH disables the cascade"""
+    return {
+        "model_path": os.getenv("CASCADE_MODEL_PATH", "").strip() or None,
+        "min_confidence": float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.5")),
+        "conflict_iou": float(os.getenv("CASCADE_CONFLICT_IOU", "0.5"))
+    }
@@ -0,0 +1,309 @@
+"""
+Async Python client for the Garbage Classification API
+Pooled keep-alive connections, batch uploads, retries that honour
+Retry-After, and optional client-side downscaling before upload with
+boxes mapped back to the original image coordinates.
+
+Example:
+    async with AsyncGarbageClient("http://localhost:8000") as client:
+        result = await client.detect("photo.jpg")
+        results = await client.detect_batch(["a.jpg", "b.jpg", "c.jpg"])
+"""
+
+import io
+import random
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+
+ImageInput = Union[str, Path, bytes, "PIL.Image.Image", "numpy.ndarray"]
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class DetectionError(Exception):
+    """The API rejected a request or kept failing after retries"""
+
+    def __init__(self, status_code: Optional[int], detail: str):
+        super().__init__(f"{status_code}: {detail}" if status_code else detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class PreparedImage:
+    """Upload bytes plus the factor needed to map boxes back to the original image"""
+
+    def __init__(self, contents: bytes, content_type: str, filename: str, scale: float = 1.0):
+        self.contents = contents
+        self.content_type = content_type
+        self.filename = filename
+        self.scale = scale  # uploaded pixels / original pixels
+
+
+def prepare_image(
+    image: ImageInput,
+    max_side: Optional[int] = 640,
+    quality: int = 90,
+    filename: str = "image.jpg"
+) -> PreparedImage:
+    """
+    Load an image and, if its longest side exceeds max_side, downscale and
+    re-encode it as JPEG. Files already small enough are sent untouched.
+    """
+    if isinstance(image, (str, Path)):
+        filename = Path(image).name
+        image = Path(image).read_bytes()
+
+    if isinstance(image, bytes):
+        if not max_side:
+            return PreparedImage(image, _guess_content_type(image), filename)
+        from PIL import Image
+        pil_image = Image.open(io.BytesIO(image))
+        if max(pil_image.size) <= max_side:
+            return PreparedImage(image, _guess_content_type(image), filename)
+    else:
+        from PIL import Image
+        pil_image = image if isinstance(image, Image.Image) else Image.fromarray(image)
+
+    scale = 1.0
+    original_width = pil_image.width
+    if max_side and max(pil_image.size) > max_side:
+        target = max_side / max(pil_image.size)
+        size = (max(1, round(pil_image.width * target)), max(1, round(pil_image.height * target)))
+        pil_image.draft('RGB', size)  # Fast reduced-size JPEG decode when possible
+        pil_image = pil_image.convert('RGB').resize(size, Image.BILINEAR, reducing_gap=2.0)
+        scale = pil_image.width / original_width
+
+    buffer = io.BytesIO()
+    pil_image.convert('RGB').save(buffer, format='JPEG', quality=quality)
+    return PreparedImage(buffer.getvalue(), 'image/jpeg', Path(filename).with_suffix('.jpg').name, scale)
+
+
+def _guess_content_type(contents: bytes) -> str:
+    if contents[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if contents[:4] == b'RIFF' and contents[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+def _rescale(result: Dict, scale: float) -> Dict:
+    """Map boxes from uploaded-image pixels back to original-image pixels"""
+    if scale != 1.0:
+        for detection in result.get("detections", []):
+            detection["bbox_xyxy"] = [v / scale for v in detection["bbox_xyxy"]]
+    return result
+
+
+class AsyncGarbageClient:
+    """
+    Async client with a shared connection pool
+
+    Args:
+        base_url: API root, e.g. http://localhost:8000
+        max_side: Downscale uploads so their longest side is at most this; "auto" uses the
+            server's /v1/input_spec recommended_max_side, None never downscales
+        quality: JPEG quality used when re-encoding (default: the server's jpeg_quality, else 90)
+        max_connections: Connection pool size
+        max_retries: Retries for 429/502/503/504 responses and connection errors
+        backoff: Initial backoff in seconds, doubled per retry with jitter
+        request_class: X-Request-Class sent with every request (interactive or bulk)
+        api_key: X-API-Key sent with every request
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        max_side: Union[int, str, None] = "auto",
+        quality: Optional[int] = None,
+        max_connections: int = 20,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        batch_size: int = 8,
+        request_class: Optional[str] = None,
+        api_key: Optional[str] = None
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.max_side = max_side
+        self.quality = quality
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self._input_spec = None
+
+        headers = {}
+        if request_class:
+            headers["X-Request-Class"] = request_class
+        if api_key:
+            headers["X-API-Key"] = api_key
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def _post(self, path: str, files, data: Dict, headers: Optional[Dict] = None) -> Dict:
+        """POST with retries; honours Retry-After, otherwise exponential backoff with jitter"""
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+            try:
+                response = await self._client.post(path, files=files, data=data, headers=headers)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise DetectionError(None, f"Connection failed: {e}")
+                logger.warning(f"Connection error ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    delay = float(retry_after)
+                logger.warning(f"Server returned {response.status_code}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code != 200:
+                try:
+                    detail = response.json().get("detail", response.text)
+                except ValueError:
+                    detail = response.text
+                raise DetectionError(response.status_code, str(detail))
+            return response.json()
+
+    async def input_spec(self) -> Dict:
+        """The server's advertised input size, encoding and upload limits (cached)"""
+        if self._input_spec is None:
+            response = await self._client.get("/v1/input_spec")
+            response.raise_for_status()
+            self._input_spec = response.json()
+        return self._input_spec
+
+    async def _resize_settings(self) -> Tuple[Optional[int], int]:
+        """(max_side, quality) for uploads, negotiated with the server when max_side is 'auto'"""
+        if self.max_side != "auto":
+            return self.max_side, self.quality or 90
+
+        try:
+            spec = await self.input_spec()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Could not fetch input spec ({e}), downscaling to 640px")
+            return 640, self.quality or 90
+        return spec["recommended_max_side"], self.quality or spec.get("jpeg_quality", 90)
+
+    @staticmethod
+    def _form(params: Dict) -> Dict:
+        data = {}
+        for key, value in params.items():
+            if value is None:
+                continue
+            data[key] = ','.join(value) if isinstance(value, (list, tuple)) else str(value)
+        return data
+
+    async def detect(
+        self,
+        image: ImageInput,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        max_det: Optional[int] = None,
+        classes: Optional[Sequence[str]] = None,
+        categories: Optional[Sequence[str]] = None,
+        stream_id: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> Dict:
+        """Detect trash in one image; boxes are in the original image's pixels"""
+        max_side, quality = await self._resize_settings()
+        prepared = await asyncio.to_thread(prepare_image, image, max_side, quality)
+
+        headers = {}
+        if stream_id:
+            headers["X-Stream-Id"] = stream_id
+        if session_id:
+            headers["X-Session-Id"] = session_id
+
+        result = await self._post(
+            "/v1/detect_trash",
+            files={"image": (prepared.filename, prepared.contents, prepared.content_type)},
+            data=self._form(dict(conf=conf, iou=iou, max_det=max_det, classes=classes, categories=categories)),
+            headers=headers
+        )
+        return _rescale(result, prepared.scale)
+
+    async def detect_batch(
+        self,
+        images: Sequence[ImageInput],
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        max_det: Optional[int] = None,
+        classes: Optional[Sequence[str]] = None,
+        categories: Optional[Sequence[str]] = None
+    ) -> List[Union[Dict, DetectionError]]:
+        """
+        Detect trash in many images through /v1/detect_trash_batch
+
+        Images are uploaded in chunks of batch_size, chunks in parallel.
+        Images that failed with a retryable status are retried
+        individually. Returns one result dict or DetectionError per image,
+        in input order.
+        """
+        data = self._form(dict(conf=conf, iou=iou, max_det=max_det, classes=classes, categories=categories))
+        max_side, quality = await self._resize_settings()
+        prepared = await asyncio.gather(
+            *(asyncio.to_thread(prepare_image, image, max_side, quality) for image in images)
+        )
+
+        async def run_chunk(start: int) -> List[Tuple[int, Union[Dict, DetectionError]]]:
+            chunk = prepared[start:start + self.batch_size]
+            files = [("images", (p.filename, p.contents, p.content_type)) for p in chunk]
+            try:
+                response = await self._post("/v1/detect_trash_batch", files=files, data=data)
+            except DetectionError as e:
+                return [(start + i, e) for i in range(len(chunk))]
+
+            outcomes = []
+            for item in response["results"]:
+                index = start + item["index"]
+                if item["status_code"] == 200:
+                    outcomes.append((index, _rescale(item["result"], prepared[index].scale)))
+                elif item["status_code"] in RETRY_STATUS_CODES:
+                    outcomes.append((index, await self._retry_single(prepared[index], data)))
+                else:
+                    outcomes.append((index, DetectionError(item["status_code"], item["error"])))
+            return outcomes
+
+        results: List[Union[Dict, DetectionError, None]] = [None] * len(images)
+        chunks = await asyncio.gather(*(run_chunk(start) for start in range(0, len(prepared), self.batch_size)))
+        for outcomes in chunks:
+            for index, outcome in outcomes:
+                results[index] = outcome
+        return results
+
+    async def _retry_single(self, prepared: PreparedImage, data: Dict) -> Union[Dict, DetectionError]:
+        try:
+            result = await self._post(
+                "/v1/detect_trash",
+                files={"image": (prepared.filename, prepared.contents, prepared.content_type)},
+                data=data
+            )
+            return _rescale(result, prepared.scale)
+        except DetectionError as e:
+            return e
@@ -0,0 +1,228 @@
+"""
+Process-pool image decoding
+Decodes, crops and downscales uploads in worker processes, outside the
+GIL of the serving process, and hands the pixels back through shared
+memory instead of pickling them
+"""
+
+import os
+import io
+import math
+import time
+import asyncio
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import cv2
+from PIL import Image
+
+
+logger = logging.getLogger(__name__)
+
+
+def decode_image(
+    contents: bytes,
+    roi_box: Optional[Sequence[float]] = None,
+    max_side: int = 0
+):
+    """
+    Decode an upload to an RGB array, cropped to roi_box and downscaled so
+    its longest side is at most max_side (0 keeps full resolution)
+
+    JPEGs are decoded at a reduced DCT scale when that still covers the
+    target size, so large photos never materialize at full resolution.
+
+    Returns:
+        (RGB uint8 array, (scale_x, scale_y), (offset_x, offset_y)) where
+        original = array coordinate / scale + offset
+    """
+    pil_image = Image.open(io.BytesIO(contents))
+    orig_w, orig_h = pil_image.size
+
+    crop_box = (0, 0, orig_w, orig_h)
+    if roi_box is not None:
+        x1, y1, x2, y2 = roi_box
+        crop_box = (
+            int(min(x1, orig_w - 1)),
+            int(min(y1, orig_h - 1)),
+            int(min(max(x2, x1 + 1), orig_w)),
+            int(min(max(y2, y1 + 1), orig_h))
+        )
+    crop_w, crop_h = crop_box[2] - crop_box[0], crop_box[3] - crop_box[1]
+
+    scale = 1.0
+    if max_side and max(crop_w, crop_h) > max_side:
+        scale = max_side / max(crop_w, crop_h)
+        # draft() only ever reduces by powers of two while staying >= the requested size
+        pil_image.draft('RGB', (math.ceil(orig_w * scale), math.ceil(orig_h * scale)))
+
+    # Map the crop box into the (possibly draft-reduced) decoded image
+    draft_x, draft_y = pil_image.width / orig_w, pil_image.height / orig_h
+    if (draft_x, draft_y) != (1.0, 1.0) or roi_box is not None:
+        pil_image = pil_image.crop((
+            int(crop_box[0] * draft_x), int(crop_box[1] * draft_y),
+            max(int(crop_box[2] * draft_x), int(crop_box[0] * draft_x) + 1),
+            max(int(crop_box[3] * draft_y), int(crop_box[1] * draft_y) + 1)
+        ))
+
+    if pil_image.mode != 'RGB':
+        pil_image = pil_image.convert('RGB')
+    img_array = np.asarray(pil_image)
+
+    new_w, new_h = max(1, round(crop_w * scale)), max(1, round(crop_h * scale))
+    if (img_array.shape[1], img_array.shape[0]) != (new_w, new_h):
+        img_array = cv2.resize(img_array, (new_w, new_h), interpolation=cv2.INTER_AREA)
+
+    return img_array, (new_w / crop_w, new_h / crop_h), (float(crop_box[0]), float(crop_box[1]))
+
+
+def _init_worker():
+    """Keep each worker single-threaded; parallelism comes from the pool"""
+    cv2.setNumThreads(1)
+
+
+def _decode_to_shared_memory(contents: bytes, roi_box, max_side: int):
+    """Worker entry point: decode into a new shared memory block and return its handle"""
+    start_time = time.perf_counter()
+    img_array, scale, offset = decode_image(contents, roi_box, max_side)
+
+    block = shared_memory.SharedMemory(create=True, size=img_array.nbytes)
+    np.ndarray(img_array.shape, dtype=np.uint8, buffer=block.buf)[...] = img_array
+    name = block.name
+    block.close()
+
+    return name, img_array.shape, scale, offset, (time.perf_counter() - start_time) * 1000
+
+
+def _discard_result(future):
+    """Unlink the shared memory block of a decode nobody is waiting for"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    block = shared_memory.SharedMemory(name=future.result()[0])
+    block.close()
+    block.unlink()
+
+
+class DecodedImage:
+    """
+    Decoded pixels living in a shared memory block
+
+    array is a view on the block; call close() once the request no longer
+    needs it, which unmaps and unlinks the block.
+    """
+
+    def __init__(self, name: str, shape: Tuple[int, ...], scale, offset):
+        self._block = shared_memory.SharedMemory(name=name)
+        self.array = np.ndarray(shape, dtype=np.uint8, buffer=self._block.buf)
+        self.scale = scale
+        self.offset = offset
+
+    def close(self):
+        if self._block is None:
+            return
+        self.array = None
+        self._block.close()
+        self._block.unlink()
+        self._block = None
+
+
+class DecodePool:
+    """
+    Pool of decode worker processes
+
+    Workers are spawned (not forked) so they never inherit the serving
+    process's model, CUDA context or thread pools.
+    """
+
+    def __init__(self, workers: int = 2, max_side: int = 640):
+        self.workers = workers
+        self.max_side = max_side
+
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        self.images = 0
+        self.failures = 0
+        self.restarts = 0
+        self.decode_ms_total = 0.0
+        self.roundtrip_ms_total = 0.0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=get_context('spawn'), initializer=_init_worker
+        )
+
+    def warmup(self):
+        """Start every worker now instead of on the first requests"""
+        futures = [self._executor.submit(_init_worker) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    async def decode(self, contents: bytes, roi_box: Optional[Sequence[float]] = None) -> DecodedImage:
+        """Decode an upload in a worker process without blocking the event loop"""
+        start_time = time.perf_counter()
+        executor = self._executor
+        future = executor.submit(_decode_to_shared_memory, contents, roi_box, self.max_side)
+        try:
+            name, shape, scale, offset, decode_ms = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Client went away; unlink the block once the worker has produced it
+            future.add_done_callback(_discard_result)
+            raise
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+
+        decoded = DecodedImage(name, shape, scale, offset)
+        with self._lock:
+            self.images += 1
+            self.decode_ms_total += decode_ms
+            self.roundtrip_ms_total += (time.perf_counter() - start_time) * 1000
+        return decoded
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a pool whose worker died (e.g. killed while decoding a huge image)"""
+        with self._lock:
+            self.failures += 1
+            if self._executor is not broken:
+                return
+            logger.error("Decode worker died, restarting decode pool")
+            self.restarts += 1
+            self._executor = self._new_executor()
+        broken.shutdown(wait=False)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        """Return decode counts and mean decode / round-trip latency"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_side": self.max_side,
+                "images": self.images,
+                "failures": self.failures,
+                "restarts": self.restarts,
+                "mean_decode_ms": round(self.decode_ms_total / self.images, 2) if self.images else 0.0,
+                "mean_roundtrip_ms": round(self.roundtrip_ms_total / self.images, 2) if self.images else 0.0
+            }
+
+
+def create_decode_pool_from_env() -> Optional[DecodePool]:
+    """Create the decode pool if DECODE_WORKERS > 0, otherwise return None (decode inline)"""
+    workers = int(os.getenv("DECODE_WORKERS", "0"))
+    if workers <= 0:
+        return None
+
+    pool = DecodePool(workers=workers, max_side=int(os.getenv("DECODE_MAX_SIDE", "640")))
+    pool.warmup()
+    logger.info(f"Decode pool started with {workers} worker processes (max side {pool.max_side}px)")
+    return pool
@@ -1,8 +1,16 @@
+import os
+import ssl
+import json
+import time
 import socket
+import argparse
+import statistics
+import http.client
 import requests
 import subprocess
 import sys
 from pathlib import Path
+from urllib.parse import urlparse
 
 def print_section(title):
     """打印分节标题"""
@@ -180,8 +188,214 @@ def provide_solutions():
     print("\n【问题5】防火墙阻止")
     print("  解决：添加防火墙规则允许8000端口（参见上面第4节）")
 
+# 性能探测: 照片JPEG每像素的大致字节数（按质量），用于估算上传大小
+JPEG_BYTES_PER_PIXEL = {95: 0.55, 90: 0.38, 85: 0.28, 75: 0.20, 60: 0.14}
+
+UPLOAD_SIZES_KB = [16, 64, 256, 1024, 4096]
+
+
+def _summary(values):
+    """中位数/最小/最大（毫秒）"""
+    return {
+        "median_ms": round(statistics.median(values), 2),
+        "min_ms": round(min(values), 2),
+        "max_ms": round(max(values), 2)
+    }
+
+
+def measure_connect(url, samples=5):
+    """测量TCP连接、TLS握手和首字节时间(TTFB)"""
+    print_section("性能 1. TCP连接 / TLS握手 / 首字节时间")
+
+    parsed = urlparse(url)
+    host = parsed.hostname
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    use_tls = parsed.scheme == "https"
+
+    tcp_ms, tls_ms, ttfb_ms = [], [], []
+    for _ in range(samples):
+        start = time.perf_counter()
+        sock = socket.create_connection((host, port), timeout=10)
+        tcp_ms.append((time.perf_counter() - start) * 1000)
+
+        if use_tls:
+            start = time.perf_counter()
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            tls_ms.append((time.perf_counter() - start) * 1000)
+
+        # 复用已建立的连接，只测量请求发出到响应头到达的时间
+        conn_class = http.client.HTTPSConnection if use_tls else http.client.HTTPConnection
+        conn = conn_class(host, port, timeout=10)
+        conn.sock = sock
+        start = time.perf_counter()
+        conn.request("GET", "/health")
+        response = conn.getresponse()
+        ttfb_ms.append((time.perf_counter() - start) * 1000)
+        response.read()
+        conn.close()
+
+    result = {"tcp_connect": _summary(tcp_ms), "ttfb": _summary(ttfb_ms)}
+    print(f"✅ TCP连接: 中位数 {result['tcp_connect']['median_ms']:.1f}ms "
+          f"(最小 {result['tcp_connect']['min_ms']:.1f}ms, 最大 {result['tcp_connect']['max_ms']:.1f}ms)")
+    if use_tls:
+        result["tls_handshake"] = _summary(tls_ms)
+        print(f"✅ TLS握手: 中位数 {result['tls_handshake']['median_ms']:.1f}ms")
+    else:
+        print("ℹ️  未使用HTTPS，跳过TLS握手测量")
+    print(f"✅ 首字节时间(TTFB, /health): 中位数 {result['ttfb']['median_ms']:.1f}ms")
+    return result
+
+
+def compare_keep_alive(url, samples=10):
+    """比较长连接(keep-alive)与每次新建连接的请求耗时"""
+    print_section("性能 2. 长连接 vs 新建连接")
+
+    new_ms = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        with requests.Session() as fresh:
+            fresh.get(f"{url}/health", timeout=10)
+        new_ms.append((time.perf_counter() - start) * 1000)
+
+    keep_alive_ms = []
+    with requests.Session() as session:
+        session.get(f"{url}/health", timeout=10)  # 预热，建立连接
+        for _ in range(samples):
+            start = time.perf_counter()
+            session.get(f"{url}/health", timeout=10)
+            keep_alive_ms.append((time.perf_counter() - start) * 1000)
+
+    result = {"new_connection": _summary(new_ms), "keep_alive": _summary(keep_alive_ms)}
+    saved = result["new_connection"]["median_ms"] - result["keep_alive"]["median_ms"]
+    print(f"✅ 新建连接: 中位数 {result['new_connection']['median_ms']:.1f}ms")
+    print(f"✅ 长连接:   中位数 {result['keep_alive']['median_ms']:.1f}ms")
+    print(f"💡 复用连接每个请求可节省约 {saved:.1f}ms")
+    result["saved_ms"] = round(saved, 2)
+    return result
+
+
+def sweep_upload(url, max_mb=4.0, repeats=3):
+    """按不同负载大小测量上传吞吐量（服务器丢弃数据，不做推理）"""
+    print_section("性能 3. 上传吞吐量扫描")
+
+    sizes = [kb for kb in UPLOAD_SIZES_KB if kb <= max_mb * 1024]
+    if not sizes:
+        # 至少测量最小的负载，否则无法估计带宽
+        sizes = UPLOAD_SIZES_KB[:1]
+        print(f"⚠️  --max-mb {max_mb} 小于最小负载，改为测量 {sizes[0]} KB")
+    results = []
+    with requests.Session() as session:
+        # 空负载的往返时间作为基准，从每次上传中扣除
+        base = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            response = session.post(f"{url}/v1/network_probe", data=b"", timeout=30)
+            base.append((time.perf_counter() - start) * 1000)
+        if response.status_code == 404:
+            print("❌ 服务器不支持 /v1/network_probe，请更新API服务器")
+            return None
+        base_ms = statistics.median(base)
+
+        for kb in sizes:
+            payload = os.urandom(kb * 1024)
+            elapsed = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                session.post(f"{url}/v1/network_probe", data=payload, timeout=120).raise_for_status()
+                elapsed.append((time.perf_counter() - start) * 1000)
+
+            median_ms = statistics.median(elapsed)
+            transfer_ms = max(median_ms - base_ms, 0.1)
+            mbps = kb * 1024 * 8 / (transfer_ms / 1000) / 1e6
+            results.append({"size_kb": kb, "median_ms": round(median_ms, 2), "throughput_mbps": round(mbps, 2)})
+            print(f"   {kb:>5} KB: {median_ms:8.1f}ms  ≈ {mbps:8.2f} Mbit/s")
+
+    # 大负载更能反映链路带宽，小负载主要受往返延迟影响
+    throughput = max(r["throughput_mbps"] for r in results[-2:])
+    print(f"\n✅ 估计上传带宽: {throughput:.2f} Mbit/s (基准往返 {base_ms:.1f}ms)")
+    return {"base_rtt_ms": round(base_ms, 2), "sizes": results, "throughput_mbps": throughput}
+
+
+def recommend_upload_settings(url, upload, budget_ms=300):
+    """根据上传带宽和服务器输入规格给出图片尺寸与质量建议"""
+    print_section("性能 4. 上传设置建议")
+
+    try:
+        spec = requests.get(f"{url}/v1/input_spec", timeout=10).json()
+        max_side = spec["recommended_max_side"]
+    except (requests.exceptions.RequestException, ValueError, KeyError):
+        max_side = 640
+        print("⚠️  无法获取 /v1/input_spec，按640px估算")
+
+    budget_bytes = upload["throughput_mbps"] * 1e6 / 8 * budget_ms / 1000
+    print(f"上传时间预算 {budget_ms}ms → 最多约 {budget_bytes / 1024:.0f} KB")
+
+    # 4:3照片，最长边为max_side
+    pixels = max_side * max_side * 3 / 4
+    recommendation = None
+    for quality in sorted(JPEG_BYTES_PER_PIXEL, reverse=True):
+        estimated = pixels * JPEG_BYTES_PER_PIXEL[quality]
+        fits = estimated <= budget_bytes
+        print(f"   {max_side}px JPEG 质量{quality}: 约 {estimated / 1024:.0f} KB {'✅' if fits else '❌'}")
+        if fits and recommendation is None:
+            recommendation = {"max_side": max_side, "jpeg_quality": quality, "estimated_kb": round(estimated / 1024)}
+
+    if recommendation is None:
+        # 即使最低质量也超出预算：按面积缩小尺寸
+        quality = min(JPEG_BYTES_PER_PIXEL)
+        side = int(max_side * (budget_bytes / (pixels * JPEG_BYTES_PER_PIXEL[quality])) ** 0.5)
+        recommendation = {"max_side": max(side, 320), "jpeg_quality": quality,
+                          "estimated_kb": round(budget_bytes / 1024)}
+        print(f"\n⚠️  链路较慢，即使质量{quality}也超出预算，建议缩小到 {recommendation['max_side']}px"
+              f"（低于{max_side}px会降低检测精度）")
+
+    print(f"\n💡 建议: 上传前将图片最长边缩放到 {recommendation['max_side']}px，"
+          f"JPEG质量 {recommendation['jpeg_quality']}（约 {recommendation['estimated_kb']} KB）")
+    print("💡 客户端应复用HTTP连接（keep-alive），避免每次请求重新握手")
+    return recommendation
+
+
+def run_perf_probe(url, samples=5, max_mb=4.0, budget_ms=300, output=None):
+    """网络性能探测：连接、TTFB、长连接对比、上传吞吐量和建议"""
+    print("\n" + "📶" * 30)
+    print(f"   网络性能探测: {url}")
+    print("📶" * 30)
+
+    url = url.rstrip('/')
+    report = {"url": url}
+    try:
+        report["connect"] = measure_connect(url, samples)
+        report["keep_alive"] = compare_keep_alive(url, samples * 2)
+        report["upload"] = sweep_upload(url, max_mb)
+        if report["upload"]:
+            report["recommendation"] = recommend_upload_settings(url, report["upload"], budget_ms)
+    except (OSError, requests.exceptions.RequestException) as e:
+        print(f"❌ 探测失败: {e}")
+        print("   请确认API服务器已启动，且地址正确")
+        return None
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ 探测结果已保存到 {output}")
+    return report
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="API网络连接诊断工具")
+    parser.add_argument('--perf', action='store_true', help='运行网络性能探测（延迟、吞吐量、上传建议）')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8000', help='API地址 (默认: http://127.0.0.1:8000)')
+    parser.add_argument('--samples', type=int, default=5, help='每项测量的采样次数')
+    parser.add_argument('--max-mb', type=float, default=4.0, help='上传扫描的最大负载 (MB)')
+    parser.add_argument('--budget-ms', type=float, default=300, help='单次上传的时间预算 (毫秒)')
+    parser.add_argument('--output', type=str, help='将探测结果保存为JSON')
+    args = parser.parse_args()
+
+    if args.perf:
+        run_perf_probe(args.url, args.samples, args.max_mb, args.budget_ms, args.output)
+        return
+
     print("\n" + "🔧" * 30)
     print("   Android模拟器连接问题诊断工具")
     print("🔧" * 30)
@@ -0,0 +1,250 @@
+"""
+Lean serving engine for the Garbage Classification API
+Runs the loaded YOLOv8 network directly: letterbox into preallocated
+per-shape buffers, one forward pass, batched NMS, and plain NumPy outputs.
+Bypasses the Ultralytics predictor (argument merging, source detection,
+Results objects and per-box tensors).
+"""
+
+import sys
+import json
+import argparse
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+import torch
+from torchvision.ops import batched_nms
+from ultralytics import YOLO
+
+from optimize import letterbox_shape, reference_images
+from arena import InputArena, InputBuffers, PAD_VALUE
+from input_spec import model_input_size
+from tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+
+# Same limits as ultralytics.utils.ops.non_max_suppression
+MAX_NMS_CANDIDATES = 30000
+
+
+class LeanEngine:
+    """
+    Direct YOLOv8 inference on preallocated input buffers
+
+    Images are letterboxed with the predictor's geometry (fit imgsz, pad to
+    the next stride multiple), so both produce the same input tensor. The
+    letterbox buffers and float input tensors come from an InputArena keyed
+    by input shape and batch size, and are written in place.
+    """
+
+    def __init__(
+        self,
+        yolo_model,
+        device: str = 'cpu',
+        imgsz: Optional[int] = None,
+        arena: Optional[InputArena] = None
+    ):
+        """imgsz defaults to the one the predictor uses: the checkpoint's training size, else 640"""
+        self.net = yolo_model.model.eval()
+        if not self.net.is_fused():
+            self.net.fuse(verbose=False)
+        self.names = yolo_model.names
+        self.device = torch.device(device)
+        self.imgsz = imgsz or model_input_size(yolo_model)
+        self.stride = max(int(self.net.stride.max()), 32)
+        self.arena = arena if arena is not None else InputArena(device)
+
+    def bucket_for(self, img_array: np.ndarray) -> Tuple[int, int]:
+        """Input shape an image is letterboxed into, the same one the predictor uses"""
+        return letterbox_shape(img_array.shape[0], img_array.shape[1], self.imgsz, self.stride)
+
+    def preprocess(self, img_array: np.ndarray, buffers: InputBuffers, index: int = 0):
+        """
+        Letterbox an image into slot index of the buffers and fill its input tensor
+
+        Returns:
+            (scale, (pad_x, pad_y))
+        """
+        h, w = img_array.shape[:2]
+        bucket_h, bucket_w = buffers.key[:2]
+
+        scale = min(bucket_h / h, bucket_w / w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        pad_x, pad_y = (bucket_w - new_w) // 2, (bucket_h - new_h) // 2
+
+        buf = buffers.letterboxed[index]
+        buf[:pad_y] = PAD_VALUE
+        buf[pad_y + new_h:] = PAD_VALUE
+        buf[:, :pad_x] = PAD_VALUE
+        buf[:, pad_x + new_w:] = PAD_VALUE
+
+        # Resize straight into the letterbox region (an in-place ROI view)
+        region = buf[pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+        if (new_w, new_h) == (w, h):
+            region[...] = img_array
+        else:
+            resized = cv2.resize(img_array, (new_w, new_h), dst=region, interpolation=cv2.INTER_LINEAR)
+            if not np.shares_memory(resized, buf):
+                region[...] = resized
+
+        # Ultralytics treats NumPy input as BGR and flips it; detect_trash passes
+        # the decoded array straight through, so flip here too for identical results
+        tensor = buffers.tensor[index]
+        for channel in range(3):
+            tensor[channel].copy_(torch.from_numpy(buf[..., 2 - channel]))
+        tensor.div_(255.0)
+        return scale, (pad_x, pad_y)
+
+    def postprocess(
+        self,
+        prediction: torch.Tensor,
+        conf: float,
+        iou: float,
+        max_det: int,
+        classes: Optional[List[int]]
+    ):
+        """
+        Best-class filtering and class-aware NMS on a (4 + nc, anchors) head output
+
+        Returns:
+            (xyxy boxes in letterbox pixels, scores, class ids) as tensors
+        """
+        pred = prediction.transpose(0, 1)
+        scores, class_ids = pred[:, 4:].max(dim=1)
+
+        keep = scores > conf
+        if classes is not None:
+            keep &= torch.isin(class_ids, torch.tensor(classes, device=class_ids.device))
+
+        xywh, scores, class_ids = pred[keep, :4], scores[keep], class_ids[keep]
+        if scores.numel() > MAX_NMS_CANDIDATES:
+            top = scores.argsort(descending=True)[:MAX_NMS_CANDIDATES]
+            xywh, scores, class_ids = xywh[top], scores[top], class_ids[top]
+
+        boxes = torch.cat((xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2), dim=1)
+        kept = batched_nms(boxes, scores, class_ids, iou)[:max_det]
+        return boxes[kept], scores[kept], class_ids[kept]
+
+    def infer(
+        self,
+        img_array: np.ndarray,
+        conf: float = 0.25,
+        iou: float = 0.45,
+        max_det: int = 300,
+        classes: Optional[List[int]] = None
+    ):
+        """
+        Detect objects in an RGB image
+
+        Returns:
+            (boxes (n, 4) xyxy in image pixels, scores (n,), class ids (n,)) as NumPy arrays
+        """
+        buffers = self.arena.acquire(self.bucket_for(img_array))
+        try:
+            with span("batch_assembly", bucket=f"{buffers.key[0]}x{buffers.key[1]}"):
+                scale, (pad_x, pad_y) = self.preprocess(img_array, buffers)
+
+            with span("forward"), torch.inference_mode():
+                output = self.net(buffers.tensor)
+                prediction = output[0] if isinstance(output, (list, tuple)) else output
+                boxes, scores, class_ids = self.postprocess(prediction[0].float(), conf, iou, max_det, classes)
+        finally:
+            self.arena.release(buffers)
+
+        h, w = img_array.shape[:2]
+        boxes = boxes.cpu().numpy()
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / scale).clip(0, w)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / scale).clip(0, h)
+        return boxes, scores.cpu().numpy(), class_ids.cpu().numpy().astype(int)
+
+
+def _parity_images(image_dir: Optional[str] = None) -> List[np.ndarray]:
+    """Reference images plus portrait, square, 16:9 and 9:16 variants of the first one"""
+    images = reference_images(image_dir)
+    base = images[0]
+    side = min(base.shape[:2])
+    wide = cv2.resize(base, (1280, 720), interpolation=cv2.INTER_LINEAR)
+    return images + [
+        np.ascontiguousarray(base.transpose(1, 0, 2)),
+        np.ascontiguousarray(base[:side, :side]),
+        wide,
+        np.ascontiguousarray(wide.transpose(1, 0, 2))
+    ]
+
+
+def check_parity(
+    engine: LeanEngine,
+    yolo_model,
+    device: str = 'cpu',
+    image_dir: Optional[str] = None,
+    conf: float = 0.25,
+    iou: float = 0.45,
+    box_tolerance: float = 1.0,
+    score_tolerance: float = 1e-3
+) -> Dict:
+    """
+    Compare the engine against the Ultralytics predictor on a fixed image set
+
+    Every predictor detection must have an engine detection of the same
+    class within box_tolerance pixels and score_tolerance confidence, and
+    the detection counts must be equal.
+    """
+    report = {"images": 0, "detections": 0, "mismatches": 0, "max_box_diff": 0.0, "max_score_diff": 0.0}
+
+    for img in _parity_images(image_dir):
+        expected = yolo_model(img, conf=conf, iou=iou, device=device, verbose=False)[0].boxes
+        exp_boxes = expected.xyxy.cpu().numpy()
+        exp_scores = expected.conf.cpu().numpy()
+        exp_classes = expected.cls.cpu().numpy().astype(int)
+
+        boxes, scores, classes = engine.infer(img, conf=conf, iou=iou)
+
+        report["images"] += 1
+        report["detections"] += len(exp_boxes)
+        if len(boxes) != len(exp_boxes):
+            report["mismatches"] += abs(len(boxes) - len(exp_boxes))
+
+        unmatched = list(range(len(boxes)))
+        for box, score, cls in zip(exp_boxes, exp_scores, exp_classes):
+            candidates = [i for i in unmatched if classes[i] == cls]
+            if not candidates:
+                report["mismatches"] += 1
+                continue
+            best = min(candidates, key=lambda i: np.abs(boxes[i] - box).max())
+            box_diff = float(np.abs(boxes[best] - box).max())
+            score_diff = float(abs(scores[best] - score))
+            report["max_box_diff"] = max(report["max_box_diff"], round(box_diff, 4))
+            report["max_score_diff"] = max(report["max_score_diff"], round(score_diff, 6))
+            if box_diff > box_tolerance or score_diff > score_tolerance:
+                report["mismatches"] += 1
+            unmatched.remove(best)
+
+    report["passed"] = report["mismatches"] == 0
+    return report
+
+
+def main():
+    """Check engine parity against the Ultralytics predictor for a model file"""
+    parser = argparse.ArgumentParser(description="Compare the lean engine with the Ultralytics predictor")
+    parser.add_argument('--model', type=str, required=True, help='Path to model weights (.pt)')
+    parser.add_argument('--images', type=str, help='Directory of test images (default: synthetic)')
+    parser.add_argument('--device', type=str, default='cpu', help='Device (default: cpu)')
+    parser.add_argument('--conf', type=float, default=0.25, help='Confidence threshold')
+    parser.add_argument('--iou', type=float, default=0.45, help='NMS IoU threshold')
+    args = parser.parse_args()
+
+    yolo_model = YOLO(args.model)
+    yolo_model.to(args.device)
+    engine = LeanEngine(yolo_model, args.device)
+
+    report = check_parity(engine, yolo_model, args.device, args.images, args.conf, args.iou)
+    print(json.dumps(report, indent=2))
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
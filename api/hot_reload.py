@@ -0,0 +1,140 @@
+"""
+Zero-downtime model hot reload
+Loads and warms a new model in the background, atomically swaps it in for
+new requests, and frees the old model once its in-flight requests drain
+"""
+
+import gc
+import time
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+
+import torch
+
+
+logger = logging.getLogger(__name__)
+
+
+class ModelVersion:
+    """A loaded model plus the identity reported to clients"""
+
+    def __init__(self, model, model_id: str, fingerprint: str, model_path: str, engine=None):
+        self.model = model
+        self.engine = engine  # Optional LeanEngine sharing the model's network
+        self.model_id = model_id
+        self.fingerprint = fingerprint
+        self.model_path = model_path
+        self.version = f"{model_id}@{fingerprint}"
+        self.loaded_at = time.time()
+        self.in_flight = 0
+        self.retired = False
+
+
+class ModelRegistry:
+    """
+    Holds the model version serving new requests
+
+    Requests pin the current version with acquire() and unpin it with
+    release(). reload() builds the replacement on a background thread and
+    swaps it in under a lock, so a request sees either the old or the new
+    model, never a half-loaded one. A retired version is freed when its last
+    in-flight request releases it. on_install is called after a version
+    replaces another, to drop state derived from the old model's output.
+    """
+
+    def __init__(self, on_install: Optional[Callable[[ModelVersion], None]] = None):
+        self.current: Optional[ModelVersion] = None
+        self.on_install = on_install
+        self._lock = threading.Lock()
+        self._reload_thread = None
+        self.state = "idle"
+        self.last_error = None
+        self.history: List[Dict] = []
+
+    def install(self, version: ModelVersion):
+        """Swap in a new version and retire the previous one"""
+        with self._lock:
+            previous = self.current
+            self.current = version
+            if previous is not None:
+                previous.retired = True
+                drained = previous.in_flight == 0
+
+        self.history.append({"version": version.version, "installed_at": version.loaded_at})
+        logger.info(f"Serving model version {version.version}")
+
+        if previous is not None:
+            if self.on_install is not None:
+                self.on_install(version)
+            if drained:
+                self._free(previous)
+            else:
+                logger.info(f"Draining {previous.in_flight} in-flight requests on {previous.version}")
+
+    def acquire(self) -> ModelVersion:
+        """Pin the current version for the duration of a request"""
+        with self._lock:
+            version = self.current
+            version.in_flight += 1
+            return version
+
+    def release(self, version: ModelVersion):
+        """Unpin a version, freeing it if it was retired and this was its last request"""
+        with self._lock:
+            version.in_flight -= 1
+            drained = version.retired and version.in_flight == 0
+
+        if drained:
+            self._free(version)
+
+    def _free(self, version: ModelVersion):
+        """Drop the model and return its memory"""
+        logger.info(f"Freeing retired model version {version.version}")
+        version.model = None
+        version.engine = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def reload(self, builder: Callable[[str], ModelVersion], model_path: str) -> bool:
+        """
+        Start loading model_path in the background
+
+        Returns:
+            False if a reload is already running, True otherwise
+        """
+        with self._lock:
+            if self.state == "loading":
+                return False
+            self.state = "loading"
+
+        def run():
+            start_time = time.time()
+            try:
+                version = builder(model_path)
+                self.install(version)
+                self.state = "idle"
+                self.last_error = None
+                logger.info(f"Hot reload finished in {time.time() - start_time:.1f}s")
+            except Exception as e:
+                self.state = "failed"
+                self.last_error = str(e)
+                logger.error(f"Hot reload of {model_path} failed, still serving "
+                             f"{self.current.version if self.current else 'nothing'}: {e}")
+
+        self._reload_thread = threading.Thread(target=run, name="model-reload", daemon=True)
+        self._reload_thread.start()
+        return True
+
+    def status(self) -> Dict:
+        """Return reload state and the serving version"""
+        current = self.current
+        return {
+            "state": self.state,
+            "serving": current.version if current else None,
+            "model_path": current.model_path if current else None,
+            "in_flight": current.in_flight if current else 0,
+            "last_error": self.last_error,
+            "history": self.history[-10:]
+        }
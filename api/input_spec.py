@@ -0,0 +1,112 @@
+"""
+Server-advertised input spec
+Tells clients the input size the active model actually uses so they can
+downscale before uploading, and estimates the bandwidth wasted by uploads
+that are much larger than that
+"""
+
+import io
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from PIL import Image
+
+
+ACCEPTED_CONTENT_TYPES = ["image/jpeg", "image/png", "image/webp", "image/bmp"]
+
+
+def model_input_size(yolo_model) -> int:
+    """Square input size the model was trained at (imgsz), 640 if unknown"""
+    imgsz = yolo_model.overrides.get("imgsz") or getattr(yolo_model.model, "args", {}).get("imgsz") or 640
+    return int(max(imgsz) if isinstance(imgsz, (list, tuple)) else imgsz)
+
+
+def max_upload_bytes() -> int:
+    return int(float(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024)
+
+
+def build_input_spec(yolo_model, buckets: Sequence[Tuple[int, int]]) -> Dict:
+    """
+    Describe the uploads the server can use without wasting bandwidth
+
+    recommended_max_side applies to uploads without an roi. An ROI crop is
+    letterboxed at full model resolution, so with an roi only the region's
+    longest side needs to fit roi_max_side.
+    """
+    input_size = model_input_size(yolo_model)
+    return {
+        "input_size": input_size,
+        "resolution_buckets": [{"height": h, "width": w} for h, w in buckets],
+        "recommended_max_side": input_size,
+        "roi_max_side": input_size,
+        "preferred_encoding": "image/jpeg",
+        "jpeg_quality": int(os.getenv("UPLOAD_JPEG_QUALITY", "90")),
+        "accepted_content_types": ACCEPTED_CONTENT_TYPES,
+        "max_upload_bytes": max_upload_bytes(),
+        "max_batch_images": int(os.getenv("MAX_BATCH_IMAGES", "16")),
+        "roi_supported": True
+    }
+
+
+def image_dimensions(contents: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from the image header without decoding pixels"""
+    try:
+        return Image.open(io.BytesIO(contents)).size
+    except Exception:
+        return None
+
+
+class UploadWasteTracker:
+    """
+    Estimates bytes that client-side downscaling would have saved
+
+    Encoded size is assumed to scale with pixel count, so an upload whose
+    longest side is k times the recommended side needed about 1/k^2 of its
+    bytes. With an ROI only the region has to fit, so the region's longest
+    side is compared instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.oversized = 0
+        self.uploaded_bytes = 0
+        self.wasted_bytes = 0
+
+    def observe(
+        self,
+        nbytes: int,
+        dimensions: Optional[Tuple[int, int]],
+        max_side: int,
+        roi: Optional[Tuple[float, float, float, float]] = None
+    ) -> int:
+        """Record one upload and return its estimated wasted bytes"""
+        wasted = 0
+        if dimensions is not None:
+            longest = max(dimensions)
+            if roi is not None:
+                x1, y1, x2, y2 = roi
+                longest = max(min(x2, dimensions[0]) - x1, min(y2, dimensions[1]) - y1)
+            if longest > max_side:
+                wasted = int(nbytes * (1 - (max_side / longest) ** 2))
+
+        with self._lock:
+            self.uploads += 1
+            self.uploaded_bytes += nbytes
+            self.wasted_bytes += wasted
+            if wasted:
+                self.oversized += 1
+        return wasted
+
+    def stats(self) -> Dict:
+        """Return upload volume and estimated waste"""
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "oversized_uploads": self.oversized,
+                "uploaded_mb": round(self.uploaded_bytes / 1024**2, 2),
+                "estimated_wasted_mb": round(self.wasted_bytes / 1024**2, 2),
+                "wasted_fraction": round(self.wasted_bytes / self.uploaded_bytes, 4) if self.uploaded_bytes else 0.0,
+                "mean_wasted_kb_per_upload": round(self.wasted_bytes / self.uploads / 1024, 1) if self.uploads else 0.0
+            }
@@ -0,0 +1,85 @@
+"""
+Machine performance profile
+Reads the profile written by `python scripts/verify_environment.py --perf`
+(decode throughput, forward latency per backend, thread scaling, disk
+throughput) and applies its recommended defaults to the API and training
+"""
+
+import os
+import json
+import socket
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_VERSION = 1
+DEFAULT_PROFILE_PATH = Path(__file__).parent.parent / "configs" / "machine_profile.json"
+
+
+def profile_path() -> Path:
+    """MACHINE_PROFILE if set, otherwise configs/machine_profile.json"""
+    return Path(os.getenv("MACHINE_PROFILE", "").strip() or DEFAULT_PROFILE_PATH)
+
+
+def load_machine_profile(path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Load the machine profile, or None if there is none or it is unusable
+
+    A profile measured on another host is still returned (a copied
+    deployment image is a common case) but logged as a warning.
+    """
+    path = Path(path) if path else profile_path()
+    if not path.exists():
+        return None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable machine profile {path}: {e}")
+        return None
+
+    if profile.get("profile_version") != PROFILE_VERSION:
+        logger.warning(f"Ignoring machine profile {path}: version {profile.get('profile_version')}, "
+                       f"expected {PROFILE_VERSION}; re-run scripts/verify_environment.py --perf")
+        return None
+
+    hostname = profile.get("host", {}).get("hostname")
+    if hostname and hostname != socket.gethostname():
+        logger.warning(f"Machine profile {path} was measured on {hostname}, not {socket.gethostname()}")
+    return profile
+
+
+def apply_api_defaults(profile: Optional[Dict]) -> Dict[str, str]:
+    """
+    Export the profile's recommended serving settings as environment
+    variables, leaving any variable that is already set untouched
+
+    Returns:
+        The settings that were applied
+    """
+    if not profile:
+        return {}
+
+    applied = {}
+    for key, value in profile.get("recommendations", {}).get("api", {}).items():
+        if key not in os.environ:
+            os.environ[key] = str(value)
+            applied[key] = str(value)
+
+    # OMP_NUM_THREADS is read when torch is imported, so apply it directly as well
+    if "OMP_NUM_THREADS" in applied:
+        import torch
+        torch.set_num_threads(int(applied["OMP_NUM_THREADS"]))
+    return applied
+
+
+def training_defaults(profile: Optional[Dict]) -> Dict:
+    """Recommended training settings (batch, workers, device), empty without a profile"""
+    if not profile:
+        return {}
+    return dict(profile.get("recommendations", {}).get("training", {}))
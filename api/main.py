@@ -5,8 +5,15 @@ Provides API endpoint for real-time trash detection and classification
 
 import os
 import json
+import math
 import io
+import sys
 import time
+import signal
+import asyncio
+import hashlib
+import threading
+import functools
 from pathlib import Path
 from typing import List, Dict, Optional
 import logging
@@ -14,13 +21,34 @@ import logging
 import numpy as np
 import cv2
 from PIL import Image
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request, Header
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from ultralytics import YOLO
 import torch
 
+# Allow sibling modules to be imported when started from the project root
+sys.path.insert(0, str(Path(__file__).parent))
+
+from result_store import checkpoint_fingerprint, make_result_key, create_result_store_from_env
+from cascade import CascadeDetector, cascade_settings_from_env
+from prefilter import create_prefilter_from_env
+from temporal import FrameSignature, create_temporal_cache_from_env
+from optimize import optimize_model, optimizations_from_env, reference_images, letterbox, RESOLUTION_BUCKETS
+from weights import load_inference_model, weights_fingerprint
+from hot_reload import ModelRegistry, ModelVersion
+from engine import LeanEngine, check_parity
+from arena import InputArena
+from decode_pool import create_decode_pool_from_env
+from scheduler import LANES, QueueFullError, create_scheduler_from_env
+from capture import create_capture_from_env
+from input_spec import UploadWasteTracker, build_input_spec, image_dimensions, max_upload_bytes, model_input_size
+from memory_probe import create_memory_probe_from_env
+from machine_profile import apply_api_defaults, load_machine_profile, profile_path
+from schemas import BatchDetectionResponse, BatchItemResult, Detection, DetectionResponse
+from tracing import create_exporter_from_env, end_trace, record_span, span, start_trace, traced
+
 
 # Configure logging with more detailed format
 logging.basicConfig(
@@ -30,57 +58,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-# Pydantic models for API response
-class Detection(BaseModel):
-    """Single object detection result"""
-    bbox_xyxy: List[float] = Field(
-        ...,
-        description="Bounding box coordinates [x1, y1, x2, y2]"
-    )
-    confidence: float = Field(
-        ...,
-        ge=0.0,
-        le=1.0,
-        description="Detection confidence score"
-    )
-    specific_name: str = Field(
-        ...,
-        description="Specific trash category (L1 label)"
-    )
-    general_category: str = Field(
-        ...,
-        description="General disposal category (L2 label): Recycle/Trash/Hazardous/Organic"
-    )
-
-
-class DetectionResponse(BaseModel):
-    """API response model"""
-    status: str = Field(
-        default="success",
-        description="Request status"
-    )
-    detection_count: int = Field(
-        ...,
-        ge=0,
-        description="Number of objects detected"
-    )
-    detections: List[Detection] = Field(
-        default_factory=list,
-        description="List of detected objects"
-    )
-    inference_time_ms: float = Field(
-        ...,
-        description="Model inference time in milliseconds"
-    )
-
-
-class ErrorResponse(BaseModel):
-    """Error response model"""
-    status: str = "error"
-    message: str
-    detail: Optional[str] = None
-
-
 # Initialize FastAPI app
 app = FastAPI(
     title="Garbage Classification API",
@@ -97,6 +74,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "traceresponse"],
 )
 
 # Request logging middleware
@@ -119,22 +97,108 @@ async def log_requests(request: Request, call_next):
         raise
 
 
+# Request tracing middleware (outermost, so the root span covers the whole request)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace each request's stages; report them in Server-Timing and export sampled traces"""
+    if not SERVER_TIMING and trace_exporter is None:
+        return await call_next(request)
+
+    trace, token = start_trace(
+        f"{request.method} {request.url.path}", request.headers.get("traceparent"), TRACE_SAMPLE_RATE
+    )
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        end_trace(token)
+        trace.finish()
+        if trace_exporter is not None and trace.sampled:
+            trace.root.attributes.update(
+                {"http.method": request.method, "http.target": request.url.path, "http.status_code": status_code}
+            )
+            trace_exporter.export(trace)
+
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = trace.server_timing()
+    response.headers["traceresponse"] = trace.traceresponse()
+    return response
+
+
 # Global variables for model and category mapping
-model = None
+# Model version serving new requests (hot-reloadable)
+serving = ModelRegistry(on_install=lambda version: reset_frame_state(version))
 category_mapping = None
 device = 'cuda'  # GPU/CPU device
+result_store = None  # Optional persistent result store shared across workers
+cascade = None  # Optional small->large cascade (escalation model and counters)
+prefilter = None  # Optional empty-scene pre-filter for fixed camera streams
+temporal_cache = None  # Optional per-session reuse of near-identical frames
+optimization_report = {}  # Which graph optimizations passed the fp32 parity check, per model
+engine_report = {}  # Lean engine parity check against the Ultralytics predictor, per model
+input_arena = None  # Reusable preprocessing buffers shared by all lean engines
+decode_pool = None  # Worker processes that decode uploads outside the GIL
+scheduler = None  # Priority lanes feeding the inference worker threads
+predictor_lock = threading.Lock()  # The Ultralytics predictor is not safe to call concurrently
+traffic_capture = None  # Sampled request recorder for replay (CAPTURE_DIR)
+upload_waste = UploadWasteTracker()  # Bandwidth that client-side downscaling would have saved
+trace_exporter = None  # Optional span export to a JSONL file or collector (TRACE_FILE / TRACE_COLLECTOR_URL)
+memory_probe = None  # RSS / fd / allocator sampling for /debug/memory (tracemalloc when TRACEMALLOC_FRAMES > 0)
+machine_profile_settings = {}  # Defaults taken from the machine profile (scripts/verify_environment.py --perf)
+
+# Server-side inference defaults (overridable per request)
+DEFAULT_CONFIDENCE = float(os.getenv("CONFIDENCE_THRESHOLD", "0.25"))
+DEFAULT_IOU = float(os.getenv("IOU_THRESHOLD", "0.45"))
+DEFAULT_MAX_DETECTIONS = int(os.getenv("MAX_DETECTIONS", "300"))
+
+
+def resolve_project_path(path) -> Path:
+    """Resolve a path relative to the project root unless it is absolute"""
+    path = Path(path)
+    if not path.is_absolute():
+        path = Path(__file__).parent.parent / path
+    return path
+
+
+def open_model(model_path: Path):
+    """
+    Open a model file on the current device
 
+    Converted *.safetensors weights are memory-mapped; *.pt checkpoints are
+    unpickled by Ultralytics.
 
-def load_model(model_path: str = None):
-    """Load YOLOv8 model"""
-    global model, device
+    Returns:
+        (YOLO model, checkpoint fingerprint)
+    """
+    if model_path.suffix == ".safetensors":
+        yolo_model = load_inference_model(model_path)
+        fingerprint = weights_fingerprint(model_path)
+    else:
+        yolo_model = YOLO(str(model_path))
+        fingerprint = checkpoint_fingerprint(model_path)
+
+    yolo_model.to(device)
+    return yolo_model, fingerprint
+
+
+def warmup_model(yolo_model):
+    """Run one prediction per resolution bucket so the first request pays no setup cost"""
+    img = reference_images(count=1)[0]
+    for bucket in RESOLUTION_BUCKETS:
+        padded, _, _ = letterbox(img, bucket)
+        yolo_model(padded, device=device, verbose=False)
 
-    if model_path is None:
-        # Default model path
-        project_root = Path(__file__).parent.parent
-        model_path = project_root / "models" / "garbage_yolov8s" / "weights" / "best.pt"
 
-    model_path = Path(model_path)
+def build_model_version(model_path) -> ModelVersion:
+    """Open, optimize and warm a model so it is ready to serve"""
+    global input_arena
+
+    model_path = resolve_project_path(model_path)
 
     if not model_path.exists():
         logger.error(f"Model not found: {model_path}")
@@ -142,6 +206,53 @@ def load_model(model_path: str = None):
 
     logger.info(f"Loading model from: {model_path}")
 
+    start_time = time.time()
+    yolo_model, fingerprint = open_model(model_path)
+    model_id = f"{model_path.parent.parent.name}/{model_path.name}"
+    logger.info(f"Model opened in {(time.time() - start_time) * 1000:.1f}ms")
+
+    # Prepare optimized inference graph (optional, verified against fp32)
+    optimizations = optimizations_from_env()
+    if optimizations:
+        optimization_report[model_id] = optimize_model(
+            yolo_model, optimizations, device, image_dir=os.getenv("OPTIMIZE_CHECK_IMAGES")
+        )
+
+    warmup_model(yolo_model)
+
+    # Lean serving engine (optional, only enabled if it matches the predictor)
+    engine = None
+    if os.getenv("INFERENCE_ENGINE", "ultralytics").lower() == "lean":
+        if input_arena is None:
+            input_arena = InputArena(device, max_pooled_per_key=int(os.getenv("INPUT_ARENA_MAX_POOLED", "8")))
+        engine = LeanEngine(yolo_model, device, arena=input_arena)
+        engine_report[model_id] = check_parity(
+            engine, yolo_model, device, image_dir=os.getenv("OPTIMIZE_CHECK_IMAGES")
+        )
+        if engine_report[model_id]["passed"]:
+            logger.info(f"Lean engine enabled for {model_id} ({engine_report[model_id]})")
+        else:
+            logger.warning(f"Lean engine disabled for {model_id}: parity check failed ({engine_report[model_id]})")
+            engine = None
+
+    if result_store is not None:
+        result_store.invalidate_stale(model_id, fingerprint)
+
+    return ModelVersion(yolo_model, model_id, fingerprint, str(model_path), engine=engine)
+
+
+def load_model(model_path: str = None):
+    """Load YOLOv8 model"""
+    global device
+
+    if model_path is None:
+        model_path = os.getenv("MODEL_PATH")
+
+    if model_path is None:
+        # Default model path
+        project_root = Path(__file__).parent.parent
+        model_path = project_root / "models" / "garbage_yolov8s" / "weights" / "best.pt"
+
     try:
         # Determine device (GPU or CPU)
         if torch.cuda.is_available():
@@ -153,17 +264,46 @@ def load_model(model_path: str = None):
             logger.warning("GPU not available, using CPU (slower inference)")
 
         # Load model and move to device
-        model = YOLO(str(model_path))
-        model.to(device)
+        version = build_model_version(model_path)
+        serving.install(version)
 
-        logger.info(f"Model loaded successfully on device: {device}")
-        return model
+        logger.info(f"Model loaded successfully on device: {device} ({version.version})")
+        return version.model
 
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
         raise
 
 
+def reset_frame_state(version: ModelVersion):
+    """Drop stream backgrounds learned from the previous model's verdicts"""
+    if prefilter is not None:
+        prefilter.reset()
+        logger.info(f"🧹 Pre-filter backgrounds reset for {version.version}")
+
+
+def reload_model(model_path: str = None) -> bool:
+    """Load a new model in the background and swap it in once warm"""
+    model_path = model_path or serving.current.model_path
+    logger.info(f"🔄 Hot reload requested: {model_path}")
+    return serving.reload(build_model_version, model_path)
+
+
+def load_cascade(model_path: str, min_confidence: float = 0.5, conflict_iou: float = 0.5):
+    """Load the large escalation model for cascade inference"""
+    global cascade
+
+    version = build_model_version(model_path)
+
+    cascade = CascadeDetector(version.model, min_confidence=min_confidence, conflict_iou=conflict_iou)
+    cascade.model_id = version.model_id
+    cascade.fingerprint = version.fingerprint
+    cascade.engine = version.engine
+
+    logger.info(f"Cascade enabled: {serving.current.model_id} -> {cascade.model_id} (min confidence {min_confidence})")
+    return cascade
+
+
 def load_category_mapping(mapping_path: str = None):
     """Load category mapping from JSON file"""
     global category_mapping
@@ -197,17 +337,61 @@ def load_category_mapping(mapping_path: str = None):
 @app.on_event("startup")
 async def startup_event():
     """Initialize model and mappings on startup"""
+    global result_store, prefilter, temporal_cache, decode_pool, scheduler, traffic_capture, trace_exporter
+    global memory_probe, machine_profile_settings
+
     logger.info("="*60)
     logger.info("Starting Garbage Classification API")
     logger.info("="*60)
 
     try:
+        # Measured defaults for this host; explicit environment settings take precedence
+        machine_profile_settings = apply_api_defaults(load_machine_profile())
+        if machine_profile_settings:
+            logger.info(f"📐 Machine profile {profile_path()} defaults: {machine_profile_settings}")
+
+        # Open persistent result store (optional)
+        result_store = create_result_store_from_env()
+
         # Load model
         load_model()
 
+        # Load escalation model for cascade mode (optional)
+        cascade_settings = cascade_settings_from_env()
+        cascade_model_path = cascade_settings.pop("model_path")
+        if cascade_model_path is not None:
+            load_cascade(cascade_model_path, **cascade_settings)
+
         # Load category mapping
         load_category_mapping()
 
+        # Empty-scene pre-filter for camera streams (optional)
+        prefilter = create_prefilter_from_env()
+
+        # Temporal reuse for near-identical frames within a session (optional)
+        temporal_cache = create_temporal_cache_from_env()
+
+        # Decode uploads in worker processes (optional)
+        decode_pool = create_decode_pool_from_env()
+
+        # Interactive / bulk lanes in front of the inference workers
+        scheduler = create_scheduler_from_env()
+
+        # Record sampled requests for replay (optional)
+        traffic_capture = create_capture_from_env()
+
+        # Export request traces (optional)
+        trace_exporter = create_exporter_from_env()
+
+        # Memory sampling; the tracemalloc baseline is taken after the model is loaded and warm
+        memory_probe = create_memory_probe_from_env()
+
+        # SIGHUP reloads the model from its current path
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_model)
+        except (AttributeError, NotImplementedError):
+            logger.info("SIGHUP reload not supported on this platform, use POST /admin/reload")
+
         logger.info("API initialized successfully!")
         logger.info("="*60)
 
@@ -217,6 +401,13 @@ async def startup_event():
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop worker processes"""
+    if decode_pool is not None:
+        decode_pool.shutdown()
+
+
 @app.get("/", tags=["Health"])
 async def root():
     """Root endpoint - API health check"""
@@ -228,6 +419,8 @@ async def root():
         # "dataset": "TACO",
         "endpoints": {
             "detection": "/v1/detect_trash",
+            "batch_detection": "/v1/detect_trash_batch",
+            "input_spec": "/v1/input_spec",
             "docs": "/docs",
             "health": "/health"
         }
@@ -242,7 +435,9 @@ async def health_check():
 
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
+        "model_loaded": serving.current is not None,
+        "model_version": serving.current.version if serving.current else None,
+        "queue_depth": scheduler.queue_depth() if scheduler is not None else 0,
         "category_mapping_loaded": category_mapping is not None,
         "gpu_available": gpu_available,
         "gpu_name": gpu_name,
@@ -250,18 +445,242 @@ async def health_check():
     }
 
 
+def predict_arrays(yolo_model, engine, img_array: np.ndarray, params: Dict):
+    """
+    Run one model on an image
+
+    Returns:
+        (xyxy boxes (n, 4), confidences (n,), class ids (n,)) as NumPy arrays
+    """
+    if engine is not None:
+        return engine.infer(img_array, **params)
+
+    with predictor_lock:
+        boxes = yolo_model(img_array, **params, device=device)[0].boxes
+    return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)
+
+
+def run_inference(active: ModelVersion, img_array: np.ndarray, params: Dict, submitted_at: Optional[float] = None):
+    """
+    Inference job executed by a scheduler worker: serving model, then the
+    cascade model if the result is uncertain
+
+    Returns:
+        (boxes, confidences, class ids, model that produced them, inference time in ms)
+    """
+    if submitted_at is not None:
+        record_span("queue_wait", submitted_at, time.perf_counter())
+
+    start_time = time.time()
+    logger.info(f"🤖 Starting model inference on {device}...")
+
+    serving_model = active.model
+    with span("inference", model=active.model_id):
+        boxes, confidences, class_ids = predict_arrays(serving_model, active.engine, img_array, params)
+
+    # Cascade mode: re-run uncertain images on the large model
+    if cascade is not None:
+        reason = cascade.escalation_reason(boxes, confidences, class_ids)
+        cascade.record(reason)
+        if reason is not None:
+            logger.info(f"⬆️  Escalating to cascade model {cascade.model_id} ({reason})")
+            serving_model = cascade.large_model
+            with span("inference", model=cascade.model_id, escalation=reason):
+                boxes, confidences, class_ids = predict_arrays(serving_model, cascade.engine, img_array, params)
+
+    inference_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+    logger.info(f"⚡ Model inference completed in {inference_time:.2f}ms")
+    return boxes, confidences, class_ids, serving_model, inference_time
+
+
+def resolve_request_class(x_request_class: Optional[str], x_api_key: Optional[str]) -> str:
+    """Pick the scheduling lane: keys in BULK_API_KEYS are always bulk, otherwise the header decides"""
+    bulk_keys = {key.strip() for key in os.getenv("BULK_API_KEYS", "").split(',') if key.strip()}
+    if x_api_key and x_api_key in bulk_keys:
+        return "bulk"
+
+    if x_request_class is None:
+        return LANES[0]
+
+    request_class = x_request_class.strip().lower()
+    if request_class not in LANES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid X-Request-Class: {x_request_class}. Expected one of: {', '.join(LANES)}"
+        )
+    return request_class
+
+
+def release_request(active: ModelVersion, decoded):
+    """Return a request's decoded image and pinned model version"""
+    if decoded is not None:
+        decoded.close()
+    serving.release(active)
+
+
+def parse_roi(roi: str):
+    """Parse an "x1,y1,x2,y2" region of interest in original image pixels"""
+    try:
+        x1, y1, x2, y2 = (float(v) for v in roi.split(','))
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid roi: {roi}. Expected 'x1,y1,x2,y2' in image pixels."
+        )
+
+    if not all(math.isfinite(v) for v in (x1, y1, x2, y2)):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid roi: {roi}. Coordinates must be finite numbers."
+        )
+
+    if x1 < 0 or y1 < 0 or x2 <= x1 or y2 <= y1:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid roi: {roi}. Coordinates must be non-negative with x2 > x1 and y2 > y1."
+        )
+
+    return x1, y1, x2, y2
+
+
+def resolve_inference_params(
+    names: Dict[int, str],
+    conf: Optional[float],
+    iou: Optional[float],
+    max_det: Optional[int],
+    classes: Optional[str],
+    categories: Optional[str]
+) -> Dict:
+    """
+    Validate per-request inference parameters and fill in server defaults
+
+    L1 class names and L2 category names are resolved to model class IDs so
+    that filtering happens inside NMS rather than after post-processing.
+    """
+    conf = DEFAULT_CONFIDENCE if conf is None else conf
+    iou = DEFAULT_IOU if iou is None else iou
+    max_det = DEFAULT_MAX_DETECTIONS if max_det is None else max_det
+
+    if not 0.0 <= conf <= 1.0:
+        raise HTTPException(status_code=400, detail=f"Invalid conf: {conf}. Must be between 0 and 1.")
+    if not 0.0 < iou <= 1.0:
+        raise HTTPException(status_code=400, detail=f"Invalid iou: {iou}. Must be in (0, 1].")
+    if not 1 <= max_det <= DEFAULT_MAX_DETECTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid max_det: {max_det}. Must be between 1 and {DEFAULT_MAX_DETECTIONS}."
+        )
+
+    params = {"conf": conf, "iou": iou, "max_det": max_det, "classes": None}
+
+    if classes or categories:
+        name_to_id = {name: class_id for class_id, name in names.items()}
+        allowed = set(name_to_id.values())
+
+        if classes:
+            requested = [c.strip().upper() for c in classes.split(',') if c.strip()]
+            unknown = [c for c in requested if c not in name_to_id]
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown classes: {', '.join(unknown)}. Supported: {', '.join(name_to_id)}"
+                )
+            allowed &= {name_to_id[c] for c in requested}
+
+        if categories:
+            known_categories = {v.lower(): v for v in category_mapping.values()}
+            requested = [c.strip().lower() for c in categories.split(',') if c.strip()]
+            unknown = [c for c in requested if c not in known_categories]
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown categories: {', '.join(unknown)}. "
+                           f"Supported: {', '.join(sorted(set(known_categories.values())))}"
+                )
+            wanted = {known_categories[c] for c in requested}
+            allowed &= {name_to_id[n] for n, cat in category_mapping.items() if cat in wanted and n in name_to_id}
+
+        params["classes"] = sorted(allowed)
+
+    return params
+
+
+# Request fields recorded by traffic capture; API keys are deliberately left out
+CAPTURED_FIELDS = ("roi", "conf", "iou", "max_det", "classes", "categories",
+                   "x_stream_id", "x_session_id", "x_request_class")
+
+# Status recorded for requests the client abandoned (nginx's "client closed request")
+CLIENT_CLOSED_REQUEST = 499
+
+
+def captured(endpoint):
+    """Record a sample of calls to a detection endpoint with traffic capture"""
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        if traffic_capture is None or not traffic_capture.sampled():
+            return await endpoint(**kwargs)
+
+        arrival = time.time()
+        start_time = time.perf_counter()
+        status, response = 200, None
+        try:
+            response = await endpoint(**kwargs)
+            return response
+        except HTTPException as e:
+            status = e.status_code
+            raise
+        except asyncio.CancelledError:
+            status = CLIENT_CLOSED_REQUEST
+            raise
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            image = kwargs["image"]
+            try:
+                await image.seek(0)
+                contents = await image.read()
+            except Exception:
+                contents = None
+
+            traffic_capture.record({
+                "arrival": arrival,
+                "latency_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                "status": status,
+                "filename": image.filename,
+                "content_type": image.content_type,
+                "fields": {name: kwargs.get(name) for name in CAPTURED_FIELDS if kwargs.get(name) is not None},
+                "response": response.model_dump() if response is not None else None
+            }, contents, image.content_type)
+
+    return wrapper
+
+
 @app.post(
     "/v1/detect_trash",
     response_model=DetectionResponse,
     responses={
         200: {"description": "Successful detection"},
         400: {"description": "Invalid input"},
+        413: {"description": "Upload larger than MAX_UPLOAD_MB"},
         500: {"description": "Internal server error"}
     },
     tags=["Detection"]
 )
+@captured
+@traced
 async def detect_trash(
-    image: UploadFile = File(..., description="Image file to analyze")
+    image: UploadFile = File(..., description="Image file to analyze"),
+    roi: Optional[str] = Form(None, description="Region of interest 'x1,y1,x2,y2' in image pixels"),
+    conf: Optional[float] = Form(None, description="Confidence threshold (default from CONFIDENCE_THRESHOLD)"),
+    iou: Optional[float] = Form(None, description="NMS IoU threshold (default from IOU_THRESHOLD)"),
+    max_det: Optional[int] = Form(None, description="Maximum number of detections to return"),
+    classes: Optional[str] = Form(None, description="Comma-separated L1 class names to keep"),
+    categories: Optional[str] = Form(None, description="Comma-separated L2 categories to keep"),
+    x_stream_id: Optional[str] = Header(None, description="Camera stream ID for the empty-scene pre-filter"),
+    x_session_id: Optional[str] = Header(None, description="Session ID for reusing results across similar frames"),
+    x_request_class: Optional[str] = Header(None, description="Scheduling lane: interactive (default) or bulk"),
+    x_api_key: Optional[str] = Header(None, description="API key; keys listed in BULK_API_KEYS are scheduled as bulk")
 ):
     """
     Detect and classify trash in uploaded image
@@ -279,55 +698,181 @@ async def detect_trash(
             detail=f"Invalid file type: {image.content_type}. Please upload an image file."
         )
 
+    roi_box = parse_roi(roi) if roi else None
+    lane = resolve_request_class(x_request_class, x_api_key)
+
+    # Pin the serving model version; a hot reload only affects later requests
+    active = serving.acquire()
+    decoded = None
+    job = None
+
     try:
+        params = resolve_inference_params(active.model.names, conf, iou, max_det, classes, categories)
+
+        # Filters that exclude every class can never produce a detection
+        if params["classes"] == []:
+            return DetectionResponse(
+                status="success",
+                detection_count=0,
+                detections=[],
+                inference_time_ms=0.0,
+                model_version=active.version
+            )
+
         # Read image file
         logger.info(f"📥 Receiving image: {image.filename} ({image.content_type})")
-        contents = await image.read()
+        # upload_read (receiving and parsing the form) is recorded before the endpoint runs
+        with span("upload_body"):
+            contents = await image.read()
         file_size_mb = len(contents) / (1024 * 1024)
         logger.info(f"📦 Image size: {file_size_mb:.2f} MB")
 
-        image_bytes = io.BytesIO(contents)
-
-        # Convert to PIL Image
-        logger.info("🖼️  Converting to PIL Image...")
-        pil_image = Image.open(image_bytes)
+        if len(contents) > max_upload_bytes():
+            raise HTTPException(
+                status_code=413,
+                detail=f"Image too large: {file_size_mb:.1f} MB (max {max_upload_bytes() / 1024**2:.0f} MB). "
+                       f"Downscale it as described by /v1/input_spec."
+            )
+
+        dimensions = image_dimensions(contents)
+        if roi_box is not None and dimensions is not None:
+            if roi_box[0] >= dimensions[0] or roi_box[1] >= dimensions[1]:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid roi: {roi}. It lies outside the {dimensions[0]}x{dimensions[1]} image."
+                )
 
-        # Convert to numpy array (RGB)
-        logger.info("🔄 Converting to numpy array...")
-        img_array = np.array(pil_image)
+        waste_bytes = upload_waste.observe(
+            len(contents), dimensions, model_input_size(active.model), roi_box
+        )
 
-        # If image has alpha channel, remove it
-        if img_array.shape[-1] == 4:
-            logger.info("🎨 Removing alpha channel...")
-            img_array = img_array[..., :3]
+        # Serve from the persistent result store when this exact request was seen before
+        cache_key = None
+        if result_store is not None:
+            cache_params = dict(params)
+            if cascade is not None:
+                cache_params["cascade"] = f"{cascade.model_id}@{cascade.fingerprint}"
+            if roi_box is not None:
+                cache_params["roi"] = roi_box
+
+            image_hash = hashlib.sha256(contents).hexdigest()
+            cache_key = make_result_key(image_hash, active.model_id, active.fingerprint, cache_params)
+            cached_result = await asyncio.to_thread(result_store.get, cache_key)
+            if cached_result is not None:
+                logger.info("💾 Result store hit")
+                cached_result.update(cached=True, inference_time_ms=0.0)
+                return DetectionResponse(**cached_result)
+
+        roi_offset = (0.0, 0.0)
+        decode_scale = (1.0, 1.0)
+        frame_size = None
+
+        with span("decode", pool=decode_pool is not None):
+            if decode_pool is not None:
+                # Decode, crop and downscale in a worker process; pixels come back via shared memory
+                decoded = await decode_pool.decode(contents, roi_box)
+                img_array, decode_scale, roi_offset = decoded.array, decoded.scale, decoded.offset
+                frame_size = (
+                    round(img_array.shape[1] / decode_scale[0]),
+                    round(img_array.shape[0] / decode_scale[1])
+                )
+            else:
+                image_bytes = io.BytesIO(contents)
+
+                # Convert to PIL Image
+                logger.info("🖼️  Converting to PIL Image...")
+                pil_image = Image.open(image_bytes)
+
+                # Crop to the client's region of interest before any pixel conversion,
+                # so only that region is converted and letterboxed at full model resolution
+                if roi_box is not None:
+                    x1, y1, x2, y2 = roi_box
+                    crop_box = (
+                        int(min(x1, pil_image.width - 1)),
+                        int(min(y1, pil_image.height - 1)),
+                        int(min(max(x2, x1 + 1), pil_image.width)),
+                        int(min(max(y2, y1 + 1), pil_image.height))
+                    )
+                    logger.info(f"✂️  Cropping to ROI {crop_box} of {pil_image.width}x{pil_image.height}")
+                    pil_image = pil_image.crop(crop_box)
+                    roi_offset = (float(crop_box[0]), float(crop_box[1]))
+
+                # Convert to numpy array (RGB)
+                logger.info("🔄 Converting to numpy array...")
+                img_array = np.array(pil_image)
+
+                # If image has alpha channel, remove it
+                if img_array.shape[-1] == 4:
+                    logger.info("🎨 Removing alpha channel...")
+                    img_array = img_array[..., :3]
 
         logger.info(f"✅ Image preprocessed | Shape: {img_array.shape} | Device: {device}")
 
-        # Run inference on GPU/CPU
-        start_time = time.time()
-        logger.info(f"🤖 Starting model inference on {device}...")
-
-        results = model(img_array, conf=0.25, iou=0.45, device=device)  # conf threshold, iou threshold
-
-        inference_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-        logger.info(f"⚡ Model inference completed in {inference_time:.2f}ms")
-
-        # Process results
-        detections = []
-
-        for result in results:
-            boxes = result.boxes
-
-            for box in boxes:
-                # Get bounding box coordinates (xyxy format)
-                bbox = box.xyxy[0].cpu().numpy().tolist()
+        # Reuse the previous frame's detections when this frame is nearly identical
+        frame_signature = None
+        if temporal_cache is not None and x_session_id:
+            frame_signature = FrameSignature(img_array, frame_size, roi_offset)
+            reuse_context = hashlib.sha256(
+                json.dumps({
+                    "params": params,
+                    "roi": roi_box,
+                    "model_version": active.version,
+                    "cascade": f"{cascade.model_id}@{cascade.fingerprint}" if cascade is not None else None
+                }, sort_keys=True).encode('utf-8')
+            ).hexdigest()
+            reused_detections = temporal_cache.lookup(x_session_id, frame_signature, reuse_context)
+            if reused_detections is not None:
+                logger.info(f"♻️  Near-identical frame in session {x_session_id}, reusing detections")
+                return DetectionResponse(
+                    status="success",
+                    detection_count=len(reused_detections),
+                    detections=reused_detections,
+                    inference_time_ms=0.0,
+                    reused=True,
+                    model_version=active.version,
+                    upload_waste_bytes=waste_bytes
+                )
 
-                # Get confidence score
-                confidence = float(box.conf[0].cpu().numpy())
+        # Short-circuit frames that match the stream's empty background
+        prefilter_signature = None
+        prefilter_audit = False
+        if prefilter is not None and x_stream_id:
+            prefilter_signature = prefilter.signature(img_array)
+            skip, prefilter_audit = prefilter.check(x_stream_id, prefilter_signature)
+            if skip:
+                logger.info(f"⏭️  Empty scene on stream {x_stream_id}, skipping detection")
+                return DetectionResponse(
+                    status="success",
+                    detection_count=0,
+                    detections=[],
+                    inference_time_ms=0.0,
+                    prefiltered=True,
+                    model_version=active.version,
+                    upload_waste_bytes=waste_bytes
+                )
 
-                # Get class ID and name
-                class_id = int(box.cls[0].cpu().numpy())
-                specific_name = model.names[class_id]
+        # Run inference on GPU/CPU through the request's priority lane
+        try:
+            job = scheduler.submit(lane, run_inference, active, img_array, params, time.perf_counter())
+        except QueueFullError as e:
+            logger.warning(f"🚦 {e.lane} queue full, rejecting request")
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy: {e.lane} queue is full",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        boxes, confidences, class_ids, serving_model, inference_time = await asyncio.wrap_future(job)
+
+        with span("postprocess"):
+            # Map downscaled, ROI-relative boxes back to full-image coordinates
+            boxes[:, [0, 2]] = boxes[:, [0, 2]] / decode_scale[0] + roi_offset[0]
+            boxes[:, [1, 3]] = boxes[:, [1, 3]] / decode_scale[1] + roi_offset[1]
+
+            # Process results
+            detections = []
+
+            for bbox, confidence, class_id in zip(boxes.tolist(), confidences.tolist(), class_ids.tolist()):
+                specific_name = serving_model.names[class_id]
 
                 # Map to general category (L2 label)
                 general_category = category_mapping.get(specific_name, "Unknown")
@@ -342,6 +887,13 @@ async def detect_trash(
 
                 detections.append(detection)
 
+        if prefilter_signature is not None:
+            filtered = params["classes"] is not None or params["conf"] > DEFAULT_CONFIDENCE
+            prefilter.update(x_stream_id, prefilter_signature, len(detections), prefilter_audit, filtered)
+
+        if frame_signature is not None:
+            temporal_cache.store(x_session_id, frame_signature, [d.model_dump() for d in detections], reuse_context)
+
         logger.info(
             f"Detection complete: {len(detections)} objects found | "
             f"Inference time: {inference_time:.2f}ms"
@@ -352,11 +904,21 @@ async def detect_trash(
             status="success",
             detection_count=len(detections),
             detections=detections,
-            inference_time_ms=round(inference_time, 2)
+            inference_time_ms=round(inference_time, 2),
+            model_version=active.version,
+            upload_waste_bytes=waste_bytes
         )
 
+        if cache_key is not None:
+            await asyncio.to_thread(
+                result_store.put, cache_key, active.model_id, active.fingerprint, response.model_dump()
+            )
+
         return response
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.error(f"Error during detection: {str(e)}")
         raise HTTPException(
@@ -364,6 +926,184 @@ async def detect_trash(
             detail=f"Error processing image: {str(e)}"
         )
 
+    finally:
+        if job is not None and not job.done():
+            # Client went away mid-inference; keep the inputs alive until the worker is done
+            job.add_done_callback(lambda _: release_request(active, decoded))
+        else:
+            release_request(active, decoded)
+
+
+@app.post(
+    "/v1/detect_trash_batch",
+    response_model=BatchDetectionResponse,
+    responses={
+        200: {"description": "Per-image results (each with its own status code)"},
+        400: {"description": "Invalid input"}
+    },
+    tags=["Detection"]
+)
+@traced
+async def detect_trash_batch(
+    images: List[UploadFile] = File(..., description="Image files to analyze"),
+    conf: Optional[float] = Form(None, description="Confidence threshold (default from CONFIDENCE_THRESHOLD)"),
+    iou: Optional[float] = Form(None, description="NMS IoU threshold (default from IOU_THRESHOLD)"),
+    max_det: Optional[int] = Form(None, description="Maximum number of detections per image"),
+    classes: Optional[str] = Form(None, description="Comma-separated L1 class names to keep"),
+    categories: Optional[str] = Form(None, description="Comma-separated L2 categories to keep"),
+    x_request_class: Optional[str] = Header(None, description="Scheduling lane: interactive (default) or bulk"),
+    x_api_key: Optional[str] = Header(None, description="API key; keys listed in BULK_API_KEYS are scheduled as bulk")
+):
+    """
+    Detect and classify trash in several images with one upload
+
+    Images are processed concurrently through the same path as
+    /v1/detect_trash; one failing image does not fail the batch.
+    """
+    max_images = int(os.getenv("MAX_BATCH_IMAGES", "16"))
+    if len(images) > max_images:
+        raise HTTPException(status_code=400, detail=f"Too many images: {len(images)} (max {max_images})")
+
+    async def run(index: int, image: UploadFile) -> BatchItemResult:
+        try:
+            result = await detect_trash(
+                image=image, roi=None, conf=conf, iou=iou, max_det=max_det, classes=classes,
+                categories=categories, x_stream_id=None, x_session_id=None,
+                x_request_class=x_request_class, x_api_key=x_api_key
+            )
+            return BatchItemResult(index=index, status_code=200, result=result)
+        except HTTPException as e:
+            return BatchItemResult(index=index, status_code=e.status_code, error=str(e.detail))
+
+    logger.info(f"📚 Batch of {len(images)} images")
+    results = await asyncio.gather(*(run(i, image) for i, image in enumerate(images)))
+    return BatchDetectionResponse(results=list(results))
+
+
+class ReloadRequest(BaseModel):
+    """Admin request to hot reload the served model"""
+    model_path: Optional[str] = Field(
+        default=None,
+        description="Model file to load, relative to the project root (default: currently served file)"
+    )
+
+
+def check_admin_access(request: Request, x_admin_token: Optional[str]):
+    """Require ADMIN_TOKEN when configured, otherwise only allow local clients"""
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    if admin_token:
+        if x_admin_token != admin_token:
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1", "localhost"):
+        raise HTTPException(status_code=403, detail="Admin endpoints are only available locally")
+
+
+@app.post("/admin/reload", status_code=202, tags=["Admin"])
+async def admin_reload(
+    request: Request,
+    reload_request: Optional[ReloadRequest] = None,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Load and warm a model in the background, then swap it in for new requests"""
+    check_admin_access(request, x_admin_token)
+
+    model_path = reload_request.model_path if reload_request else None
+    if model_path is not None and not resolve_project_path(model_path).exists():
+        raise HTTPException(status_code=404, detail=f"Model file not found: {model_path}")
+
+    if not reload_model(model_path):
+        raise HTTPException(status_code=409, detail="A reload is already in progress")
+
+    return serving.status()
+
+
+@app.get("/admin/reload", tags=["Admin"])
+async def admin_reload_status(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Get hot reload state and the serving model version"""
+    check_admin_access(request, x_admin_token)
+    return serving.status()
+
+
+@app.get("/debug/memory", tags=["Admin"])
+async def debug_memory(
+    request: Request,
+    top: int = 20,
+    collect: bool = True,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """RSS, file descriptors, torch allocator stats and top tracemalloc allocators since the baseline"""
+    check_admin_access(request, x_admin_token)
+
+    sample = await asyncio.to_thread(memory_probe.sample, top, collect)
+    sample["components"] = {
+        "input_arena": input_arena.stats() if input_arena is not None else None,
+        "temporal_reuse": temporal_cache.stats() if temporal_cache is not None else None,
+        "scheduler_queue_depth": scheduler.queue_depth() if scheduler is not None else None
+    }
+    return sample
+
+
+@app.post("/debug/memory/baseline", tags=["Admin"])
+async def debug_memory_baseline(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Restart tracemalloc growth accounting from the current allocations"""
+    check_admin_access(request, x_admin_token)
+    if not memory_probe.tracing:
+        raise HTTPException(status_code=409, detail="tracemalloc is off; start the server with TRACEMALLOC_FRAMES > 0")
+
+    await asyncio.to_thread(memory_probe.reset_baseline)
+    return {"baseline_at": memory_probe.baseline_at}
+
+
+@app.get("/v1/stats", tags=["Info"])
+async def get_stats():
+    """Get serving statistics"""
+    return {
+        "model": serving.current.model_id if serving.current else None,
+        "model_version": serving.current.version if serving.current else None,
+        "result_store": result_store.stats() if result_store is not None else None,
+        "cascade": cascade.stats() if cascade is not None else None,
+        "prefilter": prefilter.stats() if prefilter is not None else None,
+        "temporal_reuse": temporal_cache.stats() if temporal_cache is not None else None,
+        "optimizations": optimization_report or None,
+        "lean_engine": engine_report or None,
+        "input_arena": input_arena.stats() if input_arena is not None else None,
+        "decode_pool": decode_pool.stats() if decode_pool is not None else None,
+        "scheduler": scheduler.stats() if scheduler is not None else None,
+        "traffic_capture": traffic_capture.stats() if traffic_capture is not None else None,
+        "uploads": upload_waste.stats(),
+        "tracing": trace_exporter.stats() if trace_exporter is not None else None,
+        "machine_profile_defaults": machine_profile_settings or None
+    }
+
+
+@app.post("/v1/network_probe", tags=["Info"])
+async def network_probe(request: Request):
+    """Receive and discard a raw upload so clients can measure upload throughput"""
+    start_time = time.perf_counter()
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_upload_bytes():
+            raise HTTPException(status_code=413, detail="Probe payload larger than MAX_UPLOAD_MB")
+
+    return {
+        "bytes": received,
+        "server_receive_ms": round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
+
+@app.get("/v1/input_spec", tags=["Info"])
+async def get_input_spec():
+    """Input size, encoding and upload limits clients should downscale to before uploading"""
+    current = serving.current
+    if current is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    return {
+        "model_version": current.version,
+        **build_input_spec(current.model, RESOLUTION_BUCKETS)
+    }
+
 
 @app.get("/v1/categories", tags=["Info"])
 async def get_categories():
@@ -395,8 +1135,8 @@ if __name__ == "__main__":
     # Run the API server
     uvicorn.run(
         "main:app",
-        host="0.0.0.0",
-        port=8000,
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
         reload=False,
         log_level="info"
     )
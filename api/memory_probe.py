@@ -0,0 +1,176 @@
+"""
+Process memory probe
+Samples RSS, open file descriptors, threads, garbage collector state, the
+torch CUDA caching allocator and (when enabled) tracemalloc allocation growth
+by call site, for /debug/memory and the soak test (api/soak_test.py)
+"""
+
+import os
+import gc
+import sys
+import time
+import threading
+import tracemalloc
+import logging
+from typing import Dict, List, Optional
+
+import torch
+
+
+logger = logging.getLogger(__name__)
+
+
+# Allocations made by the profiler itself or the import system are not leaks
+IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>")
+)
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux), else peak RSS, else None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def open_fds() -> Optional[int]:
+    """Number of open file descriptors, None where /proc or /dev/fd is unavailable"""
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(fd_dir))
+        except OSError:
+            continue
+    return None
+
+
+def torch_memory_stats() -> Dict:
+    """CUDA caching allocator counters; inactive split bytes indicate fragmentation"""
+    if not torch.cuda.is_available():
+        return {"cuda": False}
+
+    stats = torch.cuda.memory_stats()
+    mb = 1024 ** 2
+    return {
+        "cuda": True,
+        "allocated_mb": round(stats.get("allocated_bytes.all.current", 0) / mb, 2),
+        "reserved_mb": round(stats.get("reserved_bytes.all.current", 0) / mb, 2),
+        "inactive_split_mb": round(stats.get("inactive_split_bytes.all.current", 0) / mb, 2),
+        "peak_allocated_mb": round(stats.get("allocated_bytes.all.peak", 0) / mb, 2),
+        "segments": stats.get("segment.all.current", 0),
+        "alloc_retries": stats.get("num_alloc_retries", 0),
+        "ooms": stats.get("num_ooms", 0)
+    }
+
+
+class MemoryProbe:
+    """
+    Memory sampler with an optional tracemalloc baseline
+
+    With frames > 0, tracemalloc is started and a baseline snapshot taken;
+    samples then list the call sites (tracebacks of up to `frames` frames)
+    whose live allocations grew most since the baseline. Tracing slows
+    allocation-heavy code, so it is off unless requested.
+    """
+
+    def __init__(self, frames: int = 0):
+        self.frames = frames
+        self._lock = threading.Lock()
+        self._baseline = None
+        self.baseline_at = None
+
+        if frames > 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self.reset_baseline()
+            logger.info(f"tracemalloc enabled ({frames} frames per allocation)")
+
+    @property
+    def tracing(self) -> bool:
+        return self._baseline is not None and tracemalloc.is_tracing()
+
+    def reset_baseline(self):
+        """Measure allocation growth from now on"""
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_TRACES)
+        with self._lock:
+            self._baseline = snapshot
+            self.baseline_at = time.time()
+
+    def top_allocators(self, top: int = 20) -> List[Dict]:
+        """Call sites with the largest growth in live allocations since the baseline"""
+        if not self.tracing:
+            return []
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_TRACES)
+        with self._lock:
+            baseline = self._baseline
+        differences = snapshot.compare_to(baseline, "traceback")
+
+        sites = []
+        for stat in differences[:top]:
+            # Most recent call first, like the allocation site in a traceback
+            frames = [f"{frame.filename}:{frame.lineno}" for frame in reversed(stat.traceback)]
+            sites.append({
+                "site": frames[0],
+                "traceback": frames,
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count": stat.count,
+                "count_diff": stat.count_diff
+            })
+        return sites
+
+    def sample(self, top: int = 20, collect: bool = False) -> Dict:
+        """
+        One memory sample
+
+        Args:
+            top: Number of tracemalloc call sites to include
+            collect: Run a full garbage collection first, so uncollected cycles are not mistaken for leaks
+        """
+        collected = gc.collect() if collect else None
+        rss = rss_bytes()
+
+        sample = {
+            "timestamp": time.time(),
+            "pid": os.getpid(),
+            "rss_mb": round(rss / 1024 ** 2, 2) if rss is not None else None,
+            "open_fds": open_fds(),
+            "threads": threading.active_count(),
+            "gc": {
+                "collected": collected,
+                "counts": gc.get_count(),
+                "uncollectable": len(gc.garbage)
+            },
+            "torch": torch_memory_stats(),
+            "tracemalloc": None
+        }
+
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            sample["tracemalloc"] = {
+                "frames": self.frames,
+                "baseline_at": self.baseline_at,
+                "traced_mb": round(current / 1024 ** 2, 2),
+                "peak_traced_mb": round(peak / 1024 ** 2, 2),
+                "top_allocators": self.top_allocators(top)
+            }
+        return sample
+
+
+def create_memory_probe_from_env() -> MemoryProbe:
+    """Memory probe with tracemalloc enabled when TRACEMALLOC_FRAMES > 0"""
+    return MemoryProbe(frames=int(os.getenv("TRACEMALLOC_FRAMES", "0")))
@@ -0,0 +1,273 @@
+"""
+Inference graph optimizations for the Garbage Classification API
+Prepares a loaded YOLO model once at startup (Conv+BN fusion, channels_last,
+bfloat16 autocast, torch.compile) and only keeps options whose output matches
+the fp32 eager model on a fixed image set
+"""
+
+import os
+import copy
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import cv2
+import torch
+
+
+logger = logging.getLogger(__name__)
+
+
+# Letterboxed input shapes (height, width) the predictor produces for common
+# photo aspect ratios: 1:1, 4:3, 3:4, 16:9 and 9:16 (see letterbox_shape)
+RESOLUTION_BUCKETS = [(640, 640), (480, 640), (640, 480), (384, 640), (640, 384)]
+
+# Options in the order they are applied
+SUPPORTED_OPTIMIZATIONS = ("fuse", "channels_last", "bf16", "compile")
+
+# Maximum allowed deviation from fp32 eager output (class scores, box pixels)
+SCORE_TOLERANCE = {"default": 1e-3, "bf16": 2e-2}
+BOX_TOLERANCE = {"default": 0.5, "bf16": 4.0}
+
+
+def select_bucket(height: int, width: int, buckets: Sequence[Tuple[int, int]] = RESOLUTION_BUCKETS) -> Tuple[int, int]:
+    """Pick the bucket whose aspect ratio is closest to the image's (least padding)"""
+    aspect = width / height
+    return min(buckets, key=lambda b: abs(np.log((b[1] / b[0]) / aspect)))
+
+
+def letterbox_shape(height: int, width: int, imgsz: int = 640, stride: int = 32) -> Tuple[int, int]:
+    """
+    Input shape the Ultralytics predictor letterboxes an image into
+
+    The image is scaled to fit imgsz x imgsz and padded only up to the next
+    multiple of stride (LetterBox with auto=True), so a 16:9 photo runs at
+    384x640 rather than 480x640.
+    """
+    scale = min(imgsz / height, imgsz / width)
+    new_h, new_w = int(round(height * scale)), int(round(width * scale))
+    return new_h + (imgsz - new_h) % stride, new_w + (imgsz - new_w) % stride
+
+
+def letterbox(img_array: np.ndarray, bucket: Tuple[int, int], pad_value: int = 114):
+    """
+    Resize an RGB image into a bucket keeping aspect ratio, padding the rest
+
+    Returns:
+        (padded HWC uint8 image, scale, (pad_x, pad_y))
+    """
+    bucket_h, bucket_w = bucket
+    h, w = img_array.shape[:2]
+    scale = min(bucket_h / h, bucket_w / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (bucket_w - new_w) // 2, (bucket_h - new_h) // 2
+
+    padded = np.full((bucket_h, bucket_w, 3), pad_value, dtype=np.uint8)
+    padded[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(
+        img_array, (new_w, new_h), interpolation=cv2.INTER_LINEAR
+    )
+    return padded, scale, (pad_x, pad_y)
+
+
+def reference_images(image_dir: Optional[str] = None, count: int = 4, seed: int = 0) -> List[np.ndarray]:
+    """
+    Load the fixed image set used to verify optimizations
+
+    Uses images from image_dir when given, otherwise deterministic synthetic
+    scenes (textured background with random filled shapes).
+    """
+    if image_dir:
+        paths = sorted(
+            p for p in Path(image_dir).iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png')
+        )[:count]
+        images = [cv2.cvtColor(cv2.imread(str(p)), cv2.COLOR_BGR2RGB) for p in paths]
+        if images:
+            return images
+        logger.warning(f"No images found in {image_dir}, using synthetic reference images")
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        img = rng.integers(60, 200, size=(720, 960, 3), dtype=np.uint8)
+        img = cv2.GaussianBlur(img, (15, 15), 0)
+        for _ in range(6):
+            color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+            x, y = int(rng.integers(0, 860)), int(rng.integers(0, 620))
+            cv2.rectangle(img, (x, y), (x + int(rng.integers(40, 200)), y + int(rng.integers(40, 200))), color, -1)
+        images.append(img)
+    return images
+
+
+def to_tensor(padded: np.ndarray, device) -> torch.Tensor:
+    """Convert a letterboxed HWC uint8 image into a normalized 1xCxHxW float tensor"""
+    tensor = torch.from_numpy(np.ascontiguousarray(padded.transpose(2, 0, 1))).to(device)
+    return tensor.float().div_(255.0).unsqueeze_(0)
+
+
+def _first_output(output) -> torch.Tensor:
+    """Detection head output (B, 4 + nc, anchors) from a DetectionModel forward"""
+    return (output[0] if isinstance(output, (list, tuple)) else output).float()
+
+
+def _autocast_forward(forward):
+    """Wrap a forward method so it runs under CPU bfloat16 autocast and returns fp32"""
+    def wrapped(*args, **kwargs):
+        with torch.autocast('cpu', dtype=torch.bfloat16):
+            output = forward(*args, **kwargs)
+        if isinstance(output, (list, tuple)):
+            return type(output)(o.float() if isinstance(o, torch.Tensor) else o for o in output)
+        return output.float()
+    return wrapped
+
+
+def _shape_guarded_forward(compiled, eager, shapes):
+    """
+    Route inputs whose shape was compiled and parity-checked at startup to the
+    compiled forward, and any other shape to the eager one, so live requests
+    never trigger a recompile or run an unchecked graph
+    """
+    def forward(x, *args, **kwargs):
+        if isinstance(x, torch.Tensor) and tuple(x.shape) in shapes:
+            return compiled(x, *args, **kwargs)
+        return eager(x, *args, **kwargs)
+    return forward
+
+
+def bf16_supported() -> bool:
+    """Whether this CPU has native bfloat16 kernels"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def _compare(net, inputs: List[torch.Tensor], reference: List[torch.Tensor], option: str) -> Dict:
+    """Run net on the reference inputs and measure its deviation from fp32 output"""
+    score_tol = SCORE_TOLERANCE.get(option, SCORE_TOLERANCE["default"])
+    box_tol = BOX_TOLERANCE.get(option, BOX_TOLERANCE["default"])
+
+    max_score_diff = max_box_diff = 0.0
+    start_time = time.time()
+    with torch.inference_mode():
+        for x, ref in zip(inputs, reference):
+            out = _first_output(net(x))
+            max_score_diff = max(max_score_diff, float((out[:, 4:] - ref[:, 4:]).abs().max()))
+
+            # Only compare boxes for anchors that could survive the confidence threshold
+            confident = ref[0, 4:].amax(dim=0) > 0.05
+            if bool(confident.any()):
+                box_diff = (out[0, :4, confident] - ref[0, :4, confident]).abs().max()
+                max_box_diff = max(max_box_diff, float(box_diff))
+
+    return {
+        "passed": max_score_diff <= score_tol and max_box_diff <= box_tol,
+        "max_score_diff": round(max_score_diff, 6),
+        "max_box_diff": round(max_box_diff, 4),
+        "check_time_ms": round((time.time() - start_time) * 1000, 2)
+    }
+
+
+def optimize_model(
+    yolo_model,
+    options: Sequence[str],
+    device: str = 'cpu',
+    buckets: Sequence[Tuple[int, int]] = RESOLUTION_BUCKETS,
+    image_dir: Optional[str] = None
+) -> Dict:
+    """
+    Apply the requested optimizations to a loaded YOLO model in place
+
+    Each option is applied on top of the options accepted so far, run on
+    every reference image at every bucket, and kept only if it matches the
+    fp32 eager output within tolerance. This also warms torch.compile for
+    each bucket shape; compiled execution is limited to those shapes and any
+    other input shape (an uncommon aspect ratio) runs eagerly.
+
+    Returns:
+        Per-option report: enabled flag, reason and measured deviations
+    """
+    report = {}
+    unknown = [o for o in options if o not in SUPPORTED_OPTIMIZATIONS]
+    for option in unknown:
+        logger.warning(f"Unknown inference optimization ignored: {option}")
+        report[option] = {"enabled": False, "reason": "unknown option"}
+
+    requested = [o for o in SUPPORTED_OPTIMIZATIONS if o in options]
+    if not requested:
+        return report
+
+    net = yolo_model.model.eval()
+
+    inputs = []
+    for img in reference_images(image_dir):
+        for bucket in buckets:
+            padded, _, _ = letterbox(img, bucket)
+            inputs.append(to_tensor(padded, device))
+
+    with torch.inference_mode():
+        reference = [_first_output(net(x)) for x in inputs]
+
+    for option in requested:
+        if option in ("channels_last", "bf16") and device != 'cpu':
+            report[option] = {"enabled": False, "reason": f"CPU-only option, device is {device}"}
+            continue
+        if option == "bf16" and not bf16_supported():
+            report[option] = {"enabled": False, "reason": "CPU lacks native bfloat16 support"}
+            continue
+        if option == "compile" and not hasattr(torch, "compile"):
+            report[option] = {"enabled": False, "reason": "torch.compile requires PyTorch 2.0+"}
+            continue
+
+        # Weight-mutating options work on a copy; forward-wrapping options patch
+        # the instance and restore the previous forward if rejected
+        patches_forward = option in ("bf16", "compile")
+        previous_forward = net.__dict__.get("forward")
+        candidate = net if patches_forward else copy.deepcopy(net)
+
+        try:
+            if option == "fuse":
+                candidate = candidate.fuse(verbose=False)
+            elif option == "channels_last":
+                candidate = candidate.to(memory_format=torch.channels_last)
+            elif option == "bf16":
+                candidate.forward = _autocast_forward(candidate.forward)
+            elif option == "compile":
+                candidate.forward = _shape_guarded_forward(
+                    torch.compile(candidate.forward, dynamic=False),
+                    candidate.forward,
+                    {tuple(x.shape) for x in inputs}
+                )
+
+            result = _compare(candidate, inputs, reference, option)
+        except Exception as e:
+            result = {"passed": False, "error": str(e)}
+
+        if result["passed"]:
+            net = candidate
+            report[option] = {"enabled": True, **result}
+            logger.info(f"Inference optimization '{option}' enabled ({result})")
+            continue
+
+        if patches_forward:
+            if previous_forward is None:
+                net.__dict__.pop("forward", None)
+            else:
+                net.forward = previous_forward
+
+        if "error" in result:
+            report[option] = {"enabled": False, "reason": f"failed: {result['error']}"}
+            logger.warning(f"Inference optimization '{option}' failed: {result['error']}")
+        else:
+            report[option] = {"enabled": False, "reason": "output mismatch vs fp32", **result}
+            logger.warning(f"Inference optimization '{option}' rejected: output mismatch ({result})")
+
+    yolo_model.model = net
+    return report
+
+
+def optimizations_from_env() -> List[str]:
+    """Read the comma-separated INFERENCE_OPTIMIZATIONS setting"""
+    value = os.getenv("INFERENCE_OPTIMIZATIONS", "")
+    return [o.strip().lower() for o in value.split(',') if o.strip()]
@@ -0,0 +1,274 @@
+"""
+"No trash present" pre-filter for fixed camera streams
+Skips the detector for frames that match a stream's learned empty background
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import cv2
+
+
+logger = logging.getLogger(__name__)
+
+
+class _StreamState:
+    """Background model for one camera stream"""
+
+    def __init__(self):
+        self.background = None
+        self.confirmed_empty = 0
+        self.skips_since_audit = 0
+
+
+class EmptyScenePrefilter:
+    """
+    Per-stream frame-difference pre-filter
+
+    The background of each stream is an exponential moving average of small
+    grayscale thumbnails of frames the detector confirmed to be empty. Once a
+    stream has warmup_frames confirmed empty frames, any frame whose mean
+    absolute difference to the background is below diff_threshold is treated
+    as empty and skipped. Every audit_interval-th skippable frame is sent to
+    the detector anyway, which keeps the background fresh and gives an online
+    estimate of the false-negative rate.
+    """
+
+    def __init__(
+        self,
+        diff_threshold: float = 6.0,
+        warmup_frames: int = 5,
+        audit_interval: int = 50,
+        alpha: float = 0.05,
+        thumbnail_size: int = 64,
+        max_streams: int = 256
+    ):
+        self.diff_threshold = diff_threshold
+        self.warmup_frames = warmup_frames
+        self.audit_interval = audit_interval
+        self.alpha = alpha
+        self.thumbnail_size = thumbnail_size
+        self.max_streams = max_streams
+
+        self._streams = OrderedDict()
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.skipped = 0
+        self.audits = 0
+        self.audit_misses = 0
+
+    def signature(self, img_array: np.ndarray) -> np.ndarray:
+        """Return a blurred grayscale thumbnail used for frame differencing"""
+        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if img_array.ndim == 3 else img_array
+        thumb = cv2.resize(gray, (self.thumbnail_size, self.thumbnail_size), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(thumb, (5, 5), 0).astype(np.float32)
+
+    def _state(self, stream_id: str) -> _StreamState:
+        state = self._streams.get(stream_id)
+        if state is None:
+            state = _StreamState()
+            self._streams[stream_id] = state
+            if len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+        else:
+            self._streams.move_to_end(stream_id)
+        return state
+
+    def check(self, stream_id: str, signature: np.ndarray) -> Tuple[bool, bool]:
+        """
+        Decide whether a frame can skip detection
+
+        Returns:
+            (skip, audit): skip is True when the frame matches the empty
+            background; audit is True when it matched but was sent to the
+            detector as a spot check.
+        """
+        with self._lock:
+            self.frames += 1
+            state = self._state(stream_id)
+
+            if state.background is None or state.confirmed_empty < self.warmup_frames:
+                return False, False
+
+            diff = float(np.mean(np.abs(signature - state.background)))
+            if diff >= self.diff_threshold:
+                return False, False
+
+            state.skips_since_audit += 1
+            if state.skips_since_audit >= self.audit_interval:
+                state.skips_since_audit = 0
+                self.audits += 1
+                return False, True
+
+            self.skipped += 1
+            return True, False
+
+    def update(self, stream_id: str, signature: np.ndarray, detection_count: int, audit: bool = False,
+               filtered: bool = False):
+        """
+        Feed the detector's verdict back into the stream's background model
+
+        filtered marks a request whose class filter or raised confidence
+        threshold could hide objects; zero detections then do not prove the
+        frame is empty, so it is not learned as background.
+        """
+        with self._lock:
+            state = self._state(stream_id)
+
+            if detection_count == 0:
+                if filtered:
+                    return
+                if state.background is None:
+                    state.background = signature.copy()
+                else:
+                    cv2.accumulateWeighted(signature, state.background, self.alpha)
+                state.confirmed_empty += 1
+            elif audit:
+                # The pre-filter would have skipped a frame that contains trash
+                self.audit_misses += 1
+
+    def reset(self):
+        """Forget every stream's background, e.g. after the detector changed"""
+        with self._lock:
+            self._streams.clear()
+
+    def stats(self) -> Dict:
+        """Return skip rate and audit-based false-negative estimate"""
+        with self._lock:
+            return {
+                "streams": len(self._streams),
+                "frames": self.frames,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.frames, 4) if self.frames else 0.0,
+                "audits": self.audits,
+                "audit_misses": self.audit_misses,
+                "audit_false_negative_rate": round(self.audit_misses / self.audits, 4) if self.audits else 0.0,
+                "diff_threshold": self.diff_threshold
+            }
+
+
+def create_prefilter_from_env() -> Optional[EmptyScenePrefilter]:
+    """Create the pre-filter if PREFILTER_ENABLED is true, otherwise return None"""
+    if os.getenv("PREFILTER_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+
+    return EmptyScenePrefilter(
+        diff_threshold=float(os.getenv("PREFILTER_DIFF_THRESHOLD", "6.0")),
+        warmup_frames=int(os.getenv("PREFILTER_WARMUP_FRAMES", "5")),
+        audit_interval=int(os.getenv("PREFILTER_AUDIT_INTERVAL", "50"))
+    )
+
+
+def evaluate(frames_dir: Path, labels_dir: Path, prefilter: EmptyScenePrefilter) -> Dict:
+    """
+    Measure skip rate and false-negative rate on a labelled sample
+
+    Each subdirectory of frames_dir is treated as one camera stream whose
+    frames are replayed in filename order. YOLO label files (same stem under
+    labels_dir) provide the ground truth: a non-empty label file means trash
+    is present. Labels stand in for the detector when updating backgrounds.
+    """
+    stream_dirs = sorted(d for d in frames_dir.iterdir() if d.is_dir()) or [frames_dir]
+
+    frames = skipped = with_trash = false_negatives = 0
+
+    for stream_dir in stream_dirs:
+        stream_id = stream_dir.name
+        image_paths = sorted(
+            p for p in stream_dir.iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png')
+        )
+
+        for image_path in image_paths:
+            img = cv2.imread(str(image_path))
+            if img is None:
+                continue
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+            label_path = labels_dir / stream_dir.relative_to(frames_dir) / f"{image_path.stem}.txt"
+            object_count = 0
+            if label_path.exists():
+                object_count = sum(1 for line in label_path.read_text().splitlines() if line.strip())
+
+            signature = prefilter.signature(img)
+            skip, audit = prefilter.check(stream_id, signature)
+
+            frames += 1
+            if object_count > 0:
+                with_trash += 1
+            if skip:
+                skipped += 1
+                if object_count > 0:
+                    false_negatives += 1
+            else:
+                prefilter.update(stream_id, signature, object_count, audit)
+
+    return {
+        "streams": len(stream_dirs),
+        "frames": frames,
+        "frames_with_trash": with_trash,
+        "skipped": skipped,
+        "skip_rate": round(skipped / frames, 4) if frames else 0.0,
+        "false_negatives": false_negatives,
+        "false_negative_rate": round(false_negatives / with_trash, 4) if with_trash else 0.0,
+        "diff_threshold": prefilter.diff_threshold
+    }
+
+
+def main():
+    """Evaluate the pre-filter on a labelled frame sample"""
+    parser = argparse.ArgumentParser(
+        description="Evaluate the empty-scene pre-filter on labelled camera frames"
+    )
+    parser.add_argument('--frames', type=str, required=True,
+                        help='Frame directory (one subdirectory per camera stream)')
+    parser.add_argument('--labels', type=str, required=True,
+                        help='YOLO label directory mirroring --frames')
+    parser.add_argument('--thresholds', type=str, default='6.0',
+                        help='Comma-separated diff thresholds to sweep (default: 6.0)')
+    parser.add_argument('--warmup', type=int, default=5, help='Confirmed empty frames before skipping')
+    parser.add_argument('--output', type=str, help='Optional path to save the report as JSON')
+
+    args = parser.parse_args()
+
+    frames_dir = Path(args.frames)
+    labels_dir = Path(args.labels)
+    if not frames_dir.exists():
+        print(f"Error: Frame directory not found: {frames_dir}")
+        return 1
+
+    reports = []
+    print("\n" + "="*60)
+    print("Pre-filter Evaluation")
+    print("="*60)
+
+    for threshold in (float(t) for t in args.thresholds.split(',')):
+        # No audits during evaluation so every skip is counted
+        prefilter = EmptyScenePrefilter(diff_threshold=threshold, warmup_frames=args.warmup,
+                                        audit_interval=sys.maxsize)
+        report = evaluate(frames_dir, labels_dir, prefilter)
+        reports.append(report)
+
+        print(f"\nThreshold {threshold:.2f}:")
+        print(f"  Frames: {report['frames']} ({report['frames_with_trash']} with trash)")
+        print(f"  Skip Rate: {report['skip_rate']:.2%}")
+        print(f"  False Negative Rate: {report['false_negative_rate']:.2%} "
+              f"({report['false_negatives']} frames)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nReport saved to: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
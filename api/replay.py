@@ -0,0 +1,269 @@
+"""
+Deterministic replay of captured production traffic
+Re-issues requests recorded by traffic capture (CAPTURE_DIR) against a
+server at their original pacing, scaled, or as fast as possible, then
+diffs latency distributions and detection outputs against the capture.
+
+Usage:
+    python api/replay.py --capture captures/prod --url http://localhost:8000 --speed 2 --output replay.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+
+# Replayed as headers; everything else in "fields" is sent as a form field
+HEADER_FIELDS = {"x_stream_id": "X-Stream-Id", "x_session_id": "X-Session-Id", "x_request_class": "X-Request-Class"}
+
+
+def load_capture(capture_dir, limit=None):
+    """
+    Read captured requests that have a stored image, ordered by arrival
+
+    Returns:
+        (replayable entries, number skipped because the image was not stored)
+    """
+    capture_dir = Path(capture_dir)
+    entries, skipped = [], 0
+    with open(capture_dir / "requests.jsonl", 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if not entry.get("image_file") or not (capture_dir / entry["image_file"]).exists():
+                skipped += 1
+                continue
+            entries.append(entry)
+
+    entries.sort(key=lambda e: e["arrival"])
+    return entries[:limit] if limit else entries, skipped
+
+
+def replay(capture_dir, entries, base_url, speed=1.0, concurrency=32):
+    """
+    Send every entry, preserving inter-arrival gaps divided by speed
+    (speed=0 sends as fast as `concurrency` allows)
+
+    Returns:
+        List of (entry, replay result) in capture order
+    """
+    capture_dir = Path(capture_dir)
+    local = threading.local()
+    results = [None] * len(entries)
+
+    def send(index, entry):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+
+        fields = entry.get("fields", {})
+        data = {k: str(v) for k, v in fields.items() if k not in HEADER_FIELDS}
+        headers = {HEADER_FIELDS[k]: str(v) for k, v in fields.items() if k in HEADER_FIELDS}
+
+        start = time.perf_counter()
+        result = {}
+        try:
+            # The image may have been rotated out by CAPTURE_MAX_MB since it was listed
+            contents = (capture_dir / entry["image_file"]).read_bytes()
+            response = local.session.post(
+                f"{base_url}/v1/detect_trash",
+                files={'image': (entry.get("filename") or "image", contents, entry.get("content_type"))},
+                data=data,
+                headers=headers,
+                timeout=120
+            )
+            result["status"] = response.status_code
+            result["response"] = response.json() if response.ok else None
+        except Exception as e:
+            # Connection errors, unreadable images and non-JSON bodies alike
+            result["status"] = None
+            result["error"] = type(e).__name__
+        result["latency_ms"] = (time.perf_counter() - start) * 1000
+        results[index] = result
+
+    first_arrival = entries[0]["arrival"] if entries else 0.0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = []
+        for index, entry in enumerate(entries):
+            if speed > 0:
+                delay = (entry["arrival"] - first_arrival) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(executor.submit(send, index, entry))
+
+    # Surfaces any failure in send() itself instead of leaving a result unset
+    for future in futures:
+        future.result()
+
+    return list(zip(entries, results))
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "p50": round(ordered[len(ordered) // 2], 2),
+        "p90": round(ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))], 2),
+        "p99": round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))], 2),
+        "max": round(ordered[-1], 2)
+    }
+
+
+def _iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def diff_detections(expected, actual, iou_threshold=0.5):
+    """
+    Greedily match detections of the same class by IoU
+
+    Returns:
+        Dict with matched / missing / extra counts, mean IoU and max confidence change
+    """
+    unmatched = list(range(len(actual)))
+    ious, confidence_diffs = [], []
+    missing = 0
+
+    for detection in sorted(expected, key=lambda d: -d["confidence"]):
+        best, best_iou = None, iou_threshold
+        for i in unmatched:
+            if actual[i]["specific_name"] != detection["specific_name"]:
+                continue
+            overlap = _iou(detection["bbox_xyxy"], actual[i]["bbox_xyxy"])
+            if overlap >= best_iou:
+                best, best_iou = i, overlap
+        if best is None:
+            missing += 1
+            continue
+        unmatched.remove(best)
+        ious.append(best_iou)
+        confidence_diffs.append(abs(actual[best]["confidence"] - detection["confidence"]))
+
+    return {
+        "matched": len(ious),
+        "missing": missing,
+        "extra": len(unmatched),
+        "mean_iou": sum(ious) / len(ious) if ious else None,
+        "max_confidence_diff": max(confidence_diffs) if confidence_diffs else 0.0
+    }
+
+
+def compare(pairs, iou_threshold=0.5):
+    """Latency distributions and detection differences between capture and replay"""
+    statuses = Counter()
+    detection_totals = Counter()
+    changed_requests = []
+    ious, confidence_diffs = [], []
+    captured_inference, replayed_inference = [], []
+
+    for entry, result in pairs:
+        statuses[f"{entry['status']}->{result['status'] if result['status'] is not None else result['error']}"] += 1
+
+        expected, actual = entry.get("response"), result.get("response")
+        if expected is None or actual is None:
+            continue
+
+        captured_inference.append(expected["inference_time_ms"])
+        replayed_inference.append(actual["inference_time_ms"])
+
+        diff = diff_detections(expected["detections"], actual["detections"], iou_threshold)
+        detection_totals.update({k: diff[k] for k in ("matched", "missing", "extra")})
+        if diff["mean_iou"] is not None:
+            ious.append(diff["mean_iou"])
+        confidence_diffs.append(diff["max_confidence_diff"])
+        if diff["missing"] or diff["extra"]:
+            changed_requests.append({
+                "image_sha256": entry.get("image_sha256"),
+                "captured_version": expected.get("model_version"),
+                "replayed_version": actual.get("model_version"),
+                **diff
+            })
+
+    compared = len(captured_inference)
+    return {
+        "requests": len(pairs),
+        "status_transitions": dict(statuses),
+        "latency_ms": {
+            "captured_endpoint": _percentiles([e["latency_ms"] for e, _ in pairs]),
+            "replayed_end_to_end": _percentiles([r["latency_ms"] for _, r in pairs]),
+            "captured_inference": _percentiles(captured_inference),
+            "replayed_inference": _percentiles(replayed_inference)
+        },
+        "detections": {
+            "compared_requests": compared,
+            "identical_requests": compared - len(changed_requests),
+            **dict(detection_totals),
+            "mean_iou": round(sum(ious) / len(ious), 4) if ious else None,
+            "max_confidence_diff": round(max(confidence_diffs), 4) if confidence_diffs else 0.0
+        },
+        "changed_requests": changed_requests[:100]
+    }
+
+
+def print_report(report):
+    """Print the replay comparison"""
+    print("\n" + "="*60)
+    print("Replay Comparison")
+    print("="*60)
+    print(f"Requests: {report['requests']}")
+    print(f"Status (captured->replayed): {report['status_transitions']}")
+
+    print("\nLatency (ms)        p50       p90       p99       max")
+    for label, stats in report["latency_ms"].items():
+        if stats:
+            print(f"  {label:<18}{stats['p50']:>8.1f}  {stats['p90']:>8.1f}  {stats['p99']:>8.1f}  {stats['max']:>8.1f}")
+
+    detections = report["detections"]
+    print(f"\nDetections: {detections['identical_requests']}/{detections['compared_requests']} requests identical")
+    print(f"  matched {detections.get('matched', 0)}, missing {detections.get('missing', 0)}, "
+          f"extra {detections.get('extra', 0)}, mean IoU {detections['mean_iou']}, "
+          f"max confidence diff {detections['max_confidence_diff']}")
+
+
+def main():
+    """Replay a capture and compare"""
+    parser = argparse.ArgumentParser(description="Replay captured traffic and diff latency and detections")
+    parser.add_argument('--capture', type=str, required=True, help='Capture directory (CAPTURE_DIR)')
+    parser.add_argument('--url', type=str, default='http://localhost:8000', help='Server to replay against')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Pacing multiplier: 1 = original, 2 = twice as fast, 0 = as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=32, help='Maximum outstanding requests')
+    parser.add_argument('--limit', type=int, help='Replay only the first N requests')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU for matching detections')
+    parser.add_argument('--output', type=str, help='Save the comparison as JSON')
+    args = parser.parse_args()
+
+    entries, skipped = load_capture(args.capture, args.limit)
+    if not entries:
+        print(f"✗ No replayable requests in {args.capture} ({skipped} without stored images)")
+        return 1
+
+    span = entries[-1]["arrival"] - entries[0]["arrival"]
+    print(f"Replaying {len(entries)} requests ({skipped} skipped without stored images), "
+          f"captured over {span:.0f}s, at speed {args.speed or 'max'}")
+
+    report = compare(replay(args.capture, entries, args.url, args.speed, args.concurrency), args.iou)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
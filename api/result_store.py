@@ -0,0 +1,190 @@
+"""
+Persistent result store for the Garbage Classification API
+SQLite-backed cache of detection responses shared by all workers on a node
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_fingerprint(model_path, chunk_size: int = 1024 * 1024) -> str:
+    """Return a short content hash identifying a model checkpoint"""
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def make_result_key(image_hash: str, model_id: str, fingerprint: str, params: Dict) -> str:
+    """Build the cache key from image hash, model identity and inference parameters"""
+    payload = json.dumps(
+        {"image": image_hash, "model": model_id, "fingerprint": fingerprint, "params": params},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """
+    Size-bounded on-disk result cache
+
+    Uses SQLite in WAL mode so several API worker processes on the same node
+    can read and write the same file concurrently. Entries carry the model id
+    and checkpoint fingerprint they were produced with, so results from an
+    older checkpoint can be purged when the model changes.
+    """
+
+    # Check the total size every N writes instead of on every put
+    EVICTION_CHECK_INTERVAL = 32
+
+    def __init__(self, path, max_bytes: int = 512 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts_since_check = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " model_id TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_access ON results(last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_model ON results(model_id, fingerprint)")
+        conn.commit()
+
+        logger.info(f"Result store opened: {self.path} (limit {max_bytes / 1024**2:.0f} MB)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the stored payload for key, or None on a miss"""
+        conn = self._connect()
+        row = conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model_id: str, fingerprint: str, payload: Dict):
+        """Store a payload and evict the least recently used entries if over budget"""
+        data = json.dumps(payload)
+        now = time.time()
+
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO results"
+            " (key, model_id, fingerprint, payload, size, created, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, model_id, fingerprint, data, len(data), now, now)
+        )
+        conn.commit()
+
+        with self._lock:
+            self._puts_since_check += 1
+            check = self._puts_since_check >= self.EVICTION_CHECK_INTERVAL
+            if check:
+                self._puts_since_check = 0
+
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the store is below 90% of its limit"""
+        conn = self._connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        rows = conn.execute("SELECT key, size FROM results ORDER BY last_access ASC").fetchall()
+        stale_keys = []
+        for key, size in rows:
+            if total <= target:
+                break
+            stale_keys.append((key,))
+            total -= size
+            removed += 1
+
+        conn.executemany("DELETE FROM results WHERE key = ?", stale_keys)
+        conn.commit()
+        self.evictions += removed
+        logger.info(f"Result store evicted {removed} entries")
+
+    def invalidate_stale(self, model_id: str, fingerprint: str) -> int:
+        """Delete entries produced by a different checkpoint of the same model"""
+        conn = self._connect()
+        cursor = conn.execute(
+            "DELETE FROM results WHERE model_id = ? AND fingerprint != ?",
+            (model_id, fingerprint)
+        )
+        conn.commit()
+
+        if cursor.rowcount:
+            logger.info(f"Result store invalidated {cursor.rowcount} stale entries for {model_id}")
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        """Return entry count, size and hit/miss counters for this process"""
+        conn = self._connect()
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        lookups = self.hits + self.misses
+
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "size_mb": round(total / 1024**2, 3),
+            "max_size_mb": round(self.max_bytes / 1024**2, 3),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+def create_result_store_from_env() -> Optional[ResultStore]:
+    """Create the result store if RESULT_STORE_PATH is set, otherwise return None"""
+    path = os.getenv("RESULT_STORE_PATH", "").strip()
+    if not path:
+        return None
+
+    max_mb = float(os.getenv("RESULT_STORE_MAX_MB", "512"))
+    return ResultStore(path, max_bytes=int(max_mb * 1024 * 1024))
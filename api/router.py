@@ -0,0 +1,332 @@
+"""
+Least-outstanding-requests router for the Garbage Classification API
+Proxies requests to several api/main.py instances, sending each detection
+to the ready backend with the fewest outstanding requests. Requests pinned
+to a model version only go to backends serving it, and camera streams /
+sessions stick to one backend so per-process frame state stays useful.
+
+Usage:
+    python api/router.py --port 8000 --backends http://127.0.0.1:8001,http://127.0.0.1:8002
+    python api/router.py --port 8000 --backends-file logs/backends.json   # with api/supervisor.py
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote, unquote
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+# Headers that describe one connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length"
+}
+
+# Paths proxied to the backends; anything else is answered by the router
+PUBLIC_PATH_PREFIXES = ("/v1/",)
+PUBLIC_PATHS = {"/", "/health", "/docs", "/redoc", "/openapi.json", "/docs/oauth2-redirect"}
+
+# Backends only guard these with ADMIN_TOKEN, or with a loopback check that
+# every proxied request passes, so they are forwarded only when a token is set
+ADMIN_PATH_PREFIXES = ("/admin/", "/debug/")
+
+
+class Backend:
+    """One API instance and its last known health"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.ready = False
+        self.model_version = None
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_checked = 0.0
+
+    def load(self) -> int:
+        """
+        Outstanding requests: the router's own in-flight count is current,
+        the reported queue depth also covers other routers but is one poll old
+        """
+        return max(self.in_flight, self.queue_depth)
+
+    def serves(self, model: str) -> bool:
+        """Whether the backend serves a full version or bare model id"""
+        version = self.model_version or ""
+        return version == model or version.split('@')[0] == model
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "model_version": self.model_version,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors
+        }
+
+
+class Router:
+    """
+    Picks a backend per request
+
+    A request is routed to the ready backend with the lowest load(). An
+    X-Model-Version header restricts the choice to backends serving that
+    version (or model id). Requests with X-Session-Id or X-Stream-Id go to
+    the session's rendezvous-hashed backend unless it has more than
+    affinity_slack outstanding requests above the least loaded one.
+    """
+
+    def __init__(
+        self,
+        backends: Optional[List[str]] = None,
+        backends_file: Optional[str] = None,
+        health_interval_s: float = 1.0,
+        affinity_slack: int = 2,
+        timeout_s: float = 60.0
+    ):
+        self.backends: Dict[str, Backend] = {url: Backend(url) for url in backends or []}
+        self.backends_file = Path(backends_file) if backends_file else None
+        self._backends_mtime = None
+        self.health_interval_s = health_interval_s
+        self.affinity_slack = affinity_slack
+        self.client = httpx.AsyncClient(timeout=timeout_s, limits=httpx.Limits(max_keepalive_connections=64))
+        self.retries = 0
+        self.rejected = 0
+
+    def _refresh_backend_list(self):
+        """Pick up backends added or removed by the supervisor"""
+        if self.backends_file is None or not self.backends_file.exists():
+            return
+        mtime = self.backends_file.stat().st_mtime
+        if mtime == self._backends_mtime:
+            return
+        self._backends_mtime = mtime
+
+        try:
+            urls = [url.rstrip('/') for url in json.loads(self.backends_file.read_text())]
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {self.backends_file}: {e}")
+            return
+
+        for url in urls:
+            if url not in self.backends:
+                self.backends[url] = Backend(url)
+                logger.info(f"Backend added: {url}")
+        for url in list(self.backends):
+            if url not in urls:
+                del self.backends[url]
+                logger.info(f"Backend removed: {url}")
+
+    async def _check(self, backend: Backend):
+        try:
+            response = await self.client.get(f"{backend.url}/health", timeout=1.0)
+            health = response.json()
+            backend.ready = response.status_code == 200 and bool(health.get("model_loaded"))
+            backend.model_version = health.get("model_version")
+            backend.queue_depth = int(health.get("queue_depth", 0))
+        except (httpx.HTTPError, ValueError):
+            if backend.ready:
+                logger.warning(f"Backend {backend.url} failed its health check")
+            backend.ready = False
+        backend.last_checked = time.time()
+
+    async def poll_health(self):
+        """Refresh backend readiness, model versions and queue depths forever"""
+        while True:
+            self._refresh_backend_list()
+            await asyncio.gather(*(self._check(b) for b in list(self.backends.values())))
+            await asyncio.sleep(self.health_interval_s)
+
+    def choose(self, model: Optional[str] = None, affinity_key: Optional[str] = None,
+               exclude: Optional[set] = None) -> Optional[Backend]:
+        """Select a backend for one request, or None if none is eligible"""
+        candidates = [
+            b for b in self.backends.values()
+            if b.ready and (model is None or b.serves(model)) and b.url not in (exclude or ())
+        ]
+        if not candidates:
+            return None
+
+        least = min(candidates, key=lambda b: (b.load(), b.requests))
+        if affinity_key is None:
+            return least
+
+        preferred = max(candidates, key=lambda b: hashlib.md5(f"{affinity_key}|{b.url}".encode()).digest())
+        return preferred if preferred.load() <= least.load() + self.affinity_slack else least
+
+    async def forward(self, request: Request, path: str) -> Response:
+        """Proxy one request, retrying once on another backend if the first is down or full"""
+        body = await request.body()
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        if request.client is not None:
+            forwarded = request.headers.get("x-forwarded-for")
+            headers["X-Forwarded-For"] = f"{forwarded}, {request.client.host}" if forwarded else request.client.host
+        model = request.headers.get("x-model-version")
+        affinity_key = request.headers.get("x-session-id") or request.headers.get("x-stream-id")
+
+        tried = set()
+        response = None
+        for attempt in range(2):
+            backend = self.choose(model, affinity_key, exclude=tried)
+            if backend is None:
+                break
+            tried.add(backend.url)
+            if attempt:
+                self.retries += 1
+
+            backend.in_flight += 1
+            backend.requests += 1
+            try:
+                response = await self.client.request(
+                    request.method, f"{backend.url}{path}",
+                    params=request.query_params, content=body, headers=headers
+                )
+            except httpx.HTTPError as e:
+                logger.warning(f"Backend {backend.url} failed: {e}")
+                backend.errors += 1
+                backend.ready = False
+                continue
+            finally:
+                backend.in_flight -= 1
+
+            # Queue full on this backend, another may have room
+            if response.status_code != 503:
+                break
+
+        if response is None:
+            self.rejected += 1
+            detail = f"No ready backend serves model {model}" if model else "No ready backend"
+            return JSONResponse(status_code=503, content={"detail": detail}, headers={"Retry-After": "1"})
+
+        response_headers = {
+            k: v for k, v in response.headers.items()
+            if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() != "content-encoding"
+        }
+        return Response(content=response.content, status_code=response.status_code, headers=response_headers)
+
+    def stats(self) -> Dict:
+        return {
+            "backends": {url: b.stats() for url, b in self.backends.items()},
+            "ready_backends": sum(1 for b in self.backends.values() if b.ready),
+            "retries": self.retries,
+            "rejected": self.rejected
+        }
+
+
+def normalize_path(path: str) -> Optional[str]:
+    """
+    Percent-encoded path to forward, or None if it has '.' or '..' segments
+
+    The path is already percent-decoded once; dot segments are also checked
+    after a second decoding so "%2E%2E" cannot be resolved by the HTTP client
+    or backend into a path outside the allow-list.
+    """
+    for candidate in (path, unquote(path)):
+        if any(segment in ('.', '..') for segment in candidate.split('/')):
+            return None
+    return quote(path)
+
+
+def proxy_allowed(path: str) -> Optional[JSONResponse]:
+    """None if the path may be proxied, otherwise the response to return instead"""
+    if path in PUBLIC_PATHS or path.startswith(PUBLIC_PATH_PREFIXES):
+        return None
+    if path.startswith(ADMIN_PATH_PREFIXES) or path.rstrip('/') in ("/admin", "/debug"):
+        if os.getenv("ADMIN_TOKEN", ""):
+            return None
+        return JSONResponse(status_code=403, content={
+            "detail": "Admin endpoints are not proxied without ADMIN_TOKEN; call the backend directly"
+        })
+    return JSONResponse(status_code=404, content={"detail": "Not Found"})
+
+
+def create_app(router: Router) -> FastAPI:
+    """Router application; the public API is proxied, admin endpoints only with ADMIN_TOKEN"""
+    app = FastAPI(title="Garbage Classification API Router", docs_url=None, redoc_url=None)
+
+    @app.on_event("startup")
+    async def start_health_polling():
+        app.state.health_task = asyncio.create_task(router.poll_health())
+
+    @app.on_event("shutdown")
+    async def stop_health_polling():
+        app.state.health_task.cancel()
+        await router.client.aclose()
+
+    @app.get("/router/health")
+    async def router_health():
+        ready = sum(1 for b in router.backends.values() if b.ready)
+        return JSONResponse(
+            status_code=200 if ready else 503,
+            content={"status": "healthy" if ready else "unavailable", "ready_backends": ready}
+        )
+
+    @app.get("/router/stats")
+    async def router_stats():
+        return router.stats()
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
+    async def proxy(request: Request, path: str):
+        target = normalize_path(f"/{path}")
+        if target is None:
+            return JSONResponse(status_code=400, content={"detail": "Path must not contain '.' or '..' segments"})
+        rejected = proxy_allowed(target)
+        if rejected is not None:
+            return rejected
+        return await router.forward(request, target)
+
+    return app
+
+
+def main():
+    """Run the router"""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Least-outstanding-requests router for API instances")
+    parser.add_argument('--backends', type=str, default='',
+                        help='Comma-separated backend URLs (e.g. http://127.0.0.1:8001,http://127.0.0.1:8002)')
+    parser.add_argument('--backends-file', type=str,
+                        help='JSON list of backend URLs, re-read when it changes (written by api/supervisor.py)')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Bind address')
+    parser.add_argument('--port', type=int, default=8000, help='Bind port')
+    parser.add_argument('--health-interval', type=float, default=1.0, help='Backend health poll interval (s)')
+    parser.add_argument('--affinity-slack', type=int, default=2,
+                        help='Extra outstanding requests tolerated to keep a session on its backend')
+    args = parser.parse_args()
+
+    backends = [url.strip() for url in args.backends.split(',') if url.strip()]
+    if not backends and not args.backends_file:
+        parser.error("Provide --backends or --backends-file")
+
+    router = Router(
+        backends=backends,
+        backends_file=args.backends_file,
+        health_interval_s=args.health_interval,
+        affinity_slack=args.affinity_slack
+    )
+    uvicorn.run(create_app(router), host=args.host, port=args.port, log_level="info")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+Priority lanes for inference
+Requests are queued per request class (interactive, bulk) and dispatched to
+a fixed set of inference worker threads by strict or weighted priority
+"""
+
+import os
+import math
+import time
+import threading
+import contextvars
+import logging
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+
+# Highest priority first; lanes after the first are background lanes
+LANES = ("interactive", "bulk")
+
+
+class QueueFullError(Exception):
+    """A lane's queue is at its limit"""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"{lane} queue is full")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+
+class _Job:
+    def __init__(self, fn: Callable, args, lane: 'Lane'):
+        self.fn = fn
+        self.args = args
+        self.lane = lane
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.context = contextvars.copy_context()  # Run with the submitter's context (request trace)
+
+
+class Lane:
+    """Queue and metrics of one request class"""
+
+    def __init__(self, name: str, weight: int = 1, max_queue: int = 256, window: int = 2048):
+        self.name = name
+        self.weight = weight
+        self.max_queue = max_queue
+
+        self.queue = deque()
+        self.in_flight = 0
+        self.current_weight = 0  # Smooth weighted round-robin state
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.wait_ms = deque(maxlen=window)
+        self.total_ms = deque(maxlen=window)
+        self.service_ms = deque(maxlen=window)
+
+    def stats(self) -> Dict:
+        return {
+            "weight": self.weight,
+            "max_queue": self.max_queue,
+            "queued": len(self.queue),
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "wait_ms_p50": _percentile(self.wait_ms, 0.50),
+            "wait_ms_p99": _percentile(self.wait_ms, 0.99),
+            "latency_ms_p50": _percentile(self.total_ms, 0.50),
+            "latency_ms_p99": _percentile(self.total_ms, 0.99)
+        }
+
+
+class InferenceScheduler:
+    """
+    Dispatches queued inference jobs to worker threads by lane priority
+
+    "strict" always serves the highest-priority non-empty lane; "weighted"
+    shares dispatches between lanes in proportion to their weights. Workers
+    are not preempted, so background lanes may occupy at most
+    workers - reserved_workers of them. With a latency budget, that limit
+    adapts: it halves whenever interactive p99 exceeds the budget and grows
+    back by one while p99 stays under 80% of it, letting bulk work soak up
+    idle capacity without holding interactive latency over budget.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        policy: str = "strict",
+        weights: Optional[Dict[str, int]] = None,
+        max_queue: Optional[Dict[str, int]] = None,
+        reserved_workers: int = 0,
+        latency_budget_ms: float = 0.0,
+        lanes: Sequence[str] = LANES
+    ):
+        if policy not in ("strict", "weighted"):
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+
+        weights = weights or {}
+        max_queue = max_queue or {}
+        self.lanes = [Lane(name, weights.get(name, 1), max_queue.get(name, 256)) for name in lanes]
+        self._by_name = {lane.name: lane for lane in self.lanes}
+        self.workers = workers
+        self.policy = policy
+        self.latency_budget_ms = latency_budget_ms
+
+        if reserved_workers > 0 and reserved_workers >= workers:
+            # Background lanes must be able to run somewhere; they get one worker
+            logger.warning(
+                f"INTERACTIVE_RESERVED_WORKERS={reserved_workers} leaves no worker for background lanes "
+                f"with {workers} worker(s); only {workers - 1} can be reserved, "
+                f"raise INFERENCE_WORKERS to reserve more"
+            )
+        self.max_background = max(1, workers - reserved_workers)
+        self.background_limit = self.max_background
+        self.background_in_flight = 0
+        self._since_adjust = 0
+
+        self._cond = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"inference-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, lane_name: str, fn: Callable, *args) -> Future:
+        """Queue fn(*args) on a lane; raises QueueFullError when the lane is full"""
+        lane = self._by_name[lane_name]
+        with self._cond:
+            if len(lane.queue) >= lane.max_queue:
+                lane.rejected += 1
+                raise QueueFullError(lane.name, self._retry_after(lane))
+            job = _Job(fn, args, lane)
+            lane.queue.append(job)
+            lane.submitted += 1
+            self._cond.notify()
+        return job.future
+
+    def _retry_after(self, lane: Lane) -> int:
+        """Seconds until the lane's current backlog should have drained"""
+        service_ms = sum(lane.service_ms) / len(lane.service_ms) if lane.service_ms else 100.0
+        workers = self.workers if lane is self.lanes[0] else self.background_limit
+        return max(1, math.ceil(len(lane.queue) * service_ms / workers / 1000))
+
+    def _runnable(self, lane: Lane) -> bool:
+        if not lane.queue:
+            return False
+        return lane is self.lanes[0] or self.background_in_flight < self.background_limit
+
+    def _next_job(self) -> Optional[_Job]:
+        candidates = [lane for lane in self.lanes if self._runnable(lane)]
+        if not candidates:
+            return None
+
+        if self.policy == "strict":
+            lane = candidates[0]
+        else:
+            total = 0
+            for candidate in candidates:
+                candidate.current_weight += candidate.weight
+                total += candidate.weight
+            lane = max(candidates, key=lambda candidate: candidate.current_weight)
+            lane.current_weight -= total
+
+        lane.in_flight += 1
+        if lane is not self.lanes[0]:
+            self.background_in_flight += 1
+        return lane.queue.popleft()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+
+            lane = job.lane
+            started_at = time.perf_counter()
+            wait_ms = (started_at - job.enqueued_at) * 1000
+
+            outcome = "cancelled"
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.context.run(job.fn, *job.args))
+                    outcome = "completed"
+                except BaseException as e:
+                    job.future.set_exception(e)
+                    outcome = "failed"
+
+            finished_at = time.perf_counter()
+            with self._cond:
+                lane.in_flight -= 1
+                if lane is not self.lanes[0]:
+                    self.background_in_flight -= 1
+                setattr(lane, outcome, getattr(lane, outcome) + 1)
+                if outcome != "cancelled":
+                    lane.wait_ms.append(wait_ms)
+                    lane.service_ms.append((finished_at - started_at) * 1000)
+                    lane.total_ms.append((finished_at - job.enqueued_at) * 1000)
+                    if lane is self.lanes[0]:
+                        self._adjust_background_limit()
+                self._cond.notify_all()
+
+    def _adjust_background_limit(self):
+        """Additive-increase / multiplicative-decrease of background concurrency"""
+        if not self.latency_budget_ms:
+            return
+        self._since_adjust += 1
+        if self._since_adjust < 32:
+            return
+        self._since_adjust = 0
+
+        p99 = _percentile(list(self.lanes[0].total_ms)[-256:], 0.99)
+        if p99 > self.latency_budget_ms and self.background_limit > 1:
+            self.background_limit = max(1, self.background_limit // 2)
+            logger.info(f"Interactive p99 {p99:.0f}ms over budget, background limit -> {self.background_limit}")
+        elif p99 < 0.8 * self.latency_budget_ms and self.background_limit < self.max_background:
+            self.background_limit += 1
+
+    def queue_depth(self) -> int:
+        """Jobs waiting or running across all lanes"""
+        with self._cond:
+            return sum(len(lane.queue) + lane.in_flight for lane in self.lanes)
+
+    def stats(self) -> Dict:
+        """Return scheduler settings and per-lane metrics"""
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "workers": self.workers,
+                "background_limit": self.background_limit,
+                "latency_budget_ms": self.latency_budget_ms or None,
+                "lanes": {lane.name: lane.stats() for lane in self.lanes}
+            }
+
+
+def _parse_lane_map(value: str, cast=int) -> Dict:
+    """Parse "interactive=8,bulk=1" into {"interactive": 8, "bulk": 1}"""
+    result = {}
+    for item in value.split(','):
+        if item.strip():
+            name, _, number = item.partition('=')
+            result[name.strip()] = cast(number)
+    return result
+
+
+def create_scheduler_from_env() -> InferenceScheduler:
+    """Create the inference scheduler from INFERENCE_WORKERS and the SCHEDULER_* / LANE_* settings"""
+    scheduler = InferenceScheduler(
+        workers=max(1, int(os.getenv("INFERENCE_WORKERS", "1"))),
+        policy=os.getenv("SCHEDULER_POLICY", "strict").lower(),
+        weights=_parse_lane_map(os.getenv("LANE_WEIGHTS", "interactive=8,bulk=1")),
+        max_queue=_parse_lane_map(os.getenv("LANE_MAX_QUEUE", "interactive=64,bulk=1024")),
+        reserved_workers=int(os.getenv("INTERACTIVE_RESERVED_WORKERS", "0")),
+        latency_budget_ms=float(os.getenv("INTERACTIVE_P99_BUDGET_MS", "0"))
+    )
+    logger.info(f"Inference scheduler: {scheduler.workers} workers, {scheduler.policy} priority")
+    return scheduler
@@ -0,0 +1,93 @@
+"""
+Response models for the Garbage Classification API
+Kept apart from main.py so clients and benchmarks can use them without
+starting the API (model loading, environment settings, global state)
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class Detection(BaseModel):
+    """Single object detection result"""
+    bbox_xyxy: List[float] = Field(
+        ...,
+        description="Bounding box coordinates [x1, y1, x2, y2]"
+    )
+    confidence: float = Field(
+        ...,
+        ge=0.0,
+        le=1.0,
+        description="Detection confidence score"
+    )
+    specific_name: str = Field(
+        ...,
+        description="Specific trash category (L1 label)"
+    )
+    general_category: str = Field(
+        ...,
+        description="General disposal category (L2 label): Recycle/Trash/Hazardous/Organic"
+    )
+
+
+class DetectionResponse(BaseModel):
+    """API response model"""
+    status: str = Field(
+        default="success",
+        description="Request status"
+    )
+    detection_count: int = Field(
+        ...,
+        ge=0,
+        description="Number of objects detected"
+    )
+    detections: List[Detection] = Field(
+        default_factory=list,
+        description="List of detected objects"
+    )
+    inference_time_ms: float = Field(
+        ...,
+        description="Model inference time in milliseconds"
+    )
+    cached: bool = Field(
+        default=False,
+        description="Whether the result was served from the persistent result store"
+    )
+    prefiltered: bool = Field(
+        default=False,
+        description="Whether detection was skipped because the stream showed an empty scene"
+    )
+    reused: bool = Field(
+        default=False,
+        description="Whether detections were propagated from the session's previous frame"
+    )
+    model_version: Optional[str] = Field(
+        default=None,
+        description="Model version (run/weights@fingerprint) that served the request"
+    )
+    upload_waste_bytes: Optional[int] = Field(
+        default=None,
+        description="Estimated upload bytes that downscaling to /v1/input_spec recommended_max_side would have saved"
+    )
+
+
+class ErrorResponse(BaseModel):
+    """Error response model"""
+    status: str = "error"
+    message: str
+    detail: Optional[str] = None
+
+
+class BatchItemResult(BaseModel):
+    """Result for one image of a batch request"""
+    index: int = Field(..., description="Position of the image in the request")
+    status_code: int = Field(..., description="HTTP status this image would have had as a single request")
+    result: Optional[DetectionResponse] = Field(default=None, description="Detections, if successful")
+    error: Optional[str] = Field(default=None, description="Error detail, if unsuccessful")
+
+
+class BatchDetectionResponse(BaseModel):
+    """Batch API response model"""
+    status: str = Field(default="success", description="Request status")
+    results: List[BatchItemResult] = Field(default_factory=list, description="Per-image results in request order")
@@ -0,0 +1,278 @@
+"""
+Long-running soak test with memory growth detection
+Drives /v1/detect_trash with mixed image sizes for hours, samples the
+server's /debug/memory after every load interval, and reports metrics and
+tracemalloc call sites that kept growing.
+
+Start the server with tracemalloc to get call sites:
+    TRACEMALLOC_FRAMES=10 python api/main.py
+
+Usage:
+    python api/soak_test.py --hours 4 --interval 300 --concurrency 4 --output soak_report.json
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import requests
+
+from test_client import load_corpus, run_load_test, summarize_load_test, parse_sizes
+
+
+DEFAULT_SIZES = "640x480,1280x720,1920x1080,4000x3000"
+
+# (report name, path into a /debug/memory sample, minimum growth that counts as a leak)
+TRACKED_METRICS = [
+    ("rss_mb", ("rss_mb",), 50.0),
+    ("open_fds", ("open_fds",), 10),
+    ("threads", ("threads",), 4),
+    ("tracemalloc_traced_mb", ("tracemalloc", "traced_mb"), 20.0),
+    ("torch_allocated_mb", ("torch", "allocated_mb"), 50.0),
+    ("torch_reserved_mb", ("torch", "reserved_mb"), 100.0),
+    ("torch_inactive_split_mb", ("torch", "inactive_split_mb"), 50.0)
+]
+
+
+def fetch_memory(base_url, top=50, admin_token=None):
+    """One /debug/memory sample (after a server-side garbage collection)"""
+    headers = {"X-Admin-Token": admin_token} if admin_token else {}
+    response = requests.get(
+        f"{base_url}/debug/memory", params={"top": top, "collect": "true"}, headers=headers, timeout=120
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _lookup(sample, path):
+    for key in path:
+        if not isinstance(sample, dict) or sample.get(key) is None:
+            return None
+        sample = sample[key]
+    return sample
+
+
+def detect_growth(times, values, min_growth, monotonic_fraction=0.8):
+    """
+    Decide whether a series grows steadily
+
+    A series is flagged when it grew by at least min_growth overall and at
+    most (1 - monotonic_fraction) of its steps went down, so a single spike
+    or a sawtooth that returns to its level is not reported.
+
+    Returns:
+        Dict with start, end, growth, least-squares slope per hour and the growing flag
+    """
+    if len(values) < 3:
+        return None
+
+    n = len(values)
+    mean_t, mean_v = sum(times) / n, sum(values) / n
+    var_t = sum((t - mean_t) ** 2 for t in times)
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values)) / var_t if var_t else 0.0
+
+    steps = [b - a for a, b in zip(values, values[1:])]
+    decreasing = sum(1 for step in steps if step < 0)
+    growth = values[-1] - values[0]
+
+    return {
+        "start": values[0],
+        "end": values[-1],
+        "growth": round(growth, 2),
+        "slope_per_hour": round(slope * 3600, 2),
+        "increasing_fraction": round(sum(1 for step in steps if step > 0) / len(steps), 2),
+        "growing": growth >= min_growth and slope > 0 and decreasing <= (1 - monotonic_fraction) * len(steps)
+    }
+
+
+def analyze(samples, warmup=2, min_site_growth_kb=512.0):
+    """
+    Growth of each tracked metric and tracemalloc call site after the warmup samples
+
+    Returns:
+        Dict with per-metric growth, growing call sites and a diagnosis
+    """
+    steady = samples[warmup:] if len(samples) > warmup + 2 else samples
+    times = [s["timestamp"] - steady[0]["timestamp"] for s in steady] if steady else []
+
+    metrics = {}
+    for name, path, min_growth in TRACKED_METRICS:
+        points = [(t, _lookup(s, path)) for t, s in zip(times, steady)]
+        points = [(t, v) for t, v in points if v is not None]
+        if points:
+            metrics[name] = detect_growth([t for t, _ in points], [v for _, v in points], min_growth)
+
+    # Follow each call site (full traceback) across samples; sites outside a sample's top list are skipped
+    sites = {}
+    for t, sample in zip(times, steady):
+        for site in _lookup(sample, ("tracemalloc", "top_allocators")) or []:
+            key = " <- ".join(site["traceback"])
+            entry = sites.setdefault(key, {"site": site["site"], "traceback": site["traceback"], "points": []})
+            entry["points"].append((t, site["size_diff_kb"], site["count_diff"]))
+
+    leaking_sites = []
+    for entry in sites.values():
+        points = entry["points"]
+        growth = detect_growth([p[0] for p in points], [p[1] for p in points], min_site_growth_kb)
+        if growth and growth["growing"]:
+            leaking_sites.append({
+                "site": entry["site"],
+                "traceback": entry["traceback"],
+                "size_diff_kb": points[-1][1],
+                "count_diff": points[-1][2],
+                "slope_kb_per_hour": growth["slope_per_hour"],
+                "samples": len(points)
+            })
+    leaking_sites.sort(key=lambda site: -site["slope_kb_per_hour"])
+
+    return {
+        "samples": len(samples),
+        "warmup_samples": len(samples) - len(steady),
+        "metrics": metrics,
+        "leaking_sites": leaking_sites[:25],
+        "diagnosis": diagnose(metrics, leaking_sites)
+    }
+
+
+def diagnose(metrics, leaking_sites):
+    """Plain-language reading of the growth flags"""
+    def growing(name):
+        return bool(metrics.get(name) and metrics[name]["growing"])
+
+    findings = []
+    if growing("rss_mb"):
+        if leaking_sites:
+            findings.append("RSS grows with Python allocations at the call sites listed: likely a Python-level leak")
+        elif "tracemalloc_traced_mb" in metrics and not growing("tracemalloc_traced_mb"):
+            findings.append("RSS grows while traced Python memory is flat: native leak or heap fragmentation "
+                            "(try MALLOC_ARENA_MAX=2 or jemalloc and compare)")
+        elif "tracemalloc_traced_mb" not in metrics:
+            findings.append("RSS grows; restart the server with TRACEMALLOC_FRAMES=10 to locate call sites")
+    if growing("torch_allocated_mb"):
+        findings.append("Live CUDA tensors keep growing: tensors are being retained across requests")
+    elif growing("torch_reserved_mb") or growing("torch_inactive_split_mb"):
+        findings.append("CUDA reserved memory grows without live tensors: caching allocator fragmentation "
+                        "(varying input shapes; check resolution buckets)")
+    if growing("open_fds"):
+        findings.append("Open file descriptors keep growing: files, sockets or shared memory blocks are not closed")
+    if growing("threads"):
+        findings.append("Thread count keeps growing: threads are started per request and never joined")
+    return findings or ["No steady growth detected"]
+
+
+def print_report(report):
+    """Print the soak test summary"""
+    print("\n" + "="*60)
+    print("Soak Test Results")
+    print("="*60)
+    print(f"Duration: {report['duration_h']:.2f} h, {report['requests']} requests, "
+          f"{report['analysis']['samples']} memory samples ({report['analysis']['warmup_samples']} warmup)")
+
+    print("\nMetric                      start        end     growth    per hour")
+    for name, growth in report["analysis"]["metrics"].items():
+        if growth:
+            flag = "  ⚠️  GROWING" if growth["growing"] else ""
+            print(f"  {name:<24}{growth['start']:>9}  {growth['end']:>9}  {growth['growth']:>9}  "
+                  f"{growth['slope_per_hour']:>10}{flag}")
+
+    latency = report["latency_p99_ms"]
+    if latency:
+        print(f"\nInterval p99 latency: first {latency[0]} ms, last {latency[-1]} ms")
+
+    if report["analysis"]["leaking_sites"]:
+        print("\nGrowing allocation sites (most recent call first):")
+        for site in report["analysis"]["leaking_sites"][:10]:
+            print(f"  +{site['size_diff_kb']:.0f} KB ({site['slope_kb_per_hour']:.0f} KB/h, "
+                  f"{site['count_diff']:+d} blocks)  {site['site']}")
+            for frame in site["traceback"][1:4]:
+                print(f"      <- {frame}")
+
+    print("\nDiagnosis:")
+    for finding in report["analysis"]["diagnosis"]:
+        print(f"  - {finding}")
+
+
+def main():
+    """Run the soak test"""
+    parser = argparse.ArgumentParser(description="Soak test the API and detect memory growth")
+    parser.add_argument('--url', type=str, default='http://localhost:8000', help='API base URL')
+    parser.add_argument('--hours', type=float, default=4.0, help='Total soak duration in hours')
+    parser.add_argument('--interval', type=float, default=300.0, help='Seconds of load between memory samples')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients')
+    parser.add_argument('--rps', type=float, help='Open-loop request rate (default: closed loop)')
+    parser.add_argument('--images', type=str, help='Directory of images (default: synthetic)')
+    parser.add_argument('--sizes', type=str, default=DEFAULT_SIZES, help='Synthetic image sizes, e.g. 640x480,4000x3000')
+    parser.add_argument('--top', type=int, default=50, help='tracemalloc call sites per sample')
+    parser.add_argument('--warmup', type=int, default=2, help='Samples excluded from growth analysis')
+    parser.add_argument('--admin-token', type=str, help='X-Admin-Token for /debug/memory')
+    parser.add_argument('--samples-file', type=str, default='soak_samples.jsonl',
+                        help='Raw samples, appended as they are taken')
+    parser.add_argument('--output', type=str, help='Save the report as JSON')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.images, parse_sizes(args.sizes))
+    if not corpus:
+        print(f"✗ No images found in {args.images}")
+        return 1
+
+    try:
+        samples = [fetch_memory(args.url, args.top, args.admin_token)]
+    except requests.exceptions.RequestException as e:
+        print(f"✗ Could not read {args.url}/debug/memory: {e}")
+        return 1
+    if samples[0].get("tracemalloc") is None:
+        print("⚠️  tracemalloc is off on the server; start it with TRACEMALLOC_FRAMES=10 to locate call sites")
+
+    print(f"Soaking {args.url} for {args.hours:.2f} h with {len(corpus)} images, "
+          f"sampling memory every {args.interval:.0f}s")
+
+    samples_path = Path(args.samples_file)
+    with open(samples_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(samples[0]) + "\n")
+
+    start = time.time()
+    deadline = start + args.hours * 3600
+    requests_sent = 0
+    intervals = []
+
+    while time.time() < deadline:
+        duration = min(args.interval, deadline - time.time())
+        results, elapsed = run_load_test(args.url, corpus, concurrency=args.concurrency,
+                                         rps=args.rps, duration=duration)
+        summary = summarize_load_test(results, elapsed)
+        requests_sent += summary["requests"]
+        intervals.append(summary)
+
+        try:
+            sample = fetch_memory(args.url, args.top, args.admin_token)
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Memory sample failed ({e}); is the server still up?")
+            break
+        samples.append(sample)
+        with open(samples_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(sample) + "\n")
+
+        p99 = summary["latency_ms"]["p99"] if summary["latency_ms"] else None
+        print(f"[{(time.time() - start) / 3600:5.2f} h] {summary['requests']} requests "
+              f"({summary['failed']} failed), p99 {p99} ms, RSS {sample['rss_mb']} MB, fds {sample['open_fds']}")
+
+    report = {
+        "url": args.url,
+        "duration_h": round((time.time() - start) / 3600, 3),
+        "requests": requests_sent,
+        "latency_p99_ms": [s["latency_ms"]["p99"] for s in intervals if s["latency_ms"]],
+        "analysis": analyze(samples, args.warmup)
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""
+Elastic worker supervisor for the Garbage Classification API
+Runs api/main.py worker processes on consecutive ports and scales their
+number between configured bounds based on inference queue depth and
+interactive p99 latency. Scaling events are appended to a JSONL log.
+
+Usage:
+    MODEL_PATH=models/<run>/weights/best.safetensors \
+        python api/supervisor.py --min-workers 1 --max-workers 4 --base-port 8001
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import logging
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+API_DIR = Path(__file__).parent
+
+
+class WorkerProcess:
+    """One api/main.py process"""
+
+    def __init__(self, port: int, host: str, env: Dict[str, str], log_dir: Path):
+        self.port = port
+        self.url = f"http://{host if host != '0.0.0.0' else '127.0.0.1'}:{port}"
+        self.started_at = time.time()
+        self.ready_at = None
+        self.draining_since = None
+
+        log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_file = open(log_dir / f"worker_{port}.log", 'ab')
+        self.process = subprocess.Popen(
+            [sys.executable, str(API_DIR / 'main.py')],
+            env={**env, "API_HOST": host, "API_PORT": str(port)},
+            stdout=self.log_file,
+            stderr=subprocess.STDOUT
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def stop(self, timeout: float = 30.0):
+        """SIGTERM (uvicorn finishes in-flight requests), then SIGKILL after timeout"""
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log_file.close()
+
+
+class Supervisor:
+    """
+    Scales worker processes on queue depth and latency
+
+    Every interval_s each ready worker's /health (queue_depth) and
+    /v1/stats (interactive latency_ms_p99) are polled. A worker is added
+    after up_polls consecutive polls with mean queue depth per worker above
+    scale_up_depth or (while busy) p99 above latency_target_ms, and one is
+    removed after down_polls consecutive polls below scale_down_depth.
+    Only one worker starts at a time, and scaling waits cooldown_s after
+    the previous change.
+    """
+
+    def __init__(
+        self,
+        min_workers: int = 1,
+        max_workers: int = 4,
+        host: str = "127.0.0.1",
+        base_port: int = 8001,
+        scale_up_depth: float = 4.0,
+        scale_down_depth: float = 0.5,
+        latency_target_ms: float = 0.0,
+        interval_s: float = 2.0,
+        up_polls: int = 3,
+        down_polls: int = 15,
+        cooldown_s: float = 30.0,
+        drain_s: float = 5.0,
+        events_path: str = "logs/scaling_events.jsonl",
+        backends_path: Optional[str] = "logs/backends.json"
+    ):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.host = host
+        self.base_port = base_port
+        self.scale_up_depth = scale_up_depth
+        self.scale_down_depth = scale_down_depth
+        self.latency_target_ms = latency_target_ms
+        self.interval_s = interval_s
+        self.up_polls = up_polls
+        self.down_polls = down_polls
+        self.cooldown_s = cooldown_s
+        self.drain_s = drain_s
+        self.events_path = Path(events_path)
+        self.backends_path = Path(backends_path) if backends_path else None
+
+        self.workers: List[WorkerProcess] = []
+        self.draining: List[WorkerProcess] = []
+        self.env = self._worker_env()
+        self.session = requests.Session()
+        self._over = 0
+        self._under = 0
+        self._last_change = 0.0
+        self._running = True
+
+    def _worker_env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+
+        model_path = env.get("MODEL_PATH", "")
+        if not model_path.endswith(".safetensors"):
+            logger.warning("MODEL_PATH is not a .safetensors file; new workers will unpickle the full "
+                           "checkpoint instead of mapping shared weights (see scripts/convert_weights.py)")
+
+        # Split the cores between workers instead of letting each one claim all of them
+        if "OMP_NUM_THREADS" not in env:
+            env["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // self.max_workers))
+        return env
+
+    def record(self, event: str, **fields):
+        """Append a scaling event to the JSONL log"""
+        entry = {
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "event": event,
+            "workers": len(self.workers),
+            **fields
+        }
+        self.events_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.events_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        logger.info(f"{event}: {fields}")
+
+    def _write_backends(self):
+        """Publish ready worker URLs for the router (api/router.py --backends-file)"""
+        if self.backends_path is None:
+            return
+        self.backends_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.backends_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps([w.url for w in self.workers if w.ready], indent=2))
+        tmp_path.replace(self.backends_path)
+
+    def _free_port(self) -> int:
+        used = {w.port for w in self.workers + self.draining}
+        port = self.base_port
+        while port in used:
+            port += 1
+        return port
+
+    def start_worker(self, reason: str, **fields):
+        worker = WorkerProcess(self._free_port(), self.host, self.env, self.events_path.parent)
+        self.workers.append(worker)
+        self._last_change = time.time()
+        self.record("scale_up", reason=reason, port=worker.port, **fields)
+
+    def stop_worker(self, reason: str, **fields):
+        """Unpublish the newest worker, then stop it once the router has stopped sending to it"""
+        worker = self.workers.pop()
+        worker.draining_since = time.time()
+        self.draining.append(worker)
+        self._write_backends()
+        self._last_change = time.time()
+        self.record("scale_down", reason=reason, port=worker.port, **fields)
+
+    def _get(self, worker: WorkerProcess, path: str) -> Optional[Dict]:
+        try:
+            response = self.session.get(f"{worker.url}{path}", timeout=1.0)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError):
+            return None
+
+    def poll(self) -> Dict:
+        """Check worker processes and collect load metrics from the ready ones"""
+        for worker in list(self.workers):
+            if not worker.alive():
+                self.workers.remove(worker)
+                worker.stop()
+                self._write_backends()
+                self.record("worker_exited", port=worker.port, returncode=worker.process.returncode)
+
+        for worker in list(self.draining):
+            if time.time() - worker.draining_since >= self.drain_s:
+                worker.stop()
+                self.draining.remove(worker)
+
+        depths, p99s = [], []
+        for worker in self.workers:
+            health = self._get(worker, "/health")
+            if health is None or not health.get("model_loaded"):
+                continue
+
+            if not worker.ready:
+                worker.ready_at = time.time()
+                self._write_backends()
+                self.record("worker_ready", port=worker.port,
+                            startup_s=round(worker.ready_at - worker.started_at, 2))
+
+            depths.append(health.get("queue_depth", 0))
+            stats = self._get(worker, "/v1/stats") or {}
+            lanes = (stats.get("scheduler") or {}).get("lanes", {})
+            if "interactive" in lanes:
+                p99s.append(lanes["interactive"]["latency_ms_p99"])
+
+        return {
+            "ready": len(depths),
+            "starting": sum(1 for w in self.workers if not w.ready),
+            "depth_per_worker": round(sum(depths) / len(depths), 2) if depths else 0.0,
+            "p99_ms": max(p99s) if p99s else 0.0
+        }
+
+    def decide(self, metrics: Dict):
+        """Apply the scaling rules to one poll's metrics"""
+        if len(self.workers) < self.min_workers:
+            self.start_worker("below_min_workers", **metrics)
+            return
+
+        # p99 covers a window of recent requests, so it only counts while work is queued
+        over_latency = (bool(self.latency_target_ms) and metrics["p99_ms"] > self.latency_target_ms
+                        and metrics["depth_per_worker"] >= 1)
+        overloaded = metrics["depth_per_worker"] > self.scale_up_depth or over_latency
+        underloaded = metrics["depth_per_worker"] < self.scale_down_depth
+
+        self._over = self._over + 1 if overloaded else 0
+        self._under = self._under + 1 if underloaded else 0
+
+        if metrics["starting"] or time.time() - self._last_change < self.cooldown_s:
+            return
+
+        if self._over >= self.up_polls and len(self.workers) < self.max_workers:
+            self.start_worker("latency" if over_latency else "queue_depth", **metrics)
+            self._over = 0
+        elif self._under >= self.down_polls and len(self.workers) > self.min_workers:
+            self.stop_worker("idle", **metrics)
+            self._under = 0
+
+    def run(self):
+        """Supervise until SIGINT/SIGTERM, then stop every worker"""
+        def stop(signum, frame):
+            self._running = False
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.record("supervisor_started", min_workers=self.min_workers, max_workers=self.max_workers)
+        for _ in range(self.min_workers):
+            self.start_worker("initial")
+
+        while self._running:
+            time.sleep(self.interval_s)
+            self.decide(self.poll())
+
+        for worker in self.workers + self.draining:
+            worker.stop()
+        self.workers, self.draining = [], []
+        self._write_backends()
+        self.record("supervisor_stopped")
+
+
+def main():
+    """Run the elastic worker supervisor"""
+    parser = argparse.ArgumentParser(description="Scale API worker processes on queue depth and latency")
+    parser.add_argument('--min-workers', type=int, default=1, help='Minimum worker processes')
+    parser.add_argument('--max-workers', type=int, default=4, help='Maximum worker processes')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Worker bind address')
+    parser.add_argument('--base-port', type=int, default=8001, help='Port of the first worker')
+    parser.add_argument('--scale-up-depth', type=float, default=4.0,
+                        help='Mean queued+running requests per worker that triggers scale up')
+    parser.add_argument('--scale-down-depth', type=float, default=0.5,
+                        help='Mean queued+running requests per worker that allows scale down')
+    parser.add_argument('--latency-target-ms', type=float, default=0.0,
+                        help='Interactive p99 that triggers scale up (0 = queue depth only)')
+    parser.add_argument('--interval', type=float, default=2.0, help='Polling interval in seconds')
+    parser.add_argument('--cooldown', type=float, default=30.0, help='Seconds between scaling changes')
+    parser.add_argument('--events', type=str, default='logs/scaling_events.jsonl', help='Scaling event log')
+    parser.add_argument('--backends-file', type=str, default='logs/backends.json',
+                        help='File listing ready worker URLs for api/router.py')
+    args = parser.parse_args()
+
+    if args.min_workers < 1 or args.max_workers < args.min_workers:
+        parser.error("Require 1 <= --min-workers <= --max-workers")
+
+    Supervisor(
+        min_workers=args.min_workers,
+        max_workers=args.max_workers,
+        host=args.host,
+        base_port=args.base_port,
+        scale_up_depth=args.scale_up_depth,
+        scale_down_depth=args.scale_down_depth,
+        latency_target_ms=args.latency_target_ms,
+        interval_s=args.interval,
+        cooldown_s=args.cooldown,
+        events_path=args.events,
+        backends_path=args.backends_file
+    ).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Temporal result reuse for near-identical consecutive frames
+Reuses (and shift-propagates) the previous detections of a session when the
+new frame is perceptually almost the same as the last processed one
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+
+logger = logging.getLogger(__name__)
+
+
+class FrameSignature:
+    """Perceptual hash plus a small thumbnail of one frame"""
+
+    THUMBNAIL_SIZE = 64
+
+    def __init__(
+        self,
+        img_array: np.ndarray,
+        frame_size: Optional[Tuple[int, int]] = None,
+        offset: Tuple[float, float] = (0.0, 0.0)
+    ):
+        """
+        frame_size is the (width, height) of img_array in reported pixels, if it
+        was downscaled; offset is where img_array (an ROI crop) starts in the
+        full image, whose coordinates detections are reported in
+        """
+        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if img_array.ndim == 3 else img_array
+
+        # dHash: compare horizontally adjacent pixels of a 9x8 thumbnail
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        self.dhash = int(np.packbits(bits).view('>u8')[0])
+
+        self.thumbnail = cv2.resize(
+            gray, (self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA
+        ).astype(np.float32)
+        self.width, self.height = frame_size if frame_size is not None else (gray.shape[1], gray.shape[0])
+        self.offset_x, self.offset_y = offset
+
+    def distance(self, other: 'FrameSignature') -> int:
+        """Hamming distance between the two perceptual hashes"""
+        return bin(self.dhash ^ other.dhash).count('1')
+
+    def shift_from(self, other: 'FrameSignature'):
+        """Estimate the global (dx, dy) translation from other to self in image pixels"""
+        (dx, dy), _ = cv2.phaseCorrelate(other.thumbnail, self.thumbnail)
+        return dx * self.width / self.THUMBNAIL_SIZE, dy * self.height / self.THUMBNAIL_SIZE
+
+
+class _SessionState:
+    """Last processed frame and its detections for one session"""
+
+    def __init__(self, signature: FrameSignature, detections: List[Dict], context: str):
+        self.signature = signature
+        self.context = context
+        self.detections = detections
+        self.processed_at = time.time()
+        self.reuses = 0
+
+
+class TemporalReuseCache:
+    """
+    Per-session reuse of detections across near-identical frames
+
+    A frame within max_distance bits (dHash) of the session's last processed
+    frame reuses its detections, shifted by the estimated global translation
+    and rescaled if the resolution changed. After max_reuses consecutive
+    reuses, or once the processed result is older than max_age_s, the next
+    frame is forced through the model to keep drift bounded. Detections are
+    only reused by requests with the same context, a digest of everything
+    besides the pixels that shapes the result (inference parameters, ROI).
+    """
+
+    def __init__(
+        self,
+        max_distance: int = 4,
+        max_reuses: int = 10,
+        max_age_s: float = 2.0,
+        max_sessions: int = 1024
+    ):
+        self.max_distance = max_distance
+        self.max_reuses = max_reuses
+        self.max_age_s = max_age_s
+        self.max_sessions = max_sessions
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.reused = 0
+        self.forced_refreshes = 0
+
+    def lookup(self, session_id: str, signature: FrameSignature, context: str = "") -> Optional[List[Dict]]:
+        """Return propagated detections for a near-identical frame, or None to run the model"""
+        with self._lock:
+            self.frames += 1
+            state = self._sessions.get(session_id)
+            if state is None:
+                return None
+            self._sessions.move_to_end(session_id)
+
+            if state.context != context:
+                return None
+
+            if signature.distance(state.signature) > self.max_distance:
+                return None
+
+            if state.reuses >= self.max_reuses or time.time() - state.processed_at > self.max_age_s:
+                self.forced_refreshes += 1
+                return None
+
+            state.reuses += 1
+            self.reused += 1
+            previous = state.signature
+            detections = state.detections
+
+        return self._propagate(detections, previous, signature)
+
+    def store(self, session_id: str, signature: FrameSignature, detections: List[Dict], context: str = ""):
+        """Record the model's detections for a processed frame"""
+        with self._lock:
+            self._sessions[session_id] = _SessionState(signature, detections, context)
+            self._sessions.move_to_end(session_id)
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    @staticmethod
+    def _propagate(detections: List[Dict], previous: FrameSignature, current: FrameSignature) -> List[Dict]:
+        """Rescale and shift boxes from the previous frame into the current frame"""
+        scale_x = current.width / previous.width
+        scale_y = current.height / previous.height
+        dx, dy = current.shift_from(previous) if (scale_x, scale_y) == (1.0, 1.0) else (0.0, 0.0)
+
+        def move(x, y):
+            # Full-image -> previous crop -> current crop -> full-image coordinates
+            x = np.clip((x - previous.offset_x) * scale_x + dx, 0, current.width) + current.offset_x
+            y = np.clip((y - previous.offset_y) * scale_y + dy, 0, current.height) + current.offset_y
+            return float(x), float(y)
+
+        propagated = []
+        for detection in detections:
+            x1, y1, x2, y2 = detection["bbox_xyxy"]
+            bbox = [*move(x1, y1), *move(x2, y2)]
+            propagated.append({**detection, "bbox_xyxy": bbox})
+        return propagated
+
+    def stats(self) -> Dict:
+        """Return reuse counters"""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "frames": self.frames,
+                "reused": self.reused,
+                "reuse_rate": round(self.reused / self.frames, 4) if self.frames else 0.0,
+                "forced_refreshes": self.forced_refreshes,
+                "max_distance": self.max_distance,
+                "max_reuses": self.max_reuses
+            }
+
+
+def create_temporal_cache_from_env() -> Optional[TemporalReuseCache]:
+    """Create the temporal reuse cache if TEMPORAL_REUSE_ENABLED is true, otherwise return None"""
+    if os.getenv("TEMPORAL_REUSE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+
+    return TemporalReuseCache(
+        max_distance=int(os.getenv("TEMPORAL_MAX_HASH_DISTANCE", "4")),
+        max_reuses=int(os.getenv("TEMPORAL_MAX_REUSES", "10")),
+        max_age_s=float(os.getenv("TEMPORAL_MAX_AGE_S", "2.0"))
+    )
@@ -1,10 +1,16 @@
 """
 Test client for Garbage Classification API
-Example usage of the API endpoints
+Example usage of the API endpoints, plus a load-testing mode (--load)
 """
 
 import requests
+import io
 import json
+import time
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import argparse
 
@@ -66,6 +72,9 @@ def test_detect_trash(image_path, base_url="http://localhost:8000"):
         print(f"\nStatus: {data['status']}")
         print(f"Detection Count: {data['detection_count']}")
         print(f"Inference Time: {data['inference_time_ms']:.2f} ms")
+        if data.get('upload_waste_bytes'):
+            print(f"Upload Waste: ~{data['upload_waste_bytes'] / 1024:.0f} KB could be saved by "
+                  f"downscaling before upload (see /v1/input_spec)")
 
         if data['detection_count'] > 0:
             print(f"\nDetections:")
@@ -120,6 +129,230 @@ def test_get_categories(base_url="http://localhost:8000"):
         return None
 
 
+def fetch_input_spec(base_url="http://localhost:8000"):
+    """Get the server's advertised input size and upload limits, or None if unavailable"""
+    try:
+        response = requests.get(f"{base_url}/v1/input_spec", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException:
+        return None
+
+
+def downscale_for_spec(corpus, spec):
+    """Downscale and re-encode corpus images to the server's recommended_max_side"""
+    from PIL import Image
+
+    max_side = spec["recommended_max_side"]
+    resized = []
+    for name, contents, content_type in corpus:
+        img = Image.open(io.BytesIO(contents))
+        if max(img.size) <= max_side:
+            resized.append((name, contents, content_type))
+            continue
+        scale = max_side / max(img.size)
+        img = img.convert('RGB').resize((round(img.width * scale), round(img.height * scale)), Image.BILINEAR)
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=spec.get("jpeg_quality", 90))
+        resized.append((name, buffer.getvalue(), 'image/jpeg'))
+    return resized
+
+
+def load_corpus(images_dir=None, synthetic_sizes=None, limit=200):
+    """
+    Build the request corpus: image files from a directory, or synthetic JPEGs
+
+    Args:
+        images_dir: Directory of .jpg/.jpeg/.png files
+        synthetic_sizes: List of (width, height) for generated images
+
+    Returns:
+        List of (name, bytes, content type)
+    """
+    corpus = []
+
+    if images_dir:
+        for path in sorted(Path(images_dir).iterdir())[:limit]:
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png'):
+                content_type = 'image/png' if path.suffix.lower() == '.png' else 'image/jpeg'
+                corpus.append((path.name, path.read_bytes(), content_type))
+        return corpus
+
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    for width, height in synthetic_sizes or [(1280, 720)]:
+        # Smooth gradients plus noise compress like photos, unlike pure noise
+        y, x = np.mgrid[0:height, 0:width]
+        base = np.stack([(x * 255 // max(width - 1, 1)), (y * 255 // max(height - 1, 1)),
+                         ((x + y) * 127 // max(width + height - 2, 1))], axis=-1)
+        pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+        corpus.append((f"synthetic_{width}x{height}.jpg", buffer.getvalue(), 'image/jpeg'))
+
+    return corpus
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+        "mean": round(sum(ordered) / len(ordered), 2)
+    }
+
+
+def run_load_test(
+    base_url,
+    corpus,
+    concurrency=8,
+    rps=None,
+    duration=30.0,
+    max_requests=None,
+    request_class=None,
+    poisson=True
+):
+    """
+    Load the detection endpoint
+
+    Closed loop (rps=None): `concurrency` clients each send their next
+    request as soon as the previous one finishes. Open loop: requests
+    arrive at `rps` per second (Poisson or evenly spaced) regardless of
+    how fast the server answers, and latency is measured from the
+    scheduled arrival time so a slow server cannot hide queueing.
+    Each client thread reuses one keep-alive requests.Session.
+
+    Returns:
+        List of per-request result dicts
+    """
+    local = threading.local()
+    results = []
+    results_lock = threading.Lock()
+    headers = {"X-Request-Class": request_class} if request_class else {}
+
+    def send(index, scheduled_at):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+
+        name, contents, content_type = corpus[index % len(corpus)]
+        result = {"image": name, "bytes": len(contents), "scheduled_at": scheduled_at}
+        try:
+            response = local.session.post(
+                f"{base_url}/v1/detect_trash",
+                files={'image': (name, contents, content_type)},
+                headers=headers,
+                timeout=60
+            )
+            result["status"] = response.status_code
+            if response.ok:
+                data = response.json()
+                result["server_ms"] = data.get("inference_time_ms")
+                result["detections"] = data.get("detection_count")
+            else:
+                result["error"] = f"http_{response.status_code}"
+        except requests.exceptions.RequestException as e:
+            result["status"] = None
+            result["error"] = type(e).__name__
+
+        result["latency_ms"] = (time.perf_counter() - scheduled_at) * 1000
+        with results_lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    deadline = start + duration
+    sent = 0
+
+    if rps is None:
+        counter_lock = threading.Lock()
+
+        def client():
+            nonlocal sent
+            while time.perf_counter() < deadline:
+                with counter_lock:
+                    if max_requests is not None and sent >= max_requests:
+                        return
+                    index = sent
+                    sent += 1
+                send(index, time.perf_counter())
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        rng = random.Random(0)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            next_arrival = start
+            while next_arrival < deadline and (max_requests is None or sent < max_requests):
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(send, sent, next_arrival)
+                sent += 1
+                next_arrival += rng.expovariate(rps) if poisson else 1.0 / rps
+
+    for result in results:
+        result["scheduled_at"] -= start
+    return results, time.perf_counter() - start
+
+
+def summarize_load_test(results, elapsed):
+    """Latency percentiles, throughput, error breakdown and server vs end-to-end time"""
+    ok = [r for r in results if "error" not in r]
+    latencies = [r["latency_ms"] for r in ok]
+    server = [r["server_ms"] for r in ok if r.get("server_ms") is not None]
+    overhead = [r["latency_ms"] - r["server_ms"] for r in ok if r.get("server_ms") is not None]
+
+    return {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "errors": dict(Counter(r["error"] for r in results if "error" in r)),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": _percentiles(latencies),
+        "server_inference_ms": _percentiles(server),
+        "overhead_ms": _percentiles(overhead)
+    }
+
+
+def print_load_report(summary):
+    """Print a load test summary"""
+    print("\n" + "="*60)
+    print("Load Test Results")
+    print("="*60)
+    print(f"Requests: {summary['requests']} ({summary['succeeded']} ok, {summary['failed']} failed)")
+    print(f"Throughput: {summary['throughput_rps']:.2f} req/s over {summary['elapsed_s']:.1f}s")
+
+    for label, key in (("End-to-end", "latency_ms"), ("Server inference", "server_inference_ms"),
+                       ("Overhead", "overhead_ms")):
+        stats = summary[key]
+        if stats:
+            print(f"{label:>17}: p50 {stats['p50']:.1f}  p90 {stats['p90']:.1f}  "
+                  f"p99 {stats['p99']:.1f}  max {stats['max']:.1f} ms")
+
+    if summary["errors"]:
+        print("\nErrors:")
+        for error, count in sorted(summary["errors"].items(), key=lambda item: -item[1]):
+            print(f"  {error}: {count}")
+
+
+def parse_sizes(value):
+    """Parse "640x480,1920x1080" into [(640, 480), (1920, 1080)]"""
+    return [tuple(int(v) for v in size.lower().split('x')) for size in value.split(',') if size.strip()]
+
+
 def main():
     """Main test function"""
     parser = argparse.ArgumentParser(
@@ -142,8 +375,65 @@ def main():
         help='Run all tests'
     )
 
+    load_group = parser.add_argument_group('load testing')
+    load_group.add_argument('--load', action='store_true', help='Run a load test instead of the functional tests')
+    load_group.add_argument('--concurrency', type=int, default=8,
+                            help='Closed loop: concurrent clients; open loop: max outstanding requests')
+    load_group.add_argument('--rps', type=float, help='Open-loop target arrival rate (omit for closed loop)')
+    load_group.add_argument('--uniform', action='store_true', help='Evenly spaced arrivals instead of Poisson')
+    load_group.add_argument('--duration', type=float, default=30.0, help='Test duration in seconds')
+    load_group.add_argument('--requests', type=int, help='Stop after this many requests')
+    load_group.add_argument('--images', type=str, help='Directory of images to send (default: synthetic)')
+    load_group.add_argument('--sizes', type=str, default='1280x720',
+                            help='Synthetic image sizes, e.g. 640x480,1920x1080,4000x3000')
+    load_group.add_argument('--request-class', type=str, choices=['interactive', 'bulk'],
+                            help='X-Request-Class header to send')
+    load_group.add_argument('--client-resize', action='store_true',
+                            help='Downscale images to the server\'s /v1/input_spec before sending')
+    load_group.add_argument('--output', type=str, help='Save the summary as JSON for comparing runs')
+
     args = parser.parse_args()
 
+    if args.load:
+        corpus = load_corpus(args.images, parse_sizes(args.sizes))
+        if not corpus:
+            print(f"\n✗ Error: No images found in {args.images}")
+            return
+
+        if args.client_resize:
+            spec = fetch_input_spec(args.url)
+            if spec is None:
+                print("\n⚠ Server does not publish /v1/input_spec, sending images unchanged")
+            else:
+                before = sum(len(c) for _, c, _ in corpus)
+                corpus = downscale_for_spec(corpus, spec)
+                after = sum(len(c) for _, c, _ in corpus)
+                print(f"Downscaled corpus to {spec['recommended_max_side']}px: "
+                      f"{before / 1024**2:.1f} MB -> {after / 1024**2:.1f} MB")
+
+        mode = f"open loop at {args.rps} req/s" if args.rps else f"closed loop with {args.concurrency} clients"
+        print(f"\nLoad testing {args.url} ({mode}, {len(corpus)} images, {args.duration:.0f}s)")
+        results, elapsed = run_load_test(
+            args.url, corpus,
+            concurrency=args.concurrency,
+            rps=args.rps,
+            duration=args.duration,
+            max_requests=args.requests,
+            request_class=args.request_class,
+            poisson=not args.uniform
+        )
+        summary = summarize_load_test(results, elapsed)
+        print_load_report(summary)
+
+        if args.output:
+            config = {k: getattr(args, k) for k in
+                      ('url', 'concurrency', 'rps', 'uniform', 'duration', 'requests', 'images', 'sizes',
+                       'request_class', 'client_resize')}
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({"config": config, "summary": summary}, f, indent=2)
+            print(f"\n✓ Summary saved to {args.output}")
+        return
+
     print("\n" + "="*60)
     print("Garbage Classification API - Test Client")
     print("="*60)
@@ -0,0 +1,305 @@
+"""
+Request tracing
+OpenTelemetry-style spans for the stages of a request (upload read, decode,
+queue wait, batch assembly, inference, postprocess, serialization), W3C
+traceparent propagation, JSONL export, and Server-Timing summaries
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import functools
+import threading
+import logging
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+_current_trace: ContextVar[Optional['Trace']] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional['Span']] = ContextVar("span", default=None)
+
+
+def _random_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Parse a W3C traceparent header ("00-<trace id>-<parent id>-<flags>")
+
+    Returns:
+        (trace id, parent span id, sampled) or None if missing or malformed
+    """
+    if not header:
+        return None
+    parts = header.strip().lower().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[0] == "ff" or parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 0x01)
+
+
+class Span:
+    """One timed stage of a request; times are time.perf_counter() seconds"""
+
+    def __init__(self, name: str, parent_id: Optional[str], start: float, attributes: Optional[Dict] = None):
+        self.name = name
+        self.span_id = _random_id(8)
+        self.parent_id = parent_id
+        self.start = start
+        self.end = None
+        self.attributes = attributes or {}
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end if self.end is not None else time.perf_counter()) - self.start) * 1000
+
+
+class Trace:
+    """
+    Spans of one request
+
+    The root span covers the whole request as seen by the HTTP middleware.
+    Spans may be added from the event loop and from inference worker
+    threads, so additions are locked.
+    """
+
+    def __init__(self, name: str, traceparent: Optional[str] = None, sample_rate: float = 1.0):
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            self.trace_id, remote_parent_id, self.sampled = parent
+        else:
+            self.trace_id, remote_parent_id = _random_id(16), None
+            self.sampled = random.random() < sample_rate
+
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._origin_unix_ns = time.time_ns()
+        self.root = Span(name, remote_parent_id, self._origin)
+        self.spans: List[Span] = []
+        self.received_at = None  # Endpoint entered: request body received and parsed
+        self.handled_at = None  # Endpoint returned: serialization starts
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def record(self, name: str, start: float, end: float, parent: Optional[Span] = None, **attributes):
+        """Add a span whose start and end were measured elsewhere"""
+        span = Span(name, (parent or self.root).span_id, start, attributes)
+        span.end = end
+        self.add(span)
+
+    def mark_received(self):
+        """Record upload_read from request start to the first endpoint entry"""
+        if self.received_at is None:
+            self.received_at = time.perf_counter()
+            self.record("upload_read", self._origin, self.received_at)
+
+    def finish(self):
+        self.root.end = time.perf_counter()
+        if self.handled_at is not None:
+            self.record("serialize", self.handled_at, self.root.end)
+
+    def traceresponse(self) -> str:
+        """W3C trace context for the response, pointing at this server's root span"""
+        return f"00-{self.trace_id}-{self.root.span_id}-{'01' if self.sampled else '00'}"
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value: total time, then each stage summed by name
+        (concurrent stages, e.g. batch items, can add up to more than total)
+        """
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+
+        entries = [f"total;dur={self.root.duration_ms:.1f}"]
+        entries += [f"{name};dur={duration:.1f}" for name, duration in totals.items()]
+        return ", ".join(entries)
+
+    def to_records(self) -> List[Dict]:
+        """Spans as flat OpenTelemetry-like dicts"""
+        def to_unix_ns(t: float) -> int:
+            return self._origin_unix_ns + int((t - self._origin) * 1e9)
+
+        with self._lock:
+            spans = [self.root] + list(self.spans)
+        return [{
+            "trace_id": self.trace_id,
+            "span_id": span.span_id,
+            "parent_span_id": span.parent_id,
+            "name": span.name,
+            "start_time_unix_nano": to_unix_ns(span.start),
+            "end_time_unix_nano": to_unix_ns(span.end if span.end is not None else span.start),
+            "duration_ms": round(span.duration_ms, 3),
+            "attributes": span.attributes
+        } for span in spans]
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, sample_rate: float = 1.0):
+    """
+    Begin a trace for the current request context
+
+    Returns:
+        (trace, token for end_trace)
+    """
+    trace = Trace(name, traceparent, sample_rate)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span; a no-op outside a traced request"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get() or trace.root
+    current = Span(name, parent.span_id, time.perf_counter(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        trace.add(current)
+
+
+def record_span(name: str, start: float, end: float, **attributes):
+    """Add an already measured span (e.g. queue wait) under the current span"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(name, start, end, _current_span.get(), **attributes)
+
+
+def traced(endpoint):
+    """Mark where a traced endpoint starts (upload read ends) and returns (serialization starts)"""
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        trace = _current_trace.get()
+        if trace is None:
+            return await endpoint(**kwargs)
+
+        trace.mark_received()
+        try:
+            return await endpoint(**kwargs)
+        finally:
+            trace.handled_at = time.perf_counter()
+
+    return wrapper
+
+
+class TraceExporter:
+    """
+    Writes finished traces as one JSON span per line to a file, or POSTs them
+    in batches to a collector URL ({"spans": [...]})
+
+    Export runs on a background thread; when the queue is full traces are
+    dropped and counted rather than slowing requests down.
+    """
+
+    def __init__(self, path: Optional[str] = None, collector_url: Optional[str] = None, batch_size: int = 64):
+        self.path = Path(path) if path else None
+        self.collector_url = collector_url
+        self.batch_size = batch_size
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue = queue.Queue(maxsize=1000)
+        self._writer = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+        self._writer.start()
+
+    def export(self, trace: Trace):
+        """Queue a finished trace; never blocks the request"""
+        try:
+            self._queue.put_nowait(trace.to_records())
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _export_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            spans = [record for records in batch for record in records]
+            try:
+                self._write(spans)
+                with self._lock:
+                    self.exported += len(batch)
+            except OSError as e:
+                logger.error(f"Trace export failed: {e}")
+                with self._lock:
+                    self.failed += len(batch)
+
+    def _write(self, spans: List[Dict]):
+        if self.path is not None:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(record) + "\n" for record in spans)
+        if self.collector_url:
+            request = urllib.request.Request(
+                self.collector_url,
+                data=json.dumps({"spans": spans}).encode(),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+
+    def stats(self) -> Dict:
+        """Return export counters"""
+        with self._lock:
+            return {
+                "file": str(self.path) if self.path is not None else None,
+                "collector_url": self.collector_url,
+                "exported_traces": self.exported,
+                "dropped_traces": self.dropped,
+                "failed_traces": self.failed,
+                "queued_traces": self._queue.qsize()
+            }
+
+
+def create_exporter_from_env() -> Optional[TraceExporter]:
+    """Create the trace exporter if TRACE_FILE or TRACE_COLLECTOR_URL is set, otherwise return None"""
+    path = os.getenv("TRACE_FILE", "").strip()
+    collector_url = os.getenv("TRACE_COLLECTOR_URL", "").strip()
+    if not path and not collector_url:
+        return None
+
+    exporter = TraceExporter(path or None, collector_url or None)
+    logger.info(f"Exporting request traces to {path or collector_url}")
+    return exporter
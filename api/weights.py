@@ -0,0 +1,140 @@
+"""
+Memory-mapped inference weights for the Garbage Classification API
+Loads models converted by scripts/convert_weights.py (*.safetensors) without
+unpickling the training checkpoint. Tensors are views into a private mmap of
+the file, so pages are read on first use and shared through the page cache
+by every worker process that opens the same file.
+"""
+
+import os
+import json
+import struct
+import logging
+from pathlib import Path
+from typing import Dict, Tuple
+
+import torch
+from ultralytics import YOLO
+from ultralytics.nn.tasks import DetectionModel
+
+
+logger = logging.getLogger(__name__)
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_MODEL_PATH = Path("models") / "garbage_yolov8s" / "weights" / "best.pt"
+
+
+# safetensors dtype codes
+_DTYPES = {
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "U8": torch.uint8,
+}
+
+
+def read_header(path) -> Tuple[Dict, Dict, int]:
+    """
+    Read a safetensors header
+
+    Returns:
+        (tensor entries, metadata, byte offset of the data section)
+    """
+    with open(path, 'rb') as f:
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+
+    metadata = header.pop("__metadata__", {})
+    return header, metadata, 8 + header_size
+
+
+def load_tensors(path) -> Dict[str, torch.Tensor]:
+    """Map every tensor in a safetensors file without copying its data"""
+    path = Path(path)
+    entries, _, data_start = read_header(path)
+
+    storage = torch.UntypedStorage.from_file(str(path), shared=False, nbytes=path.stat().st_size)
+
+    tensors = {}
+    for name, entry in entries.items():
+        dtype = _DTYPES[entry["dtype"]]
+        begin, end = entry["data_offsets"]
+        offset = data_start + begin
+        itemsize = torch.empty(0, dtype=dtype).element_size()
+
+        if offset % itemsize == 0:
+            tensor = torch.empty(0, dtype=dtype).set_(storage, offset // itemsize, entry["shape"])
+        else:
+            # Misaligned entry: fall back to a private copy of this tensor
+            raw = torch.empty(0, dtype=torch.uint8).set_(storage, offset, (end - begin,))
+            tensor = raw.clone().view(dtype).reshape(entry["shape"])
+        tensors[name] = tensor
+
+    return tensors
+
+
+def weights_fingerprint(path) -> str:
+    """Fingerprint recorded at conversion time (avoids hashing the file on every start)"""
+    _, metadata, _ = read_header(path)
+    return metadata.get("fingerprint", "unknown")
+
+
+def load_inference_model(path) -> YOLO:
+    """
+    Build a YOLO model from converted inference weights
+
+    The network is constructed on the CPU (Detect.bias_init needs real
+    tensors), fused the same way the converter fused it, and then its
+    parameters are replaced by the memory-mapped tensors, so the randomly
+    initialized ones are freed rather than copied into.
+    """
+    path = Path(path)
+    _, metadata, _ = read_header(path)
+
+    cfg = json.loads(metadata["cfg"])
+    names = {int(k): v for k, v in json.loads(metadata["names"]).items()}
+    stride = torch.tensor(json.loads(metadata["stride"]))
+
+    # Bundled config only provides the YOLO wrapper; its network is replaced below
+    yolo = YOLO("yolov8n.yaml", task="detect")
+    net = DetectionModel(cfg, nc=len(names), verbose=False)
+    if metadata.get("fused") == "true":
+        net.fuse(verbose=False)
+
+    tensors = load_tensors(path)
+    missing, unexpected = net.load_state_dict(tensors, strict=False, assign=True)
+    if missing or unexpected:
+        raise ValueError(
+            f"Weights do not match model config: missing={missing[:5]} unexpected={unexpected[:5]}"
+        )
+
+    net.stride = stride
+    net.model[-1].stride = stride
+    net.names = names
+    net.args = yolo.model.args
+    net.task = "detect"
+    net.pt_path = str(path)
+
+    yolo.model = net.eval()
+    yolo.model_name = str(path)
+    yolo.overrides["model"] = str(path)
+
+    logger.info(f"Mapped {len(tensors)} tensors from {path.name}")
+    return yolo
+
+
+def served_model_path() -> Path:
+    """MODEL_PATH, or the default model, resolved against the project root as the API does"""
+    path = Path(os.getenv("MODEL_PATH") or DEFAULT_MODEL_PATH)
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+def open_weights(path) -> YOLO:
+    """Open converted *.safetensors weights or a *.pt checkpoint"""
+    path = Path(path)
+    if path.suffix == ".safetensors":
+        return load_inference_model(path)
+    return YOLO(str(path))
@@ -3,15 +3,17 @@ class DetectionResponse {
   final int detectionCount;
   final List<Detection> detections;
   final double inferenceTimeMs;
+  final RequestTiming? timing;
 
   DetectionResponse({
     required this.status,
     required this.detectionCount,
     required this.detections,
     required this.inferenceTimeMs,
+    this.timing,
   });
 
-  factory DetectionResponse.fromJson(Map<String, dynamic> json) {
+  factory DetectionResponse.fromJson(Map<String, dynamic> json, {RequestTiming? timing}) {
     var list = json['detections'] as List;
     List<Detection> detectionsList =
         list.map((i) => Detection.fromJson(i)).toList();
@@ -21,10 +23,40 @@ class DetectionResponse {
       detectionCount: json['detection_count'],
       detections: detectionsList,
       inferenceTimeMs: (json['inference_time_ms'] as num).toDouble(),
+      timing: timing,
     );
   }
 }
 
+/// Client round trip split into server time (from the Server-Timing header)
+/// and the remainder, which is network and client overhead
+class RequestTiming {
+  final double roundTripMs;
+  final Map<String, double> serverStages;
+
+  RequestTiming({required this.roundTripMs, required this.serverStages});
+
+  /// Parses e.g. "total;dur=48.2, decode;dur=6.4" into {total: 48.2, decode: 6.4}
+  factory RequestTiming.fromHeader(double roundTripMs, String? serverTiming) {
+    final stages = <String, double>{};
+    for (final entry in (serverTiming ?? '').split(',')) {
+      final parts = entry.trim().split(';');
+      for (final param in parts.skip(1)) {
+        final kv = param.trim().split('=');
+        if (kv.length == 2 && kv[0] == 'dur') {
+          final duration = double.tryParse(kv[1]);
+          if (duration != null) stages[parts[0]] = duration;
+        }
+      }
+    }
+    return RequestTiming(roundTripMs: roundTripMs, serverStages: stages);
+  }
+
+  double? get serverMs => serverStages['total'];
+
+  double? get networkMs => serverMs == null ? null : roundTripMs - serverMs!;
+}
+
 class Detection {
   final List<double> bboxXyxy;
   final double confidence;
@@ -49,3 +81,23 @@ class Detection {
   }
 }
 
+/// Upload guidance published by the server at /v1/input_spec
+class InputSpec {
+  final int recommendedMaxSide;
+  final int jpegQuality;
+  final int maxUploadBytes;
+
+  InputSpec({
+    required this.recommendedMaxSide,
+    required this.jpegQuality,
+    required this.maxUploadBytes,
+  });
+
+  factory InputSpec.fromJson(Map<String, dynamic> json) {
+    return InputSpec(
+      recommendedMaxSide: json['recommended_max_side'],
+      jpegQuality: json['jpeg_quality'],
+      maxUploadBytes: json['max_upload_bytes'],
+    );
+  }
+}
@@ -17,11 +17,30 @@ class _DetectionScreenState extends State<DetectionScreen> {
   final ImagePickerService _imagePickerService = ImagePickerService();
   final GarbageDetectorService _apiService = GarbageDetectorService();
 
+  InputSpec? _inputSpec;
+  Future<void>? _inputSpecRequest;
   File? _selectedImage;
   DetectionResponse? _detectionResult;
   bool _isLoading = false;
   String? _errorMessage;
 
+  @override
+  void initState() {
+    super.initState();
+    _fetchInputSpec();
+  }
+
+  /// Fetches the input spec in the background, at most one request at a time,
+  /// so picking an image never waits on the network (e.g. when offline).
+  void _fetchInputSpec() {
+    if (_inputSpec != null || _inputSpecRequest != null) return;
+    _inputSpecRequest = _apiService.getInputSpec().then((spec) {
+      _inputSpec = spec;
+    }).whenComplete(() {
+      _inputSpecRequest = null;
+    });
+  }
+
   Future<void> _pickImage(ImageSource source) async {
     if (!mounted) return;
 
@@ -31,11 +50,17 @@ class _DetectionScreenState extends State<DetectionScreen> {
     });
 
     try {
+      // Downscale to what the model actually uses instead of uploading full photos;
+      // until the spec has arrived, fall back to defaults and retry in the background
+      _fetchInputSpec();
+      final maxSide = _inputSpec?.recommendedMaxSide.toDouble() ?? 1920;
+      final quality = _inputSpec?.jpegQuality ?? 85;
+
       File? image;
       if (source == ImageSource.camera) {
-        image = await _imagePickerService.pickFromCamera();
+        image = await _imagePickerService.pickFromCamera(maxSide: maxSide, quality: quality);
       } else {
-        image = await _imagePickerService.pickFromGallery();
+        image = await _imagePickerService.pickFromGallery(maxSide: maxSide, quality: quality);
       }
 
       if (image != null && mounted) {
@@ -222,6 +247,12 @@ class _DetectionScreenState extends State<DetectionScreen> {
                           'Processing time: ${_detectionResult!.inferenceTimeMs.toStringAsFixed(2)}ms',
                           style: const TextStyle(color: Colors.grey),
                         ),
+                        if (_detectionResult!.timing?.networkMs != null)
+                          Text(
+                            'Server: ${_detectionResult!.timing!.serverMs!.toStringAsFixed(0)}ms | '
+                            'Network: ${_detectionResult!.timing!.networkMs!.toStringAsFixed(0)}ms',
+                            style: const TextStyle(color: Colors.grey),
+                          ),
                         const SizedBox(height: 16),
                         ..._detectionResult!.detections.map((detection) {
                           return Card(
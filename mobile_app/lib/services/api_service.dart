@@ -106,6 +106,21 @@ class GarbageDetectorService {
     _dio = Dio(options);
   }
 
+  /// Fetches the server's advertised input spec (model input size, preferred
+  /// JPEG quality, upload limit) so images can be downscaled before upload.
+  /// Returns null if the server does not publish one.
+  Future<InputSpec?> getInputSpec() async {
+    try {
+      final response = await _dio.get('/v1/input_spec');
+      if (response.statusCode == 200) {
+        return InputSpec.fromJson(response.data);
+      }
+    } on DioException catch (e) {
+      print("Input spec unavailable: ${e.message}");
+    }
+    return null;
+  }
+
   /// Uploads an image to the API and returns the detection results.
   /// This function now includes robust error handling.
   Future<DetectionResponse> detectGarbage(File imageFile) async {
@@ -115,10 +130,19 @@ class GarbageDetectorService {
     });
 
     try {
+      final stopwatch = Stopwatch()..start();
       final response = await _dio.post('/v1/detect_trash', data: formData);
+      stopwatch.stop();
 
       if (response.statusCode == 200) {
-        return DetectionResponse.fromJson(response.data);
+        final timing = RequestTiming.fromHeader(
+          stopwatch.elapsedMicroseconds / 1000,
+          response.headers.value('server-timing'),
+        );
+        print("Request timing: round trip ${timing.roundTripMs.toStringAsFixed(1)}ms, "
+            "server ${timing.serverMs?.toStringAsFixed(1) ?? '?'}ms, "
+            "network ${timing.networkMs?.toStringAsFixed(1) ?? '?'}ms");
+        return DetectionResponse.fromJson(response.data, timing: timing);
       } else {
         throw Exception('Server returned an error: ${response.statusCode} ${response.statusMessage}');
       }
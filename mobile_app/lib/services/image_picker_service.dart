@@ -6,8 +6,8 @@ import 'package:permission_handler/permission_handler.dart';
 class ImagePickerService {
   final ImagePicker _picker = ImagePicker();
 
-  /// Pick image from camera
-  Future<File?> pickFromCamera() async {
+  /// Pick image from camera, downscaled so its longest side is at most [maxSide]
+  Future<File?> pickFromCamera({double maxSide = 1920, int quality = 85}) async {
     // Request camera permission
     final cameraStatus = await Permission.camera.request();
 
@@ -17,15 +17,16 @@ class ImagePickerService {
 
     final XFile? image = await _picker.pickImage(
       source: ImageSource.camera,
-      maxWidth: 1920,
-      imageQuality: 85,
+      maxWidth: maxSide,
+      maxHeight: maxSide,
+      imageQuality: quality,
     );
 
     return image != null ? File(image.path) : null;
   }
 
-  /// Pick image from gallery
-  Future<File?> pickFromGallery() async {
+  /// Pick image from gallery, downscaled so its longest side is at most [maxSide]
+  Future<File?> pickFromGallery({double maxSide = 1920, int quality = 85}) async {
     // Request storage permission
     final storageStatus = await Permission.photos.request();
 
@@ -35,8 +36,9 @@ class ImagePickerService {
 
     final XFile? image = await _picker.pickImage(
       source: ImageSource.gallery,
-      maxWidth: 1920,
-      imageQuality: 85,
+      maxWidth: maxSide,
+      maxHeight: maxSide,
+      imageQuality: quality,
     );
 
     return image != null ? File(image.path) : null;
@@ -0,0 +1,321 @@
+"""
+Microbenchmarks for the serving hot path
+Times each stage of api/main.py in isolation on CPU with the served model
+(MODEL_PATH), or its randomly initialized architecture when the weights are
+missing: decode, preprocess, forward, post-processing and response
+serialization. Preprocess and post-processing are timed in both the
+Ultralytics predictor (the default INFERENCE_ENGINE) and the lean engine.
+Results can be saved as a baseline and compared against later commits.
+
+Usage:
+    python scripts/benchmark_serving.py --save-baseline benchmarks/baseline.json
+    python scripts/benchmark_serving.py --compare benchmarks/baseline.json
+"""
+
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'api'))
+
+from optimize import RESOLUTION_BUCKETS  # noqa: E402
+from decode_pool import decode_image  # noqa: E402
+
+
+DECODE_MEGAPIXELS = [1, 4, 12]
+BATCH_SIZES = [1, 2, 4]
+DETECTION_COUNTS = [0, 10, 300]
+
+
+def bench(fn, min_time=0.5, warmup=2, max_iterations=1000):
+    """
+    Time fn() repeatedly
+
+    Returns:
+        Dict with median, p90 and mean milliseconds per call
+    """
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    start = time.perf_counter()
+    while (time.perf_counter() - start < min_time or len(times) < 5) and len(times) < max_iterations:
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+
+    times.sort()
+    return {
+        "median_ms": round(times[len(times) // 2], 4),
+        "p90_ms": round(times[int(len(times) * 0.9)], 4),
+        "mean_ms": round(sum(times) / len(times), 4),
+        "iterations": len(times)
+    }
+
+
+def synthetic_photo(width, height, seed=0):
+    """Gradient plus noise, so codecs behave roughly like on a photo"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // max(width - 1, 1), y * 255 // max(height - 1, 1),
+                     (x + y) * 127 // max(width + height - 2, 1)], axis=-1)
+    return np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+
+
+def encode(img_array, fmt):
+    buffer = io.BytesIO()
+    Image.fromarray(img_array).save(buffer, format=fmt, **({'quality': 90} if fmt == 'JPEG' else {}))
+    return buffer.getvalue()
+
+
+def bench_decode(results, min_time):
+    """Inline decode (PIL + np.array, as detect_trash) and pool-style decode with downscaling"""
+    for megapixels in DECODE_MEGAPIXELS:
+        width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+        height = width * 3 // 4
+        img = synthetic_photo(width, height)
+
+        for fmt in ('JPEG', 'PNG'):
+            contents = encode(img, fmt)
+            name = f"{fmt.lower()}_{megapixels}mp"
+            results[f"decode/inline/{name}"] = bench(
+                lambda: np.array(Image.open(io.BytesIO(contents))), min_time)
+            results[f"decode/max_side_640/{name}"] = bench(
+                lambda: decode_image(contents, max_side=640), min_time)
+
+
+def bucket_photo(bucket):
+    """A photo with the bucket's aspect ratio, at twice its size"""
+    return synthetic_photo(bucket[1] * 2, bucket[0] * 2)
+
+
+def bench_preprocess(results, model, engine, min_time):
+    """Letterbox + tensor conversion per bucket, in the Ultralytics predictor and the lean engine"""
+    predictor = model.predictor
+    for bucket in RESOLUTION_BUCKETS:
+        img = bucket_photo(bucket)
+        # Models trained at another imgsz letterbox into other shapes
+        bucket = engine.bucket_for(img)
+        name = f"{bucket[0]}x{bucket[1]}"
+
+        results[f"preprocess/ultralytics/{name}"] = bench(lambda: predictor.preprocess([img]), min_time)
+
+        def run():
+            buffers = engine.arena.acquire(bucket)
+            engine.preprocess(img, buffers)
+            engine.arena.release(buffers)
+
+        results[f"preprocess/lean/{name}"] = bench(run, min_time)
+
+
+def bench_forward(results, engine, min_time):
+    """Network forward pass per bucket and batch size"""
+    for bucket in RESOLUTION_BUCKETS:
+        for batch in BATCH_SIZES:
+            x = torch.rand(batch, 3, bucket[0], bucket[1])
+
+            def run():
+                with torch.inference_mode():
+                    engine.net(x)
+
+            results[f"forward/{bucket[0]}x{bucket[1]}/batch_{batch}"] = bench(run, min_time)
+
+
+def synthetic_prediction(num_detections, num_classes, anchors=8400, seed=0):
+    """
+    A (4 + nc, anchors) head output with exactly num_detections
+    non-overlapping boxes above the confidence threshold
+    """
+    rng = np.random.default_rng(seed)
+    pred = np.zeros((4 + num_classes, anchors), dtype=np.float32)
+    pred[:4] = rng.uniform(0, 640, (4, anchors))
+    pred[4:] = rng.uniform(0, 0.2, (num_classes, anchors))
+
+    for i, anchor in enumerate(rng.choice(anchors, num_detections, replace=False)):
+        row, col = divmod(i, 20)
+        pred[:4, anchor] = (16 + col * 32, 16 + row * 32, 24, 24)
+        pred[4 + i % num_classes, anchor] = 0.9
+    return torch.from_numpy(pred)
+
+
+def bench_postprocess(results, model, engine, min_time):
+    """
+    Confidence filter + class-aware NMS with 0/10/300 surviving detections,
+    in the Ultralytics predictor (including Results construction) and the lean engine
+    """
+    predictor = model.predictor
+    num_classes = len(engine.names)
+    img = synthetic_photo(640, 640)
+    img_tensor = predictor.preprocess([img])
+
+    for count in DETECTION_COUNTS:
+        prediction = synthetic_prediction(count, num_classes)
+
+        batch_prediction = prediction.unsqueeze(0)
+        kept = predictor.postprocess(batch_prediction, img_tensor, [img])[0].boxes
+        assert len(kept) == count, f"predictor: expected {count} detections, got {len(kept)}"
+        results[f"postprocess/ultralytics/{count}_detections"] = bench(
+            lambda: predictor.postprocess(batch_prediction, img_tensor, [img]), min_time)
+
+        kept = engine.postprocess(prediction, conf=0.25, iou=0.45, max_det=300, classes=None)[0]
+        assert len(kept) == count, f"lean engine: expected {count} detections, got {len(kept)}"
+        results[f"postprocess/lean/{count}_detections"] = bench(
+            lambda: engine.postprocess(prediction, conf=0.25, iou=0.45, max_det=300, classes=None), min_time)
+
+
+def bench_serialization(results, min_time):
+    """Building Detection models and serializing the response to JSON"""
+    from schemas import Detection, DetectionResponse
+
+    for count in DETECTION_COUNTS:
+        boxes = np.random.default_rng(0).uniform(0, 640, (count, 4)).tolist()
+
+        def run():
+            detections = [
+                Detection(bbox_xyxy=box, confidence=0.9, specific_name="Plastic", general_category="Recycle")
+                for box in boxes
+            ]
+            DetectionResponse(
+                detection_count=len(detections), detections=detections, inference_time_ms=12.3
+            ).model_dump_json()
+
+        results[f"serialize/{count}_detections"] = bench(run, min_time)
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "torch_threads": torch.get_num_threads(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print per-benchmark change against a baseline; returns the regressed names"""
+    print(f"\n{'Benchmark':<40} {'Baseline':>10} {'Current':>10} {'Change':>8}")
+    print("-" * 72)
+
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            print(f"{name:<40} {'-':>10} {current['median_ms']:>10.3f} {'new':>8}")
+            continue
+
+        change = current['median_ms'] / previous['median_ms'] - 1 if previous['median_ms'] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = " ✗"
+        print(f"{name:<40} {previous['median_ms']:>10.3f} {current['median_ms']:>10.3f} {change:>+7.1%}{flag}")
+
+    return regressions
+
+
+def main():
+    """Run the serving microbenchmarks"""
+    parser = argparse.ArgumentParser(description='Microbenchmarks for the serving hot path')
+    parser.add_argument('--only', type=str, default='decode,preprocess,forward,postprocess,serialize',
+                        help='Comma-separated stages to run')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Minimum seconds per benchmark')
+    parser.add_argument('--model', type=str,
+                        help='Weights to time (.pt or .safetensors; default: MODEL_PATH or the default API model)')
+    parser.add_argument('--cfg', type=str, default='yolov8s.yaml',
+                        help='Architecture to initialize randomly when the weights are missing (default: yolov8s.yaml)')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='Torch threads (fixed so results are comparable across runs)')
+    parser.add_argument('--output', type=str, help='Write results JSON')
+    parser.add_argument('--save-baseline', type=str, help='Write results as the baseline JSON')
+    parser.add_argument('--compare', type=str, help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Median slowdown counted as a regression (default: 0.10 = 10%%)')
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    stages = {s.strip() for s in args.only.split(',')}
+
+    print(f"\n{'='*60}")
+    print("Serving Hot Path Microbenchmarks")
+    print(f"{'='*60}")
+
+    model = engine = None
+    model_name = None
+    if stages & {'preprocess', 'forward', 'postprocess'}:
+        from ultralytics import YOLO
+        from engine import LeanEngine
+        from weights import open_weights, served_model_path
+
+        model_path = Path(args.model) if args.model else served_model_path()
+        torch.manual_seed(0)
+        if model_path.exists():
+            model = open_weights(model_path)
+            model_name = str(model_path)
+        else:
+            print(f"⚠️  {model_path} not found, using the untrained {args.cfg} architecture")
+            model = YOLO(args.cfg)
+            model_name = args.cfg
+        print(f"Model: {model_name}")
+
+        # Sets up the predictor (with the API's default thresholds) whose stages are timed
+        model.predict(synthetic_photo(640, 640), conf=0.25, iou=0.45, device='cpu', verbose=False)
+        engine = LeanEngine(model, 'cpu')
+
+    results = {}
+    for stage, run in (
+        ('decode', lambda: bench_decode(results, args.min_time)),
+        ('preprocess', lambda: bench_preprocess(results, model, engine, args.min_time)),
+        ('forward', lambda: bench_forward(results, engine, args.min_time)),
+        ('postprocess', lambda: bench_postprocess(results, model, engine, args.min_time)),
+        ('serialize', lambda: bench_serialization(results, args.min_time)),
+    ):
+        if stage in stages:
+            print(f"Running {stage} benchmarks...")
+            run()
+
+    print(f"\n{'Benchmark':<40} {'Median':>10} {'P90':>10}")
+    print("-" * 62)
+    for name, stats in results.items():
+        print(f"{name:<40} {stats['median_ms']:>8.3f}ms {stats['p90_ms']:>8.3f}ms")
+
+    report = {"environment": {**environment_info(), "model": model_name}, "results": results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"\n✓ Results saved to {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nComparing against {args.compare} (commit {baseline['environment'].get('commit')})")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+        print("\n✓ No regressions")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
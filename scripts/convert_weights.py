@@ -0,0 +1,108 @@
+"""
+Convert YOLOv8 training checkpoints to inference-only safetensors weights
+Strips optimizer state, EMA bookkeeping and training args from
+models/*/weights/*.pt, fuses Conv+BN and writes memory-mappable
+*.safetensors files that the API loads without unpickling
+"""
+
+import sys
+import json
+import hashlib
+from pathlib import Path
+
+import torch
+
+
+def convert_checkpoint(checkpoint_path, output_path=None):
+    """
+    Convert one training checkpoint to inference weights
+
+    Args:
+        checkpoint_path: Path to a *.pt checkpoint
+        output_path: Destination *.safetensors path (default: next to the checkpoint)
+
+    Returns:
+        Path of the written file
+    """
+    try:
+        from safetensors.torch import save_file
+    except ImportError:
+        print("Error: safetensors is not installed. Run: pip install safetensors")
+        raise
+
+    checkpoint_path = Path(checkpoint_path)
+    output_path = Path(output_path) if output_path else checkpoint_path.with_suffix('.safetensors')
+
+    # Unpickling needs the ultralytics classes the checkpoint references
+    ckpt = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+    net = (ckpt.get('ema') or ckpt['model']).float().eval()
+    net.fuse(verbose=False)
+
+    tensors = {name: t.detach().contiguous() for name, t in net.state_dict().items()}
+
+    digest = hashlib.sha256()
+    for name in sorted(tensors):
+        digest.update(name.encode('utf-8'))
+        digest.update(tensors[name].numpy().tobytes())
+
+    metadata = {
+        "format": "garbage-classification-inference",
+        "cfg": json.dumps(net.yaml),
+        "names": json.dumps({str(k): v for k, v in net.names.items()}),
+        "stride": json.dumps(net.stride.tolist()),
+        "fused": "true",
+        "source": checkpoint_path.name,
+        "fingerprint": digest.hexdigest()[:16],
+    }
+
+    save_file(tensors, str(output_path), metadata=metadata)
+    return output_path
+
+
+def main():
+    """Convert every checkpoint under models/*/weights/ (or the given paths)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert checkpoints to inference-only safetensors weights')
+    parser.add_argument('checkpoints', nargs='*',
+                        help='Checkpoint paths (default: models/*/weights/*.pt)')
+    parser.add_argument('--best-only', action='store_true',
+                        help='Only convert best.pt files')
+    args = parser.parse_args()
+
+    project_root = Path(__file__).parent.parent
+
+    if args.checkpoints:
+        checkpoints = [Path(p) for p in args.checkpoints]
+    else:
+        pattern = 'best.pt' if args.best_only else '*.pt'
+        checkpoints = sorted((project_root / 'models').glob(f'*/weights/{pattern}'))
+
+    if not checkpoints:
+        print("No checkpoints found under models/*/weights/")
+        return 1
+
+    print(f"\n{'='*60}")
+    print("Converting Checkpoints to Inference Weights")
+    print(f"{'='*60}")
+
+    failed = 0
+    for checkpoint_path in checkpoints:
+        try:
+            output_path = convert_checkpoint(checkpoint_path)
+            before = checkpoint_path.stat().st_size / 1024**2
+            after = output_path.stat().st_size / 1024**2
+            print(f"✓ {checkpoint_path} -> {output_path.name} ({before:.1f} MB -> {after:.1f} MB)")
+        except Exception as e:
+            print(f"✗ {checkpoint_path}: {e}")
+            failed += 1
+
+    print(f"{'='*60}\n")
+    print("Serve a converted model with:")
+    print("  MODEL_PATH=models/<run>/weights/best.safetensors python api/main.py")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,9 @@ import torch
 import datetime
 from ultralytics import YOLO
 
+sys.path.insert(0, str(Path(__file__).parent.parent / 'api'))
+from machine_profile import load_machine_profile, profile_path, training_defaults  # noqa: E402
+
 
 def check_gpu():
     """Check GPU availability and information"""
@@ -44,7 +47,9 @@ def train_model(
     device=0,
     project='models',
     name='garbage_yolov8m',
-    resume=False
+    resume=False,
+    workers=8,
+    cache=False
 ):
     """
     Train YOLOv8 model on Garbage Classification dataset
@@ -58,6 +63,8 @@ def train_model(
         device: GPU device ID (0, 1, etc.) or 'cpu'
         project: Project directory for saving results
         name: Experiment name
+        workers: Dataloader workers per GPU
+        cache: Cache images in 'ram' or on 'disk' (False reads them from disk each epoch)
         resume: Resume training from last checkpoint
     """
 
@@ -121,8 +128,8 @@ def train_model(
         'freeze': 0,  # !Freeze first 10 layers
         'save': True,
         'save_period': 10,  # Save checkpoint every 10 epochs
-        'cache': False,  # Don't cache images (uses less RAM)
-        'workers': 8,  # Number of dataloader workers
+        'cache': cache,  # Image cache (False uses less RAM)
+        'workers': workers,  # Number of dataloader workers
         'optimizer': 'AdamW',  # Optimizer
         'lr0': 0.01,  # Initial learning rate (increased for better convergence)
         'lrf': 0.001,  # Final learning rate (lr0 * lrf)
@@ -346,9 +353,16 @@ def main():
         'resume': False  # Set to True to resume training
     }
 
-    # Adjust batch size based on available GPU memory
-    if has_gpu:
-        # Check available memory (not total memory)
+    # Batch size, devices and dataloader settings measured for this machine
+    # (python scripts/verify_environment.py --perf)
+    measured = training_defaults(load_machine_profile())
+    if measured:
+        print(f"Using machine profile {profile_path()}: {measured}")
+        config.update(measured)
+    elif has_gpu:
+        print(f"No machine profile at {profile_path()}; run: python scripts/verify_environment.py --perf")
+
+        # Adjust batch size based on available GPU memory
         import subprocess
         try:
             result = subprocess.run(['nvidia-smi', '--query-gpu=memory.free', '--format=csv,noheader,nounits', '-i', '0'],
@@ -1,10 +1,18 @@
 """
 Environment Verification Script
-Checks if all dependencies and configurations are properly set up
+Checks if all dependencies and configurations are properly set up.
+With --perf, also measures this machine (decode, forward pass per backend,
+thread scaling, disk throughput) and writes a machine profile that the API
+and the training script read to pick their defaults.
 """
 
 import sys
 import os
+import time
+import socket
+import platform
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import json
 
@@ -251,8 +259,511 @@ def check_configs():
     return True
 
 
+# ---------------------------------------------------------------------------
+# Performance self-test (--perf)
+# ---------------------------------------------------------------------------
+
+PERF_BATCH_SIZES = [1, 2, 4, 8]
+
+# Backend variants per device: (name, INFERENCE_OPTIMIZATIONS options)
+BACKEND_VARIANTS = [
+    ("eager", []),
+    ("fuse", ["fuse"]),
+    ("fuse+channels_last", ["fuse", "channels_last"]),
+    ("fuse+channels_last+bf16", ["fuse", "channels_last", "bf16"]),
+]
+
+
+def default_perf_model():
+    """The model the API serves when its weights exist, else the untrained yolov8s architecture"""
+    from weights import served_model_path
+
+    # Resolved against the project root like the API does, not the working directory
+    model_path = served_model_path()
+    if model_path.suffix in (".pt", ".safetensors") and model_path.exists():
+        return str(model_path)
+    print_check("Trained weights", False, f"{model_path} not found, timing the untrained yolov8s.yaml architecture")
+    return 'yolov8s.yaml'
+
+
+def onnxruntime_providers(device):
+    """ONNX Runtime execution providers for a device, or None if it cannot run there"""
+    try:
+        import onnxruntime
+    except ImportError:
+        return None
+    wanted = "CUDAExecutionProvider" if device.startswith('cuda') else "CPUExecutionProvider"
+    return [wanted] if wanted in onnxruntime.get_available_providers() else None
+
+
+def measure_onnxruntime(net, providers, min_time, work_dir):
+    """
+    ONNX Runtime latency per resolution bucket and batch size
+
+    The fused network is exported once per bucket (dynamic batch axis); inputs
+    are fed from host memory, so GPU timings include the copies.
+    """
+    import numpy as np
+    import torch
+    import onnxruntime
+    from benchmark_serving import bench
+    from optimize import RESOLUTION_BUCKETS
+
+    timings = {}
+    for bucket in RESOLUTION_BUCKETS:
+        path = Path(work_dir) / f"model_{bucket[0]}x{bucket[1]}.onnx"
+        torch.onnx.export(
+            net, torch.rand(1, 3, bucket[0], bucket[1]), str(path), opset_version=17,
+            input_names=["images"], output_names=["output0"],
+            dynamic_axes={"images": {0: "batch"}, "output0": {0: "batch"}}
+        )
+        session = onnxruntime.InferenceSession(str(path), providers=providers)
+        for batch in PERF_BATCH_SIZES:
+            x = np.random.rand(batch, 3, bucket[0], bucket[1]).astype(np.float32)
+            stats = bench(lambda: session.run(["output0"], {"images": x}), min_time)
+            timings[f"{bucket[0]}x{bucket[1]}/batch_{batch}"] = {
+                "median_ms": stats["median_ms"],
+                "per_image_ms": round(stats["median_ms"] / batch, 3)
+            }
+    return timings
+
+
+def thread_counts(max_threads):
+    """1, 2, 4, ... up to max_threads, always including max_threads"""
+    counts, n = [], 1
+    while n < max_threads:
+        counts.append(n)
+        n *= 2
+    return counts + [max_threads]
+
+
+def timed(fn, device):
+    """Wrap fn so GPU work is finished before the timer stops"""
+    import torch
+
+    if not device.startswith('cuda'):
+        return fn
+
+    def run():
+        fn()
+        torch.cuda.synchronize(device)
+    return run
+
+
+def measure_decode(min_time):
+    """Per-image JPEG decode latency, inline (as detect_trash) and downscaled (as the decode pool)"""
+    import io
+    import numpy as np
+    from PIL import Image
+    from benchmark_serving import DECODE_MEGAPIXELS, bench, encode, synthetic_photo
+    from decode_pool import decode_image
+
+    results = {}
+    for megapixels in DECODE_MEGAPIXELS:
+        width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+        contents = encode(synthetic_photo(width, width * 3 // 4), 'JPEG')
+        inline = bench(lambda: np.array(Image.open(io.BytesIO(contents))), min_time)
+        downscaled = bench(lambda: decode_image(contents, max_side=640), min_time)
+        results[f"jpeg_{megapixels}mp"] = {
+            "inline_ms": inline["median_ms"],
+            "max_side_640_ms": downscaled["median_ms"],
+            "bytes": len(contents)
+        }
+        print_check(f"Decode {megapixels} MP JPEG", True,
+                    f"{inline['median_ms']:.1f} ms inline, {downscaled['median_ms']:.1f} ms downscaled to 640")
+    return results
+
+
+def measure_decode_scaling(max_threads, duration=1.0):
+    """Aggregate 4 MP JPEG decode throughput with N threads (Pillow releases the GIL while decoding)"""
+    import io
+    import numpy as np
+    from PIL import Image
+    from benchmark_serving import encode, synthetic_photo
+
+    contents = encode(synthetic_photo(2309, 1731), 'JPEG')
+
+    def decode_until(deadline):
+        count = 0
+        while time.perf_counter() < deadline:
+            np.array(Image.open(io.BytesIO(contents)))
+            count += 1
+        return count
+
+    results = {}
+    for n in thread_counts(max_threads):
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            start = time.perf_counter()
+            total = sum(executor.map(decode_until, [start + duration] * n))
+            elapsed = time.perf_counter() - start
+        results[str(n)] = round(total / elapsed, 1)
+        print_check(f"Decode threads: {n}", True, f"{results[str(n)]:.1f} images/s")
+    return results
+
+
+def measure_forward(model, devices, min_time, include_compile=False):
+    """
+    Forward latency per device, backend variant, resolution bucket and batch size
+
+    Variants go through the same optimize_model() parity check as the API;
+    a variant whose options were rejected is reported but not timed again.
+    ONNX Runtime is timed as an extra "onnxruntime" backend when installed;
+    the API cannot serve it, so it is reported but never recommended.
+    """
+    import tempfile
+    import torch
+    from benchmark_serving import bench
+    from optimize import RESOLUTION_BUCKETS, optimize_model
+    from weights import open_weights
+
+    variants = list(BACKEND_VARIANTS)
+    if include_compile:
+        variants.append(("fuse+compile", ["fuse", "compile"]))
+
+    results = {}
+    for device in devices:
+        results[device] = {}
+        measured = set()
+        for name, options in variants:
+            yolo_model = open_weights(model)
+            yolo_model.model.to(device).eval()
+            report = optimize_model(yolo_model, options, device) if options else {}
+            enabled = tuple(o for o in options if report.get(o, {}).get("enabled"))
+            rejected = {o: report[o].get("reason") for o in options if o not in enabled}
+
+            if enabled in measured:
+                results[device][name] = {"options": list(enabled), "rejected": rejected, "duplicate": True}
+                continue
+            measured.add(enabled)
+
+            net = yolo_model.model
+            timings = {}
+            for bucket in RESOLUTION_BUCKETS:
+                for batch in PERF_BATCH_SIZES:
+                    x = torch.rand(batch, 3, bucket[0], bucket[1], device=device)
+
+                    def run():
+                        with torch.inference_mode():
+                            net(x)
+
+                    stats = bench(timed(run, device), min_time)
+                    timings[f"{bucket[0]}x{bucket[1]}/batch_{batch}"] = {
+                        "median_ms": stats["median_ms"],
+                        "per_image_ms": round(stats["median_ms"] / batch, 3)
+                    }
+
+            results[device][name] = {"options": list(enabled), "rejected": rejected, "timings": timings}
+            single = timings["640x640/batch_1"]["median_ms"]
+            print_check(f"Forward {device} {name}", True,
+                        f"{single:.1f} ms at 640x640 batch 1" + (f" (rejected: {', '.join(rejected)})" if rejected else ""))
+
+            del yolo_model, net
+            if device.startswith('cuda'):
+                torch.cuda.empty_cache()
+
+        providers = onnxruntime_providers(device)
+        if providers is None:
+            print_check(f"Forward {device} onnxruntime", False, "onnxruntime not installed or no provider for this device")
+            continue
+        try:
+            net = open_weights(model).model.float().eval().fuse(verbose=False)
+            with tempfile.TemporaryDirectory() as work_dir:
+                timings = measure_onnxruntime(net, providers, min_time, work_dir)
+        except Exception as e:
+            results[device]["onnxruntime"] = {"backend": "onnxruntime", "error": str(e)}
+            print_check(f"Forward {device} onnxruntime", False, f"failed: {e}")
+            continue
+        results[device]["onnxruntime"] = {"backend": "onnxruntime", "providers": providers, "timings": timings}
+        print_check(f"Forward {device} onnxruntime", True,
+                    f"{timings['640x640/batch_1']['median_ms']:.1f} ms at 640x640 batch 1")
+    return results
+
+
+def measure_thread_scaling(model, max_threads, min_time):
+    """CPU forward latency at 640x640, batch 1, per torch thread count"""
+    import torch
+    from benchmark_serving import bench
+    from weights import open_weights
+
+    net = open_weights(model).model.eval()
+    net = net.fuse(verbose=False)
+    x = torch.rand(1, 3, 640, 640)
+
+    def run():
+        with torch.inference_mode():
+            net(x)
+
+    previous = torch.get_num_threads()
+    results = {}
+    try:
+        for n in thread_counts(max_threads):
+            torch.set_num_threads(n)
+            results[str(n)] = bench(run, min_time)["median_ms"]
+            print_check(f"Torch threads: {n}", True, f"{results[str(n)]:.1f} ms per image")
+    finally:
+        torch.set_num_threads(previous)
+    return results
+
+
+def measure_disk(data_dir, max_files=500, max_mb=1024):
+    """
+    Sequential read throughput of the dataset's image files
+
+    Files are evicted from the page cache first where the OS allows it,
+    otherwise the result may reflect cached reads.
+    """
+    data_dir = Path(data_dir)
+    files = sorted(p for p in data_dir.rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    if not files:
+        print_check("Disk read", False, f"No images under {data_dir}")
+        return None
+
+    dataset_mb = sum(p.stat().st_size for p in files) / 1024**2
+    evicted = hasattr(os, 'posix_fadvise')
+    total_bytes, count = 0, 0
+    start = time.perf_counter()
+    for path in files[:max_files]:
+        with open(path, 'rb') as f:
+            if evicted:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            total_bytes += len(f.read())
+        count += 1
+        if total_bytes > max_mb * 1024**2:
+            break
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "path": str(data_dir),
+        "dataset_files": len(files),
+        "dataset_mb": round(dataset_mb, 1),
+        "files_read": count,
+        "mb_per_s": round(total_bytes / 1024**2 / elapsed, 1),
+        "files_per_s": round(count / elapsed, 1),
+        "page_cache_evicted": evicted
+    }
+    print_check("Disk read", True, f"{result['mb_per_s']:.1f} MB/s, {result['files_per_s']:.0f} files/s "
+                f"({count} files from {data_dir})")
+    return result
+
+
+def estimate_training_batch(model, imgsz=640, headroom=0.85):
+    """
+    Largest per-GPU training batch that fits, from the peak memory of two
+    small fp32 training steps extrapolated to the free memory of GPU 0
+    (training uses AMP, so this errs on the safe side)
+    """
+    import torch
+    from ultralytics import YOLO
+
+    device = 'cuda:0'
+    net = YOLO(model).model.to(device).train()
+    for p in net.parameters():
+        p.requires_grad_(True)
+    param_bytes = sum(p.numel() * p.element_size() for p in net.parameters())
+
+    peaks = {}
+    try:
+        for batch in (2, 4):
+            torch.cuda.empty_cache()
+            torch.cuda.reset_peak_memory_stats(device)
+            outputs = net(torch.rand(batch, 3, imgsz, imgsz, device=device))
+            outputs = outputs if isinstance(outputs, (list, tuple)) else [outputs]
+            sum(o.float().sum() for o in outputs).backward()
+            torch.cuda.synchronize(device)
+            peaks[batch] = torch.cuda.max_memory_allocated(device)
+            net.zero_grad(set_to_none=True)
+    except torch.cuda.OutOfMemoryError as e:
+        print_check("Training batch estimate", False, f"Out of memory at batch {batch}")
+        return {"error": str(e)}
+    finally:
+        del net
+        torch.cuda.empty_cache()
+
+    per_image = (peaks[4] - peaks[2]) / 2
+    # AdamW keeps two moments per parameter on top of the measured step
+    base = peaks[2] - 2 * per_image + 2 * param_bytes
+    free, total = torch.cuda.mem_get_info(device)
+    batch = int((headroom * free - base) / per_image) if per_image > 0 else 0
+    batch = max(1, batch // 8 * 8 if batch >= 8 else batch)
+
+    result = {
+        "model": model,
+        "imgsz": imgsz,
+        "per_image_mb": round(per_image / 1024**2, 1),
+        "base_mb": round(base / 1024**2, 1),
+        "free_mb": round(free / 1024**2, 1),
+        "total_mb": round(total / 1024**2, 1),
+        "max_batch_per_gpu": batch
+    }
+    print_check("Training batch estimate", True,
+                f"{per_image / 1024**2:.0f} MB per image, batch {batch} per GPU fits in {free / 1024**3:.1f} GB free")
+    return result
+
+
+def _saturation(scaling, fraction=0.9):
+    """Smallest thread count reaching `fraction` of the best throughput"""
+    best = max(scaling.values())
+    return min(int(n) for n, value in scaling.items() if value >= fraction * best)
+
+
+def recommend(profile):
+    """Serving and training defaults derived from the measurements"""
+    cpu_count = profile["host"]["cpu_count"]
+    gpu_count = len(profile["host"]["gpus"])
+    api_device = "cuda:0" if gpu_count else "cpu"
+    api = {}
+
+    # Fastest PyTorch variant that passed the parity check, at the API's main bucket
+    forward = {name: variant for name, variant in profile["forward"].get(api_device, {}).items()
+               if "timings" in variant and variant.get("backend", "torch") == "torch"}
+    if forward:
+        name = min(forward, key=lambda n: forward[n]["timings"]["640x640/batch_1"]["median_ms"])
+        if forward[name]["options"]:
+            api["INFERENCE_OPTIMIZATIONS"] = ",".join(forward[name]["options"])
+        forward_ms = forward[name]["timings"]["640x640/batch_1"]["median_ms"]
+    else:
+        forward_ms = None
+
+    # CPU serving: fewest threads within 10% of the best single-image latency,
+    # and enough inference workers to use the remaining cores
+    if api_device == "cpu" and profile.get("thread_scaling"):
+        scaling = profile["thread_scaling"]
+        best = min(scaling.values())
+        threads = min(int(n) for n, ms in scaling.items() if ms <= 1.1 * best)
+        workers = max(1, min(4, cpu_count // threads))
+        api["OMP_NUM_THREADS"] = threads
+        api["INFERENCE_WORKERS"] = workers
+        if workers > 1:
+            api["INFERENCE_ENGINE"] = "lean"  # Only the lean engine runs inference workers in parallel
+
+    # Offload decode when a 12 MP photo costs more than a quarter of a forward pass
+    decode_threads = _saturation(profile["decode_scaling"]) if profile.get("decode_scaling") else 1
+    decode_ms = profile.get("decode", {}).get("jpeg_12mp", {}).get("inline_ms")
+    if decode_ms and forward_ms and decode_ms > 0.25 * forward_ms:
+        api["DECODE_WORKERS"] = max(1, min(decode_threads, cpu_count // 4))
+    else:
+        api["DECODE_WORKERS"] = 0
+
+    training = {
+        "device": list(range(gpu_count)) if gpu_count else "cpu",
+        "workers": max(1, min(decode_threads, cpu_count // max(gpu_count, 1)))
+    }
+    estimate = profile.get("training_memory") or {}
+    if estimate.get("max_batch_per_gpu"):
+        # Ultralytics splits the batch across DDP ranks
+        training["batch"] = estimate["max_batch_per_gpu"] * max(gpu_count, 1)
+
+    # Cache decoded images in RAM when the disk cannot keep up with the decoders and the dataset fits
+    disk = profile.get("disk")
+    if disk and profile.get("decode_scaling"):
+        ram_mb = profile["host"].get("memory_mb") or 0
+        disk_bound = disk["files_per_s"] < max(profile["decode_scaling"].values())
+        training["cache"] = "ram" if disk_bound and disk["dataset_mb"] * 4 < ram_mb else False
+
+    return {"api": api, "training": training}
+
+
+def host_info():
+    """Static description of the host the profile was measured on"""
+    import torch
+
+    gpus = []
+    if torch.cuda.is_available():
+        for i in range(torch.cuda.device_count()):
+            properties = torch.cuda.get_device_properties(i)
+            gpus.append({"name": properties.name, "memory_mb": round(properties.total_memory / 1024**2)})
+
+    try:
+        memory_mb = round(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024**2)
+    except (ValueError, OSError, AttributeError):
+        memory_mb = None
+
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count() or 1,
+        "memory_mb": memory_mb,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "cuda": torch.version.cuda,
+        "gpus": gpus
+    }
+
+
+def run_perf_profile(args):
+    """Measure this machine and write the machine profile JSON"""
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root / 'api'))
+    from machine_profile import PROFILE_VERSION, profile_path
+
+    import torch
+
+    model = args.model or default_perf_model()
+    profile = {
+        "profile_version": PROFILE_VERSION,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "host": host_info(),
+        "model": model
+    }
+    cpu_count = profile["host"]["cpu_count"]
+    devices = ["cpu"] + (["cuda:0"] if profile["host"]["gpus"] else [])  # The API serves on the first GPU
+
+    print_header("Decode Throughput")
+    profile["decode"] = measure_decode(args.min_time)
+    profile["decode_scaling"] = measure_decode_scaling(cpu_count)
+
+    print_header("Forward Pass per Backend")
+    profile["forward"] = measure_forward(model, devices, args.min_time, args.compile)
+
+    print_header("Thread Scaling (CPU)")
+    profile["thread_scaling"] = measure_thread_scaling(model, cpu_count, args.min_time)
+
+    print_header("Disk Throughput")
+    data_dir = Path(args.data_dir) if args.data_dir else project_root / "data" / "processed" / "images" / "train"
+    if data_dir.exists():
+        profile["disk"] = measure_disk(data_dir)
+    else:
+        profile["disk"] = None
+        print_check("Disk read", False, f"{data_dir} not found (use --data-dir)")
+
+    if torch.cuda.is_available():
+        print_header("Training Memory")
+        profile["training_memory"] = estimate_training_batch(args.train_model)
+
+    profile["recommendations"] = recommend(profile)
+
+    print_header("Recommended Defaults")
+    for scope, settings in profile["recommendations"].items():
+        for key, value in settings.items():
+            print(f"  {scope:<9} {key} = {value}")
+
+    output = Path(args.profile) if args.profile else profile_path()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    print(f"\n✓ Machine profile saved to {output}")
+    print("  The API and scripts/train_yolov8.py use these defaults; explicit settings still take precedence.")
+    return 0
+
+
 def main():
     """Main verification function"""
+    parser = argparse.ArgumentParser(description="Verify the environment, optionally profiling machine performance")
+    parser.add_argument('--perf', action='store_true', help='Measure this machine and write a machine profile')
+    parser.add_argument('--profile', type=str, help='Profile output path (default: MACHINE_PROFILE or configs/machine_profile.json)')
+    parser.add_argument('--model', type=str,
+                        help='Serving model to time, .pt or .safetensors (default: MODEL_PATH or '
+                             'models/garbage_yolov8s/weights/best.pt, else the untrained yolov8s.yaml)')
+    parser.add_argument('--train-model', type=str, default='yolov8m.yaml', help='Training model for the batch size estimate')
+    parser.add_argument('--data-dir', type=str, help='Dataset image directory for the disk test')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Minimum seconds per timing')
+    parser.add_argument('--compile', action='store_true', help='Also time torch.compile (slow to warm up)')
+    args = parser.parse_args()
+
+    if args.perf:
+        return run_perf_profile(args)
+
     print_header("Environment Verification")
     print("This script checks if your environment is properly configured")
     print("for the Garbage Classification project.")
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+模型 × 推理后端 × 输入分辨率 基准测试矩阵
+对 models/ 下每个训练结果，在每个可用后端（PyTorch eager、优化图、ONNX、INT8量化）
+和每个输入分辨率下测量CPU延迟、吞吐量和测试集mAP，生成Pareto前沿报告和图表，
+用于按延迟SLO选择部署的模型
+
+用法:
+    python3 benchmark_matrix.py --imgsz 320,480,640 --val-images 300
+    python3 benchmark_matrix.py --models garbage_yolov8s,garbage_yolov8m --backends eager,onnx --resume
+"""
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import cv2
+import yaml
+import torch
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+from ultralytics import YOLO  # noqa: E402
+
+plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial Unicode MS', 'SimHei']
+plt.rcParams['axes.unicode_minus'] = False
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / 'api'))
+
+from optimize import letterbox, optimize_model  # noqa: E402
+
+
+BACKENDS = ('eager', 'optimized', 'onnx', 'quantized')
+
+# 与API的 INFERENCE_OPTIMIZATIONS 相同，逐项做fp32一致性检查
+OPTIMIZATIONS = ['fuse', 'channels_last', 'bf16']
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+
+
+def backend_available(backend):
+    """后端所需的可选依赖是否已安装"""
+    if backend in ('onnx', 'quantized'):
+        return all(importlib.util.find_spec(m) is not None for m in ('onnx', 'onnxruntime'))
+    return True
+
+
+def find_checkpoints(models_dir, names=None):
+    """models/<run>/weights/best.pt，可按运行名过滤"""
+    checkpoints = sorted(Path(models_dir).glob('*/weights/best.pt'))
+    if names:
+        checkpoints = [c for c in checkpoints if c.parent.parent.name in names]
+    return checkpoints
+
+
+def split_images(data_yaml, split):
+    """数据集配置中某个划分的图片列表"""
+    with open(data_yaml, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    split_dir = Path(config.get('path', '')) / config[split]
+    if split_dir.is_file():
+        return [Path(line.strip()) for line in split_dir.read_text().splitlines() if line.strip()]
+    return sorted(p for p in split_dir.rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def subset_data_yaml(data_yaml, images, work_dir):
+    """写一个测试集只包含前N张图片的数据集配置，缩短每个组合的mAP评估时间"""
+    with open(data_yaml, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    list_path = work_dir / 'test_subset.txt'
+    list_path.write_text('\n'.join(str(p.resolve()) for p in images) + '\n')
+
+    root = Path(config.get('path', ''))
+    config['train'] = str((root / config['train']).resolve())
+    config['val'] = str((root / config['val']).resolve())
+    config['test'] = str(list_path.resolve())
+    config['path'] = str(work_dir.resolve())
+
+    subset_path = work_dir / 'test_subset.yaml'
+    with open(subset_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return subset_path
+
+
+def export_onnx(checkpoint, imgsz, export_dir):
+    """导出固定输入尺寸的ONNX模型（已存在则复用）"""
+    run_name = checkpoint.parent.parent.name
+    target = export_dir / f"{run_name}_{imgsz}.onnx"
+    if not target.exists():
+        exported = YOLO(str(checkpoint)).export(format='onnx', imgsz=imgsz, dynamic=False, verbose=False)
+        shutil.move(str(exported), target)
+    return target
+
+
+class CalibrationReader:
+    """静态量化的校准数据：按Ultralytics相同方式letterbox的验证集图片"""
+
+    def __init__(self, images, imgsz, input_name):
+        self.input_name = input_name
+        self.batches = iter([self._prepare(p, imgsz) for p in images])
+
+    @staticmethod
+    def _prepare(path, imgsz):
+        img = cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_BGR2RGB)
+        padded, _, _ = letterbox(img, (imgsz, imgsz))
+        return np.ascontiguousarray(padded.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+    def get_next(self):
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def quantize_onnx(onnx_path, calibration_images, imgsz):
+    """INT8静态量化（QDQ格式，按通道量化权重），用验证集图片校准激活范围"""
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    target = onnx_path.with_name(onnx_path.stem + '_int8.onnx')
+    if target.exists():
+        return target
+
+    input_name = onnx.load(str(onnx_path)).graph.input[0].name
+
+    class Reader(CalibrationReader, CalibrationDataReader):
+        pass
+
+    quantize_static(
+        str(onnx_path), str(target), Reader(calibration_images, imgsz, input_name),
+        quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8
+    )
+    return target
+
+
+def load_backend(checkpoint, backend, imgsz, export_dir, calibration_images):
+    """
+    按后端加载模型
+
+    Returns:
+        (YOLO模型, 后端说明)
+    """
+    if backend == 'eager':
+        return YOLO(str(checkpoint)), {}
+
+    if backend == 'optimized':
+        model = YOLO(str(checkpoint))
+        report = optimize_model(model, OPTIMIZATIONS, 'cpu')
+        enabled = [o for o in OPTIMIZATIONS if report.get(o, {}).get('enabled')]
+        rejected = {o: report[o].get('reason') for o in OPTIMIZATIONS if o not in enabled}
+        return model, {'optimizations': enabled, 'rejected': rejected}
+
+    onnx_path = export_onnx(checkpoint, imgsz, export_dir)
+    if backend == 'onnx':
+        return YOLO(str(onnx_path), task='detect'), {'file': onnx_path.name}
+
+    quantized_path = quantize_onnx(onnx_path, calibration_images, imgsz)
+    return YOLO(str(quantized_path), task='detect'), {'file': quantized_path.name}
+
+
+def measure_latency(model, images, imgsz, warmup=3):
+    """单流端到端延迟（含前处理和NMS），每次一张图"""
+    arrays = [cv2.imread(str(p)) for p in images]
+    for img in arrays[:warmup]:
+        model.predict(img, imgsz=imgsz, device='cpu', verbose=False)
+
+    latencies, inference = [], []
+    for img in arrays:
+        start = time.perf_counter()
+        result = model.predict(img, imgsz=imgsz, device='cpu', verbose=False)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        inference.append(result.speed['inference'])
+
+    latencies.sort()
+    mean = sum(latencies) / len(latencies)
+    return {
+        'p50_ms': round(latencies[len(latencies) // 2], 2),
+        'p90_ms': round(latencies[min(len(latencies) - 1, int(0.9 * len(latencies)))], 2),
+        'mean_ms': round(mean, 2),
+        'inference_ms': round(float(np.median(inference)), 2),
+        'throughput_ips': round(1000 / mean, 2)
+    }
+
+
+def measure_accuracy(model, data_yaml, imgsz, batch):
+    """测试集 mAP@0.5 和 mAP@0.5:0.95"""
+    metrics = model.val(data=str(data_yaml), split='test', imgsz=imgsz, batch=batch,
+                        device='cpu', plots=False, verbose=False)
+    return {'map50': round(float(metrics.box.map50), 4), 'map50_95': round(float(metrics.box.map), 4)}
+
+
+def pareto_frontier(rows):
+    """延迟更低且mAP不更差的组合不存在时，该组合在前沿上（按p50延迟升序）"""
+    frontier, best_map = [], -1.0
+    for row in sorted(rows, key=lambda r: (r['latency']['p50_ms'], -r['accuracy']['map50_95'])):
+        if row['accuracy']['map50_95'] > best_map:
+            frontier.append(row)
+            best_map = row['accuracy']['map50_95']
+    return frontier
+
+
+def slo_table(rows, slos):
+    """每个p90延迟SLO下mAP最高的组合"""
+    table = []
+    for slo in slos:
+        candidates = [r for r in rows if r['latency']['p90_ms'] <= slo]
+        best = max(candidates, key=lambda r: r['accuracy']['map50_95']) if candidates else None
+        table.append({'slo_ms': slo, 'choice': best['key'] if best else None})
+    return table
+
+
+def write_report(rows, frontier, slos, environment, output_path):
+    """Markdown报告：完整矩阵、Pareto前沿和SLO选型"""
+    by_key = {r['key']: r for r in rows}
+    frontier_keys = {r['key'] for r in frontier}
+
+    lines = [
+        '# 模型 × 后端 × 分辨率 基准测试报告',
+        '',
+        f"- 测试时间: {environment['timestamp']}",
+        f"- CPU: {environment['processor']}，PyTorch线程数: {environment['threads']}",
+        f"- 延迟: 单流端到端（前处理 + 推理 + NMS），{environment['latency_images']} 张测试图片",
+        f"- 精度: 测试集 {environment['val_images']} 张图片",
+        '',
+        '## 按延迟SLO选型',
+        '',
+        '| p90 SLO | 推荐组合 | p90 (ms) | mAP@0.5:0.95 | mAP@0.5 |',
+        '|---|---|---|---|---|'
+    ]
+    for entry in slos:
+        row = by_key.get(entry['choice'])
+        if row is None:
+            lines.append(f"| {entry['slo_ms']} ms | 无满足的组合 | - | - | - |")
+        else:
+            lines.append(f"| {entry['slo_ms']} ms | `{row['key']}` | {row['latency']['p90_ms']} | "
+                         f"{row['accuracy']['map50_95']} | {row['accuracy']['map50']} |")
+
+    lines += [
+        '',
+        '## Pareto前沿',
+        '',
+        '没有其他组合能同时更快且更准。',
+        '',
+        '| 组合 | p50 (ms) | 吞吐量 (img/s) | mAP@0.5:0.95 |',
+        '|---|---|---|---|'
+    ]
+    for row in frontier:
+        lines.append(f"| `{row['key']}` | {row['latency']['p50_ms']} | {row['latency']['throughput_ips']} | "
+                     f"{row['accuracy']['map50_95']} |")
+
+    lines += [
+        '',
+        '## 完整矩阵',
+        '',
+        '| 模型 | 后端 | 分辨率 | p50 (ms) | p90 (ms) | 推理 (ms) | 吞吐量 (img/s) | mAP@0.5 | mAP@0.5:0.95 | 前沿 |',
+        '|---|---|---|---|---|---|---|---|---|---|'
+    ]
+    for row in sorted(rows, key=lambda r: (r['model'], BACKENDS.index(r['backend']), r['imgsz'])):
+        latency, accuracy = row['latency'], row['accuracy']
+        lines.append(f"| {row['model']} | {row['backend']} | {row['imgsz']} | {latency['p50_ms']} | "
+                     f"{latency['p90_ms']} | {latency['inference_ms']} | {latency['throughput_ips']} | "
+                     f"{accuracy['map50']} | {accuracy['map50_95']} | {'✓' if row['key'] in frontier_keys else ''} |")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    print(f"报告已保存到: {output_path}")
+
+
+def plot_matrix(rows, frontier, slos, output_path):
+    """左: 延迟-mAP散点和Pareto前沿；右: 各后端相对eager的mAP变化"""
+    fig, axes = plt.subplots(1, 2, figsize=(18, 8))
+    fig.suptitle('Model × Backend × Resolution - Latency vs Accuracy (CPU)', fontsize=16, fontweight='bold')
+
+    models = sorted({r['model'] for r in rows})
+    colors = {m: plt.cm.tab10(i % 10) for i, m in enumerate(models)}
+    markers = {'eager': 'o', 'optimized': 's', 'onnx': '^', 'quantized': 'D'}
+    sizes = sorted({r['imgsz'] for r in rows})
+
+    # 1. 延迟 vs mAP
+    ax = axes[0]
+    for row in rows:
+        ax.scatter(row['latency']['p50_ms'], row['accuracy']['map50_95'],
+                   color=colors[row['model']], marker=markers[row['backend']],
+                   s=30 + 90 * sizes.index(row['imgsz']), alpha=0.75, edgecolors='black', linewidths=0.5)
+    ax.plot([r['latency']['p50_ms'] for r in frontier], [r['accuracy']['map50_95'] for r in frontier],
+            color='red', linewidth=2, linestyle='--', label='Pareto frontier', drawstyle='steps-post')
+    for row in frontier:
+        ax.annotate(f"{row['model']}\n{row['backend']}@{row['imgsz']}",
+                    (row['latency']['p50_ms'], row['accuracy']['map50_95']),
+                    textcoords='offset points', xytext=(6, -12), fontsize=7)
+    for entry in slos:
+        ax.axvline(x=entry['slo_ms'], color='gray', linestyle=':', alpha=0.6)
+        ax.text(entry['slo_ms'], ax.get_ylim()[0], f" {entry['slo_ms']}ms", fontsize=8, color='gray', va='bottom')
+
+    # 图例: 颜色=模型，形状=后端，大小=分辨率
+    for model in models:
+        ax.scatter([], [], color=colors[model], marker='o', label=model)
+    for backend, marker in markers.items():
+        ax.scatter([], [], color='white', edgecolors='black', marker=marker, label=backend)
+    ax.set_xscale('log')
+    ax.set_xlabel('p50 latency per image (ms, log scale)', fontsize=12)
+    ax.set_ylabel('mAP@0.5:0.95 (test)', fontsize=12)
+    ax.set_title(f"Latency vs Accuracy (marker size = imgsz {', '.join(map(str, sizes))})", fontsize=13,
+                 fontweight='bold')
+    ax.legend(fontsize=8, loc='lower right')
+    ax.grid(True, alpha=0.3, which='both')
+
+    # 2. 各后端的精度代价（相对同模型同分辨率的eager）
+    ax = axes[1]
+    eager = {(r['model'], r['imgsz']): r['accuracy']['map50_95'] for r in rows if r['backend'] == 'eager'}
+    labels = [f"{m}@{s}" for m in models for s in sizes if (m, s) in eager]
+    backends = [b for b in BACKENDS[1:] if any(r['backend'] == b for r in rows)]
+    width = 0.8 / max(len(backends), 1)
+    for i, backend in enumerate(backends):
+        deltas = []
+        for label in labels:
+            model, imgsz = label.rsplit('@', 1)
+            match = [r for r in rows if r['model'] == model and r['imgsz'] == int(imgsz) and r['backend'] == backend]
+            deltas.append(match[0]['accuracy']['map50_95'] - eager[(model, int(imgsz))] if match else np.nan)
+        ax.bar(np.arange(len(labels)) + i * width, deltas, width, label=backend, alpha=0.8)
+    ax.axhline(y=0, color='black', linewidth=1)
+    ax.set_xticks(np.arange(len(labels)) + width * (len(backends) - 1) / 2)
+    ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=8)
+    ax.set_ylabel('Δ mAP@0.5:0.95 vs eager', fontsize=12)
+    ax.set_title('Accuracy Cost of Each Backend', fontsize=13, fontweight='bold')
+    ax.legend(fontsize=10)
+    ax.grid(True, alpha=0.3, axis='y')
+
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    print(f"图表已保存到: {output_path}")
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模型 × 后端 × 分辨率 延迟/精度基准测试矩阵')
+    parser.add_argument('--models-dir', type=str, default=str(project_root / 'models'), help='训练结果目录')
+    parser.add_argument('--models', type=str, help='只测试这些运行名（逗号分隔），默认全部')
+    parser.add_argument('--backends', type=str, default=','.join(BACKENDS), help='后端（逗号分隔）')
+    parser.add_argument('--imgsz', type=str, default='320,480,640', help='输入分辨率（逗号分隔）')
+    parser.add_argument('--data', type=str, default=str(project_root / 'configs' / 'garbage.yaml'), help='数据集配置')
+    parser.add_argument('--val-images', type=int, default=0, help='mAP评估使用的测试图片数（0 = 全部）')
+    parser.add_argument('--latency-images', type=int, default=50, help='延迟测量使用的测试图片数')
+    parser.add_argument('--calibration-images', type=int, default=64, help='INT8量化校准使用的验证集图片数')
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads(), help='PyTorch CPU线程数')
+    parser.add_argument('--slo-ms', type=str, default='25,50,100,200', help='p90延迟SLO（毫秒，逗号分隔）')
+    parser.add_argument('--output-dir', type=str, default=str(Path(__file__).parent / 'benchmark_matrix'),
+                        help='结果、报告、图表和导出模型的目录')
+    parser.add_argument('--resume', action='store_true', help='跳过结果文件中已成功完成的组合，失败的组合会重试')
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    output_dir = Path(args.output_dir)
+    export_dir = output_dir / 'exports'
+    export_dir.mkdir(parents=True, exist_ok=True)
+    results_path = output_dir / 'benchmark_matrix.json'
+
+    checkpoints = find_checkpoints(args.models_dir, args.models.split(',') if args.models else None)
+    if not checkpoints:
+        print(f"❌ 在 {args.models_dir} 下没有找到 */weights/best.pt")
+        return 1
+
+    backends = []
+    for backend in args.backends.split(','):
+        backend = backend.strip()
+        if backend not in BACKENDS:
+            print(f"⚠️  未知后端，已跳过: {backend}")
+        elif not backend_available(backend):
+            print(f"⚠️  后端 {backend} 需要 onnx 和 onnxruntime（pip install onnx onnxruntime），已跳过")
+        else:
+            backends.append(backend)
+    resolutions = [int(s) for s in args.imgsz.split(',') if s.strip()]
+    slos = [float(s) for s in args.slo_ms.split(',') if s.strip()]
+
+    test_images = split_images(args.data, 'test')
+    latency_images = test_images[:args.latency_images]
+    data_yaml = Path(args.data)
+    if args.val_images and args.val_images < len(test_images):
+        data_yaml = subset_data_yaml(args.data, test_images[:args.val_images], output_dir)
+    calibration_images = split_images(args.data, 'val')[:args.calibration_images]
+
+    results = {}
+    if args.resume and results_path.exists():
+        with open(results_path, 'r', encoding='utf-8') as f:
+            results = json.load(f).get('results', {})
+
+    environment = {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'processor': platform.processor() or platform.machine(),
+        'threads': args.threads,
+        'torch': torch.__version__,
+        'latency_images': len(latency_images),
+        'val_images': args.val_images or len(test_images)
+    }
+
+    total = len(checkpoints) * len(backends) * len(resolutions)
+    print("=" * 60)
+    print(f"基准测试矩阵: {len(checkpoints)} 个模型 × {len(backends)} 个后端 × {len(resolutions)} 个分辨率 = {total} 个组合")
+    print("=" * 60)
+
+    for checkpoint in checkpoints:
+        model_name = checkpoint.parent.parent.name
+        for backend in backends:
+            for imgsz in resolutions:
+                key = f"{model_name}/{backend}/{imgsz}"
+                # 失败的组合（带error字段）在 --resume 时重试
+                if key in results and 'error' not in results[key]:
+                    print(f"⏭️  {key} 已完成")
+                    continue
+
+                print(f"\n>>> {key}")
+                row = {'key': key, 'model': model_name, 'backend': backend, 'imgsz': imgsz}
+                try:
+                    model, row['backend_info'] = load_backend(checkpoint, backend, imgsz, export_dir, calibration_images)
+                    row['latency'] = measure_latency(model, latency_images, imgsz)
+                    # 固定尺寸导出的ONNX模型只能以batch 1评估
+                    batch = 1 if backend in ('onnx', 'quantized') else 16
+                    row['accuracy'] = measure_accuracy(model, data_yaml, imgsz, batch)
+                    print(f"   p50 {row['latency']['p50_ms']:.1f}ms | p90 {row['latency']['p90_ms']:.1f}ms | "
+                          f"{row['latency']['throughput_ips']:.1f} img/s | mAP@0.5:0.95 {row['accuracy']['map50_95']:.4f}")
+                except Exception as e:
+                    row['error'] = f"{type(e).__name__}: {e}"
+                    print(f"   ❌ 失败: {row['error']}")
+
+                results[key] = row
+                with open(results_path, 'w', encoding='utf-8') as f:
+                    json.dump({'environment': environment, 'results': results}, f, indent=2, ensure_ascii=False)
+
+    rows = [r for r in results.values() if 'error' not in r]
+    if not rows:
+        print("\n❌ 没有成功的组合")
+        return 1
+
+    frontier = pareto_frontier(rows)
+    slo_choices = slo_table(rows, slos)
+
+    with open(results_path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment, 'results': results, 'pareto_frontier': [r['key'] for r in frontier],
+                   'slo_choices': slo_choices}, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{'='*60}")
+    print("按延迟SLO选型 (p90)")
+    print(f"{'='*60}")
+    for entry in slo_choices:
+        print(f"  ≤ {entry['slo_ms']:.0f} ms: {entry['choice'] or '无满足的组合'}")
+
+    write_report(rows, frontier, slo_choices, environment, output_dir / 'BENCHMARK_MATRIX_REPORT.md')
+    plot_matrix(rows, frontier, slo_choices, output_dir / 'benchmark_matrix.png')
+    print(f"结果已保存到: {results_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""Make the flat api/ modules importable, as the scripts do with sys.path"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
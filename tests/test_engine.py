@@ -0,0 +1,69 @@
+"""Lean engine parity with the Ultralytics predictor"""
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("cv2")
+ultralytics = pytest.importorskip("ultralytics")
+
+from engine import LeanEngine, check_parity  # noqa: E402
+from optimize import letterbox_shape, reference_images  # noqa: E402
+
+
+# (height, width): 1:1, 4:3, 3:4, 16:9, 9:16 and an odd size that needs asymmetric padding
+SHAPES = [(720, 720), (720, 960), (960, 720), (720, 1280), (1280, 720), (361, 641)]
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return ultralytics.YOLO("yolov8n.yaml")
+
+
+@pytest.fixture(scope="module")
+def engine(model):
+    return LeanEngine(model, "cpu")
+
+
+def image(shape):
+    import cv2
+    base = reference_images(count=1)[0]
+    return np.ascontiguousarray(cv2.resize(base, (shape[1], shape[0])))
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_input_tensor_matches_predictor(model, engine, shape):
+    img = image(shape)
+    model.predict(img, device="cpu", verbose=False)
+    expected = model.predictor.preprocess([img])
+
+    buffers = engine.arena.acquire(engine.bucket_for(img))
+    try:
+        engine.preprocess(img, buffers)
+        actual = buffers.tensor.clone()
+    finally:
+        engine.arena.release(buffers)
+
+    assert tuple(actual.shape[-2:]) == tuple(expected.shape[-2:]) == letterbox_shape(*shape)
+    assert torch.allclose(actual, expected.float(), atol=1e-6)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_detections_match_predictor(model, engine, shape):
+    img = image(shape)
+    # A low threshold so the randomly initialized network produces detections to compare
+    expected = model.predict(img, conf=0.01, iou=0.45, device="cpu", verbose=False)[0].boxes
+    boxes, scores, classes = engine.infer(img, conf=0.01, iou=0.45)
+
+    assert len(boxes) == len(expected)
+    order = np.argsort(-scores, kind="stable")
+    exp_order = np.argsort(-expected.conf.numpy(), kind="stable")
+    np.testing.assert_allclose(scores[order], expected.conf.numpy()[exp_order], atol=1e-4)
+    np.testing.assert_allclose(boxes[order], expected.xyxy.numpy()[exp_order], atol=1.0)
+
+
+def test_check_parity_covers_wide_photos(model, engine):
+    report = check_parity(engine, model, "cpu", conf=0.01)
+    assert report["images"] >= 8
+    assert report["passed"], report
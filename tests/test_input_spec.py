@@ -0,0 +1,26 @@
+"""Upload waste estimate"""
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from input_spec import UploadWasteTracker  # noqa: E402
+
+
+def test_full_photo_above_max_side_is_waste():
+    tracker = UploadWasteTracker()
+    wasted = tracker.observe(4_000_000, (4000, 3000), 640)
+    assert wasted == int(4_000_000 * (1 - (640 / 4000) ** 2))
+
+
+def test_roi_upload_that_fits_is_not_waste():
+    """A full-resolution photo sent with a 600px ROI is exactly what the server needs"""
+    tracker = UploadWasteTracker()
+    assert tracker.observe(4_000_000, (4000, 3000), 640, roi=(1000, 1000, 1600, 1500)) == 0
+    assert tracker.stats()["oversized_uploads"] == 0
+
+
+def test_oversized_roi_counts_only_the_region():
+    tracker = UploadWasteTracker()
+    wasted = tracker.observe(4_000_000, (4000, 3000), 640, roi=(0, 0, 1280, 960))
+    assert wasted == int(4_000_000 * (1 - (640 / 1280) ** 2))
@@ -0,0 +1,26 @@
+"""Graph optimization helpers"""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("cv2")
+
+from optimize import RESOLUTION_BUCKETS, _shape_guarded_forward, letterbox_shape  # noqa: E402
+
+
+def test_compiled_forward_only_serves_checked_shapes():
+    calls = []
+    forward = _shape_guarded_forward(
+        lambda x: calls.append("compiled"), lambda x: calls.append("eager"), {(1, 3, 384, 640)}
+    )
+
+    forward(torch.zeros(1, 3, 384, 640))
+    forward(torch.zeros(1, 3, 416, 640))
+    forward(torch.zeros(2, 3, 384, 640))
+    assert calls == ["compiled", "eager", "eager"]
+
+
+@pytest.mark.parametrize("height, width", [(720, 720), (720, 960), (960, 720), (1080, 1920), (1920, 1080)])
+def test_common_photo_shapes_are_buckets(height, width):
+    """Shapes the predictor produces for common aspect ratios are compiled and checked at startup"""
+    assert letterbox_shape(height, width) in RESOLUTION_BUCKETS
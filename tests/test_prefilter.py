@@ -0,0 +1,59 @@
+"""Empty-scene pre-filter background learning"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from prefilter import EmptyScenePrefilter  # noqa: E402
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((120, 160, 3), value, dtype=np.uint8)
+
+
+def test_unfiltered_empty_frames_teach_background():
+    prefilter = EmptyScenePrefilter(warmup_frames=3, audit_interval=1000)
+    background = prefilter.signature(frame(100))
+
+    for _ in range(3):
+        assert prefilter.check("cam", background) == (False, False)
+        prefilter.update("cam", background, detection_count=0)
+
+    assert prefilter.check("cam", background) == (True, False)
+
+
+def test_filtered_empty_frames_do_not_teach_background():
+    """classes=battery or a high conf returns 0 detections for frames that do contain trash"""
+    prefilter = EmptyScenePrefilter(warmup_frames=3, audit_interval=1000)
+    scene_with_trash = prefilter.signature(frame(100))
+
+    for _ in range(10):
+        assert prefilter.check("cam", scene_with_trash) == (False, False)
+        prefilter.update("cam", scene_with_trash, detection_count=0, filtered=True)
+
+    # A later unfiltered request for the same scene must still reach the detector
+    assert prefilter.check("cam", scene_with_trash) == (False, False)
+    assert prefilter.stats()["skipped"] == 0
+
+
+def test_filtered_empty_audit_is_not_a_miss():
+    prefilter = EmptyScenePrefilter(warmup_frames=1, audit_interval=1)
+    background = prefilter.signature(frame(100))
+    prefilter.update("cam", background, detection_count=0)
+
+    skip, audit = prefilter.check("cam", background)
+    assert (skip, audit) == (False, True)
+    prefilter.update("cam", background, detection_count=0, audit=audit, filtered=True)
+
+    assert prefilter.stats()["audit_misses"] == 0
+
+
+def test_reset_forgets_backgrounds():
+    prefilter = EmptyScenePrefilter(warmup_frames=1, audit_interval=1000)
+    background = prefilter.signature(frame(100))
+    prefilter.update("cam", background, detection_count=0)
+    assert prefilter.check("cam", background) == (True, False)
+
+    prefilter.reset()
+    assert prefilter.check("cam", background) == (False, False)
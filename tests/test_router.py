@@ -0,0 +1,44 @@
+"""Router path allow-list"""
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from router import Router, create_app, normalize_path, proxy_allowed  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    return TestClient(create_app(Router(backends=[])))
+
+
+@pytest.mark.parametrize("path", [
+    "/v1/../admin/reload",
+    "/v1/%2E%2E/admin/reload",
+    "/v1/%2e%2e/admin/reload",
+    "/v1/./../debug/memory",
+])
+def test_dot_segments_are_rejected(path):
+    assert normalize_path(path) is None
+
+
+def test_public_paths_are_forwarded_encoded():
+    assert normalize_path("/v1/detect") == "/v1/detect"
+    assert normalize_path("/v1/a b") == "/v1/a%20b"
+    assert proxy_allowed(normalize_path("/v1/detect")) is None
+
+
+def test_traversal_does_not_reach_admin(client):
+    # Raw paths, so the test client does not resolve the dot segments itself
+    for raw in ("/v1/%2E%2E/admin/reload", "/v1/%252E%252E/admin/reload"):
+        response = client.post(raw)
+        assert response.status_code == 400, raw
+
+
+def test_admin_paths_need_token(client):
+    assert client.post("/admin/reload").status_code == 403
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,45 @@
+"""Temporal reuse of detections across near-identical frames"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from temporal import FrameSignature, TemporalReuseCache  # noqa: E402
+
+
+def frame() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, size=(120, 160, 3), dtype=np.uint8)
+
+
+DETECTIONS = [{"bbox_xyxy": [10.0, 20.0, 50.0, 60.0], "confidence": 0.9, "specific_name": "PLASTIC"}]
+
+
+def test_same_context_reuses_detections():
+    cache = TemporalReuseCache()
+    cache.store("s", FrameSignature(frame()), DETECTIONS, context="a")
+
+    reused = cache.lookup("s", FrameSignature(frame()), context="a")
+    assert reused is not None and len(reused) == 1
+
+
+def test_context_mismatch_is_a_miss():
+    """Detections filtered with classes=X must not answer a request with other parameters"""
+    cache = TemporalReuseCache()
+    cache.store("s", FrameSignature(frame()), DETECTIONS, context="classes=battery")
+
+    assert cache.lookup("s", FrameSignature(frame()), context="default") is None
+    assert cache.stats()["reused"] == 0
+
+
+def test_roi_detections_stay_in_full_image_coordinates():
+    """Boxes from a 160x120 ROI crop at (1000, 300) must not be clipped to the crop's own size"""
+    cache = TemporalReuseCache()
+    crop = frame()
+    detection = {"bbox_xyxy": [1050.0, 320.0, 1100.0, 380.0], "confidence": 0.9, "specific_name": "PLASTIC"}
+    cache.store("s", FrameSignature(crop, offset=(1000.0, 300.0)), [detection])
+
+    reused = cache.lookup("s", FrameSignature(crop, offset=(1000.0, 300.0)))
+    assert reused is not None
+    assert reused[0]["bbox_xyxy"] == pytest.approx([1050.0, 320.0, 1100.0, 380.0])
@@ -0,0 +1,45 @@
+"""Converted safetensors weights load and predict like the source checkpoint"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("cv2")
+pytest.importorskip("safetensors")
+ultralytics = pytest.importorskip("ultralytics")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from convert_weights import convert_checkpoint  # noqa: E402
+from optimize import reference_images  # noqa: E402
+from weights import load_inference_model, weights_fingerprint  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def checkpoint(tmp_path_factory):
+    torch.manual_seed(0)
+    model = ultralytics.YOLO("yolov8n.yaml")
+    path = tmp_path_factory.mktemp("weights") / "tiny.pt"
+    torch.save({"model": model.model, "ema": None}, path)
+    return path
+
+
+def test_converted_weights_match_checkpoint(checkpoint):
+    converted = convert_checkpoint(checkpoint)
+    source = ultralytics.YOLO(str(checkpoint))
+    mapped = load_inference_model(converted)
+
+    assert weights_fingerprint(converted) != "unknown"
+    assert mapped.names == source.names
+
+    for img in reference_images(count=3):
+        # A low threshold so the randomly initialized network produces detections to compare
+        expected = source.predict(img, conf=0.01, device="cpu", verbose=False)[0].boxes
+        actual = mapped.predict(img, conf=0.01, device="cpu", verbose=False)[0].boxes
+
+        assert len(actual) == len(expected)
+        np.testing.assert_allclose(actual.conf.numpy(), expected.conf.numpy(), atol=1e-4)
+        np.testing.assert_allclose(actual.xyxy.numpy(), expected.xyxy.numpy(), atol=1.0)